@@ -1,22 +1,31 @@
 import os
-import socket
 import math
 import re
+import time
+import threading
 import html as html_lib
-import urllib.request
+from collections import OrderedDict
+from contextlib import aclosing
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from brapi import Brapi
-import yfinance as yf
-import yfinance.cache as yf_cache
-import pandas_ta as ta
-import pandas as pd
+
+import metrics
+import resolver
+import universe_index
 
 
 load_dotenv()
 
 DEFAULT_TIMEOUT = 15
 _BRAPI_CLIENT = None
+_YFINANCE_CACHE_READY = False
+_FETCH_EXECUTOR = None
+_FETCH_EXECUTOR_LOCK = threading.Lock()
+_REFRESH_EXECUTOR = None
+_REFRESHING = set()
 INVESTIDOR10_BASE_URL = "https://investidor10.com.br/fiis"
+BRAPI_FUNDAMENTAL_MODULES = "defaultKeyStatistics,financialData,balanceSheetHistory"
+MIN_HISTORY_BARS = 100
 
 
 def _load_price_tolerance():
@@ -29,6 +38,328 @@ def _load_price_tolerance():
 PRICE_MATCH_TOLERANCE = _load_price_tolerance()
 
 
+def _load_int(name, default):
+    try:
+        return max(int(os.getenv(name, default)), 1)
+    except Exception:
+        return default
+
+
+YAHOO_BATCH_SIZE = _load_int("YAHOO_BATCH_SIZE", 50)
+BRAPI_BATCH_SIZE = _load_int("BRAPI_BATCH_SIZE", 10)
+FETCH_WORKERS = _load_int("FETCH_WORKERS", 16)
+
+
+def _load_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except Exception:
+        return default
+
+
+ANALYSIS_DEADLINE = _load_float("ANALYSIS_DEADLINE", 20.0)
+# Fundamentos em disco: até FRESH são usados como estão; até MAX_AGE são
+# servidos enquanto uma atualização roda em segundo plano; depois, descartados.
+FUNDAMENTALS_FRESH = _load_float("FUNDAMENTALS_FRESH", 6 * 3600.0)
+FUNDAMENTALS_MAX_AGE = _load_float("FUNDAMENTALS_MAX_AGE", 7 * 86400.0)
+# Fontes que de fato forneceram os fundamentos de cada ticker na última busca
+# completa; nesse prazo as próximas buscas só consultam essas.
+SOURCE_ROUTE_TTL = _load_float("SOURCE_ROUTE_TTL", 30 * 86400.0)
+# Diferença relativa máxima entre a barra salva e a mesma barra baixada de novo
+# antes de o histórico salvo ser tratado como de outra base de ajuste.
+HISTORY_ADJUST_TOLERANCE = _load_float("HISTORY_ADJUST_TOLERANCE", 0.001)
+# Circuit breaker por fonte: N falhas seguidas tiram a fonte do ar por
+# BREAKER_COOLDOWN segundos, prazo que dobra a cada reabertura até o máximo.
+BREAKER_FAILURES = _load_int("BREAKER_FAILURES", 3)
+BREAKER_COOLDOWN = _load_float("BREAKER_COOLDOWN", 30.0)
+BREAKER_MAX_COOLDOWN = _load_float("BREAKER_MAX_COOLDOWN", 600.0)
+# Índice noturno (terminal.py --build-index): o /analise usa o registro do
+# índice enquanto ele tiver no máximo esta idade; depois vai às fontes.
+INDEX_MAX_AGE = _load_float("INDEX_MAX_AGE", 26 * 3600.0)
+CACHE_MAX_ENTRIES = _load_int("CACHE_MAX_ENTRIES", 2048)
+CACHE_TTL = {
+    "price": _load_float("CACHE_TTL_PRICE", 30.0),
+    "history": _load_float("CACHE_TTL_HISTORY", 300.0),
+    "fundamentals": _load_float("CACHE_TTL_FUNDAMENTALS", 6 * 3600.0),
+    # Partes que a brapi recusou (range ou módulos fora do plano) não são pedidas de novo nesse prazo.
+    "refused": _load_float("CACHE_TTL_REFUSED", 1800.0),
+    # Correlações do /diversificacao, por conjunto de tickers e última barra.
+    "correlation": _load_float("CACHE_TTL_CORRELATION", 3600.0),
+}
+
+
+class _TTLCache:
+    # LRU limitado com validade por classe de dado (preço em segundos,
+    # fundamentos em horas). Vive o mesmo tempo que o processo.
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, data_class, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits[data_class] = self.hits.get(data_class, 0) + 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses[data_class] = self.misses.get(data_class, 0) + 1
+            return False, None
+
+    def set(self, data_class, key, value):
+        ttl = CACHE_TTL.get(data_class, 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+            }
+
+
+class _RateLimiter:
+    # Token bucket por fonte: no máximo `rate` requisições por segundo, com
+    # rajada de até `rate` chamadas seguidas. rate <= 0 desliga o limite.
+    def __init__(self, rate):
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # 0 quando há ficha disponível (e já a consome); senão, quanto esperar.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            delay = self._take()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        import asyncio
+        if self.rate <= 0:
+            return
+        while True:
+            delay = self._take()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+
+class _CircuitBreaker:
+    # Fechado: tudo passa. Aberto: ninguém passa até o prazo vencer. Vencido o
+    # prazo, uma única chamada de teste passa; sucesso fecha, falha reabre com
+    # o dobro do prazo. BREAKER_FAILURES <= 0 desliga.
+    def __init__(self, source):
+        self.source = source
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if not self.open_until:
+                return True
+            if self.probing or time.monotonic() < self.open_until:
+                return False
+            self.probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.trips = 0
+            self.open_until = 0.0
+            self.probing = False
+
+    def failure(self, exc=None):
+        # Resposta de erro do cliente (ticker inexistente, plano sem o recurso)
+        # mostra que a fonte está de pé.
+        if exc is not None and not _is_source_failure(exc):
+            self.success()
+            return
+        if BREAKER_FAILURES <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if not self.probing and self.failures < BREAKER_FAILURES:
+                return
+            self.trips += 1
+            self.probing = False
+            cooldown = min(BREAKER_COOLDOWN * 2 ** (self.trips - 1), BREAKER_MAX_COOLDOWN)
+            self.open_until = time.monotonic() + cooldown
+        metrics.count("circuit_trips", source=self.source)
+
+    def abandon(self):
+        # Chamada de teste interrompida (prazo do comando): sem veredito.
+        with self._lock:
+            self.probing = False
+
+    def state(self):
+        with self._lock:
+            retry_in = max(self.open_until - time.monotonic(), 0.0) if self.open_until else 0.0
+            if not self.open_until:
+                state = "fechado"
+            elif self.probing or not retry_in:
+                state = "testando"
+            else:
+                state = "aberto"
+            return {"state": state, "failures": self.failures, "trips": self.trips, "retry_in": retry_in}
+
+
+class _SingleFlight:
+    # Buscas em andamento por chave de cache: quem pede a mesma chave (fonte,
+    # ticker, parâmetros) enquanto ela está sendo buscada espera a mesma
+    # resposta em vez de repetir a requisição.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def claim(self, data_class, keys):
+        # keys: {ticker: chave}. Devolve o que já estava no cache, as chaves que
+        # esta chamada deve buscar e as que já estão sendo buscadas por outra.
+        found, owned, joined = {}, {}, {}
+        with self._lock:
+            for ticker, key in keys.items():
+                future = self._calls.get(key)
+                if future is not None:
+                    joined[ticker] = future
+                    continue
+                hit, value = _CACHE.get(data_class, key)
+                if hit:
+                    found[ticker] = value
+                    continue
+                owned[ticker] = self._calls[key] = Future()
+        return found, owned, joined
+
+    def release(self, data_class, key, value):
+        # Grava no cache e sai da lista no mesmo passo, para ninguém ver a
+        # chave fora das duas e buscar de novo.
+        with self._lock:
+            if value is not _MISSING and _cacheable(value):
+                _CACHE.set(data_class, key, value)
+            future = self._calls.pop(key)
+        future.set_result(value)
+
+
+_MISSING = object()
+_CACHE = _TTLCache(CACHE_MAX_ENTRIES)
+_IN_FLIGHT = _SingleFlight()
+_RATE_LIMITS = {
+    "yahoo": _RateLimiter(_load_float("RATE_LIMIT_YAHOO", 5.0)),
+    "brapi": _RateLimiter(_load_float("RATE_LIMIT_BRAPI", 2.0)),
+    "investidor10": _RateLimiter(_load_float("RATE_LIMIT_INVESTIDOR10", 2.0)),
+}
+_BREAKERS = {source: _CircuitBreaker(source) for source in _RATE_LIMITS}
+_INDICATOR_STATES = OrderedDict()
+_INDICATOR_LOCK = threading.Lock()
+
+
+def cache_stats():
+    return _CACHE.stats()
+
+def source_health():
+    return {source: breaker.state() for source, breaker in _BREAKERS.items()}
+
+def _is_source_failure(exc):
+    # 4xx (menos 429) e "ticker sem dados" são respostas da fonte, não falhas dela.
+    if any(cls.__name__ == "YFTickerMissingError" for cls in type(exc).__mro__):
+        return False
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+def _source_allowed(source):
+    # Fonte com o circuito aberto é pulada na hora, sem esperar o timeout dela.
+    if _BREAKERS[source].allow():
+        return True
+    metrics.count("circuit_skipped", source=source)
+    return False
+
+def _throttle(source):
+    # Só as requisições de verdade passam por aqui; acertos de cache não gastam cota.
+    _RATE_LIMITS[source].acquire()
+
+def _cacheable(value):
+    # Falhas (None, NaN, vazio) não entram no cache para a próxima chamada tentar de novo.
+    if value is None:
+        return False
+    if isinstance(value, float):
+        return not math.isnan(value)
+    try:
+        return len(value) > 0
+    except TypeError:
+        return True
+
+def _cached(data_class, key, fetch, deadline=None):
+    found = _cached_batch(data_class, [key], lambda item: item, lambda missing: {key: fetch()}, deadline)
+    return found.get(key)
+
+def _cached_batch(data_class, tickers, key_for, fetch, deadline=None):
+    # A requisição sai uma vez por chave distinta, não uma vez por chamada.
+    # Quem pega carona na busca de outro espera no máximo até o próprio prazo;
+    # depois segue sem a chave, como se a fonte não tivesse respondido.
+    keys = {ticker: key_for(ticker) for ticker in tickers}
+    found, owned, joined = _IN_FLIGHT.claim(data_class, keys)
+    if owned:
+        fetched = {}
+        try:
+            fetched = fetch(list(owned)) or {}
+        finally:
+            for ticker in owned:
+                _IN_FLIGHT.release(data_class, keys[ticker], fetched.get(ticker, _MISSING))
+        found.update((ticker, value) for ticker, value in fetched.items() if ticker in owned)
+    if joined:
+        metrics.count("coalesced", len(joined), data_class=data_class)
+    for ticker, future in joined.items():
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            value = future.result(timeout=timeout)
+        except TimeoutError:
+            metrics.deadline_expired(f"coalesced.{data_class}")
+            continue
+        if value is not _MISSING:
+            found[ticker] = value
+    return found
+
+
 def _env_truthy(name, default=True):
     raw = os.getenv(name)
     if raw is None:
@@ -56,30 +387,155 @@ def _parse_pt_number(value):
 def _parse_brl_value(text):
     if not text:
         return float("nan")
-    match = re.search(r"([0-9\.\,]+)\s*(milh(?:ões)?|mi|m|bilh(?:ões)?|bi|b)?", text, re.IGNORECASE)
+    # \b no fim: "12 mil" não é lido como "mi" (milhões).
+    match = re.search(r"([0-9\.\,]+)\s*(?:(milh(?:ões|oes)?|mil|mi|m|bilh(?:ões|oes)?|bi|b|k)\b)?", text, re.IGNORECASE)
     if not match:
         return float("nan")
     number = _parse_pt_number(match.group(1))
     if math.isnan(number):
         return float("nan")
     suffix = (match.group(2) or "").lower()
-    if suffix in {"bilh", "bilhões", "bi", "b"}:
+    if suffix in {"bilh", "bilhões", "bilhoes", "bi", "b"}:
         return number * 1_000_000_000
-    if suffix in {"milh", "milhões", "mi", "m"}:
+    if suffix in {"milh", "milhões", "milhoes", "mi", "m"}:
         return number * 1_000_000
+    if suffix in {"mil", "k"}:
+        return number * 1_000
     return number
 
-def _strip_html(raw_html):
-    if not raw_html:
-        return ""
-    text = re.sub(r"(?is)<(script|style).*?>.*?</\1>", " ", raw_html)
-    text = re.sub(r"(?is)<[^>]+>", " ", text)
-    text = html_lib.unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+_TAG_RE = re.compile(r"<[^>]*>")
+_SKIP_OPEN_RE = re.compile(r"<(script|style)\b", re.IGNORECASE)
+_SKIP_CLOSE_RE = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in ("script", "style")
+}
+_WHITESPACE_RE = re.compile(r"\s+")
+# Escala opcional depois de um valor em reais ou de uma contagem. Só palavras de
+# escala: um [a-zA-Z]* engoliria o começo do rótulo seguinte ("12.345 VAL. PATRIMONIAL").
+_SCALE = r"(?:\s*(?:milh\w*|mil|mi|bilh\w*|bi|[KMB])\b)?"
+_INVESTIDOR10_FIELDS_RE = re.compile(
+    # O lookahead com as iniciais dos rótulos deixa a regex descartar rápido
+    # as posições que não podem começar nenhum campo.
+    r"(?=[PDLVCN])(?:"
+    r"\bP/VP\b[:\s]*(?P<pvp>[0-9][0-9\.\,]+)"
+    r"|\bDY\s*\(12M\)\s*(?P<dy>[0-9][0-9\.\,]+)"
+    r"|Dividend\s*Y(?:ield|eld)(?=.{0,80}?(?P<dy_alt>[0-9][0-9\.\,]+)\s*%)"
+    r"|Liquidez\s*Di[áa]ria\s*R\$\s*(?P<liquidez>[0-9\.\,]+" + _SCALE + r")"
+    r"|VAL(?:\.|OR)?\s*PATRIMONIAL\s*P/\s*COTA\s*R\$\s*(?P<nav>[0-9\.\,]+)"
+    r"|VALOR\s*PATRIMONIAL\s*R\$\s*(?P<equity>[0-9\.\,]+" + _SCALE + r")"
+    r"|COTAS\s*EMITIDAS\s*(?P<shares>[0-9\.\,]+" + _SCALE + r")"
+    r"|N[ÚU]MERO\s*DE\s*COTAS\s*(?P<shares_alt>[0-9\.\,]+" + _SCALE + r")"
+    r"|Cotação\s*R\$\s*(?P<price>[0-9\.\,]+)"
+    r")",
+    re.IGNORECASE,
+)
+# grupo da regex -> (métrica, parser, prioridade); prioridade 0 vence os rótulos alternativos
+_INVESTIDOR10_FIELDS = {
+    "pvp": ("pvp", _parse_pt_number, 0),
+    "dy": ("dividend_yield", _parse_pt_number, 0),
+    "dy_alt": ("dividend_yield", _parse_pt_number, 1),
+    "liquidez": ("liquidez_brl", _parse_brl_value, 0),
+    "nav": ("book_value", _parse_pt_number, 0),
+    "equity": ("equity", _parse_brl_value, 0),
+    "shares": ("shares_outstanding", _parse_brl_value, 0),
+    "shares_alt": ("shares_outstanding", _parse_brl_value, 1),
+    "price": ("price", _parse_pt_number, 0),
+}
+_INVESTIDOR10_METRICS = {metric for metric, _, _ in _INVESTIDOR10_FIELDS.values()}
+
+
+class _Investidor10Scanner:
+    # Converte o HTML em texto aos pedaços e procura todos os rótulos com uma
+    # única regex combinada, sem nunca guardar a página inteira em memória.
+    # Só aceita um match longe do fim do buffer, pois o número pode continuar
+    # no próximo pedaço.
+    OVERLAP = 160
+
+    def __init__(self):
+        self.metrics = {}
+        self._priority = {}
+        self._pending = ""
+        self._skip = None
+        self._text = ""
+        self._scan_from = 0
+
+    @property
+    def done(self):
+        return all(self._priority.get(metric) == 0 for metric in _INVESTIDOR10_METRICS)
+
+    def feed(self, chunk):
+        self._text += self._to_text(chunk, final=False)
+        self._scan(final=False)
+
+    def close(self):
+        self._text += self._to_text("", final=True)
+        self._scan(final=True)
+        self._text = ""
+        return self.metrics
+
+    def _to_text(self, chunk, final):
+        data = self._pending + chunk
+        self._pending = ""
+        pieces = []
+        pos = 0
+        while pos < len(data):
+            if self._skip:
+                closing = _SKIP_CLOSE_RE[self._skip].search(data, pos)
+                if closing is None:
+                    if not final:
+                        self._pending = data[max(pos, len(data) - 16):]
+                    pos = len(data)
+                    break
+                self._skip = None
+                pieces.append(" ")
+                pos = closing.end()
+                continue
+            opening = _SKIP_OPEN_RE.search(data, pos)
+            segment = data[pos:opening.start() if opening else len(data)]
+            if not final:
+                lt = segment.rfind("<")
+                if lt != -1 and segment.find(">", lt) == -1:
+                    self._pending = segment[lt:] + (data[opening.start():] if opening else "")
+                    segment = segment[:lt]
+                    opening = None
+                    pos = len(data)
+            pieces.append(_TAG_RE.sub(" ", segment))
+            if opening is None:
+                break
+            self._skip = opening.group(1).lower()
+            pos = opening.end()
+
+        text = "".join(pieces)
+        if not final:
+            amp = text.rfind("&")
+            if amp != -1 and ";" not in text[amp:] and len(text) - amp < 12:
+                self._pending = text[amp:] + self._pending
+                text = text[:amp]
+        return _WHITESPACE_RE.sub(" ", html_lib.unescape(text))
+
+    def _scan(self, final):
+        text = self._text
+        limit = len(text) if final else len(text) - self.OVERLAP
+        resume = max(limit, self._scan_from)
+        for match in _INVESTIDOR10_FIELDS_RE.finditer(text, self._scan_from):
+            if match.end() > limit:
+                resume = match.start()
+                break
+            metric, parser, priority = _INVESTIDOR10_FIELDS[match.lastgroup]
+            current = self._priority.get(metric)
+            if current is None or priority < current:
+                self.metrics[metric] = parser(match.group(match.lastgroup))
+                self._priority[metric] = priority
+            resume = match.end()
+        else:
+            resume = max(resume, limit)
+        # Mantém um caractere antes do ponto de retomada para o \b funcionar.
+        keep = max(resume - 1, 0)
+        self._text = text[keep:]
+        self._scan_from = resume - keep
 
 
 def _as_float(value):
+    import pandas as pd
     if value is None or (isinstance(value, float) and math.isnan(value)):
         return float("nan")
     if isinstance(value, pd.Series):
@@ -97,6 +553,7 @@ def _format_currency(value):
     return f"R$ {value:.2f}"
 
 def _normalize_columns(df, symbol):
+    import pandas as pd
     if not isinstance(df.columns, pd.MultiIndex):
         return df
     if symbol in df.columns.get_level_values(-1):
@@ -104,22 +561,80 @@ def _normalize_columns(df, symbol):
     return df.droplevel(-1, axis=1)
 
 def _prepare_yfinance_cache():
+    # Uma vez por processo. Os timeouts ficam em cada requisição (yf.download e
+    # http_client) em vez de socket.setdefaulttimeout para o processo inteiro.
+    global _YFINANCE_CACHE_READY
+    if _YFINANCE_CACHE_READY:
+        return
+    import yfinance.cache as yf_cache
     cache_dir = os.path.join(os.path.dirname(__file__), ".cache")
     os.makedirs(cache_dir, exist_ok=True)
     yf_cache.set_cache_location(cache_dir)
-    socket.setdefaulttimeout(DEFAULT_TIMEOUT)
+    _YFINANCE_CACHE_READY = True
 
 def _get_brapi_client():
     global _BRAPI_CLIENT
     if _BRAPI_CLIENT is not None:
         return _BRAPI_CLIENT
+    from brapi import Brapi
+    import http_client
     token = os.getenv("BRAPI_TOKEN") or os.getenv("BRAPI_API_KEY")
     try:
-        _BRAPI_CLIENT = Brapi(api_key=token) if token else Brapi()
+        # Mesmo pool keep-alive do resto do bot, com timeout por requisição.
+        options = {"http_client": http_client.get_client(), "timeout": DEFAULT_TIMEOUT}
+        _BRAPI_CLIENT = Brapi(api_key=token, **options) if token else Brapi(**options)
     except Exception:
         _BRAPI_CLIENT = None
     return _BRAPI_CLIENT
 
+def _get_fetch_executor():
+    global _FETCH_EXECUTOR
+    if _FETCH_EXECUTOR is not None:
+        return _FETCH_EXECUTOR
+    with _FETCH_EXECUTOR_LOCK:
+        if _FETCH_EXECUTOR is None:
+            _FETCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=FETCH_WORKERS,
+                thread_name_prefix="investbot-fetch",
+            )
+    return _FETCH_EXECUTOR
+
+def _submit(fn, *args, **kwargs):
+    return _get_fetch_executor().submit(fn, *args, **kwargs)
+
+def _request_timeout(deadline):
+    # Timeout de uma requisição: o padrão, limitado ao que resta do prazo de
+    # quem pediu (<= 0: nem vale começar). Um future que já está rodando não
+    # pode ser cancelado, então é isto que impede a thread de trabalhar para
+    # um comando que já respondeu.
+    if deadline is None:
+        return DEFAULT_TIMEOUT
+    return min(DEFAULT_TIMEOUT, deadline - time.monotonic())
+
+def _collect(futures, deadline, stage="fetch"):
+    # Espera até o prazo final; o que não chegou a tempo fica de fora do relatório.
+    pending = [future for future in futures.values() if future is not None]
+    if pending:
+        with metrics.span(f"wait.{stage}"):
+            wait(pending, timeout=max(deadline - time.monotonic(), 0))
+    results = {}
+    for key, future in futures.items():
+        if future is None:
+            continue
+        if not future.done():
+            # cancel() só tira da fila o que ainda não começou; o que já está
+            # rodando segue em segundo plano até o timeout da própria requisição.
+            if not future.cancel():
+                metrics.count("abandoned", stage=stage)
+            metrics.deadline_expired(stage)
+            continue
+        try:
+            results[key] = future.result()
+        except Exception as exc:
+            metrics.error(stage, exc)
+            continue
+    return results
+
 def _brapi_get(data, *keys):
     if data is None:
         return None
@@ -146,91 +661,213 @@ def _brapi_to_dict(item):
         return item.__dict__
     return None
 
-def _request_html(url, timeout=DEFAULT_TIMEOUT):
-    try:
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-            },
-        )
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read()
-        return raw.decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
-def _fetch_investidor10_html(ticker):
-    if not _env_truthy("USE_INVESTIDOR10", default=True):
-        return None
-    url = f"{INVESTIDOR10_BASE_URL}/{ticker.lower()}/"
-    return _request_html(url)
-
 def _extract_investidor10_metrics(html):
     if not html:
         return {}
-    metrics = {}
-    text = _strip_html(html)
-
-    pvp_match = re.search(r"\bP/VP\b[:\s]*([0-9][0-9\.\,]+)", text, re.IGNORECASE)
-    if pvp_match:
-        metrics["pvp"] = _parse_pt_number(pvp_match.group(1))
-
-    dy_match = re.search(r"\bDY\s*\(12M\)\s*([0-9][0-9\.\,]+)", text, re.IGNORECASE)
-    if not dy_match:
-        dy_match = re.search(r"Dividend\s*Y(?:ield|eld).*?([0-9][0-9\.\,]+)\s*%", text, re.IGNORECASE)
-    if dy_match:
-        metrics["dividend_yield"] = _parse_pt_number(dy_match.group(1))
-
-    liq_match = re.search(r"Liquidez\s*Di[áa]ria\s*R\$\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
-    if liq_match:
-        metrics["liquidez_brl"] = _parse_brl_value(liq_match.group(1))
-
-    nav_match = re.search(r"VAL(?:\.|OR)?\s*PATRIMONIAL\s*P/\s*COTA\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
-    if not nav_match:
-        nav_match = re.search(r"VALOR\s*PATRIMONIAL\s*P/\s*COTA\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
-    if nav_match:
-        metrics["book_value"] = _parse_pt_number(nav_match.group(1))
-
-    patr_match = re.search(r"VALOR\s*PATRIMONIAL\s*R\$\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
-    if patr_match:
-        metrics["equity"] = _parse_brl_value(patr_match.group(1))
-
-    shares_match = re.search(r"COTAS\s*EMITIDAS\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
-    if not shares_match:
-        shares_match = re.search(r"N[ÚU]MERO\s*DE\s*COTAS\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
-    if shares_match:
-        metrics["shares_outstanding"] = _parse_brl_value(shares_match.group(1))
-
-    price_match = re.search(r"Cotação\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
-    if price_match:
-        metrics["price"] = _parse_pt_number(price_match.group(1))
-
-    return metrics
-
-def _fetch_brapi_quote(ticker, range_value=None, interval=None, modules=None):
+    scanner = _Investidor10Scanner()
+    scanner.feed(html)
+    return scanner.close()
+
+async def _scan_investidor10(ticker):
+    import http_client
+    url = f"{INVESTIDOR10_BASE_URL}/{ticker.lower()}/"
+    scanner = _Investidor10Scanner()
+    breaker = _BREAKERS["investidor10"]
+    if not _source_allowed("investidor10"):
+        return {}
+    try:
+        await _RATE_LIMITS["investidor10"].acquire_async()
+        with metrics.span("investidor10.page"):
+            async with aclosing(http_client.astream_text(url, timeout=DEFAULT_TIMEOUT)) as chunks:
+                async for chunk in chunks:
+                    scanner.feed(chunk)
+                    # Todos os campos encontrados: o resto da página nem é baixado.
+                    if scanner.done:
+                        break
+    except Exception as exc:
+        breaker.failure(exc)
+    except BaseException:
+        breaker.abandon()
+        raise
+    else:
+        breaker.success()
+    return scanner.close()
+
+async def _scan_investidor10_many(tickers, timeout):
+    import asyncio
+    tasks = {ticker: asyncio.ensure_future(_scan_investidor10(ticker)) for ticker in tickers}
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(timeout, 0))
+    for task in pending:
+        task.cancel()
+    if pending:
+        metrics.deadline_expired("investidor10.page", len(pending))
+    return {ticker: task.result() for ticker, task in tasks.items() if task in done}
+
+def _chunked(items, size):
+    size = max(int(size), 1)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _unique_tickers(tickers):
+    unique = []
+    for ticker in tickers:
+        ticker = (ticker or "").strip().upper()
+        if ticker and ticker not in unique:
+            unique.append(ticker)
+    return unique
+
+# Mensagem de um 4xx da brapi que recusa o pedido pelo plano (range, módulos,
+# intervalo) e não pelo ticker ou pelo token.
+_BRAPI_PLAN_RE = re.compile(r"plano|\bplan\b|upgrade|permiss|n[ãa]o permite|not allowed|m[óo]dulo|module|range|intervalo", re.IGNORECASE)
+
+def _is_brapi_refusal(exc):
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int) or not 400 <= status < 500 or status in (404, 429):
+        return False
+    message = f"{getattr(exc, 'message', '')} {getattr(exc, 'body', '')}"
+    return bool(_BRAPI_PLAN_RE.search(message))
+
+def _request_brapi_quotes(tickers, params, deadline=None):
+    # (cotações, tickers recusados). Recusados são só os lotes que a brapi
+    # respondeu com erro de plano; timeout, 5xx, ticker desconhecido ou
+    # circuito aberto só deixam os tickers de fora desta vez.
     client = _get_brapi_client()
-    if not client:
-        return None
-    params = {}
+    if not client or not tickers:
+        return {}, []
+    kind = "+".join(["quote"] + ["history"] * ("range" in params) + ["fundamentals"] * ("modules" in params))
+    quotes, refused = {}, []
+    for batch in _chunked(list(tickers), BRAPI_BATCH_SIZE):
+        if _request_timeout(deadline) <= 0:
+            metrics.deadline_expired("brapi.request")
+            break
+        if not _source_allowed("brapi"):
+            break
+        try:
+            _throttle("brapi")
+            timeout = _request_timeout(deadline)
+            if timeout <= 0:
+                _BREAKERS["brapi"].abandon()
+                metrics.deadline_expired("brapi.request")
+                break
+            with metrics.span(f"brapi.{kind}"):
+                data = client.quote.retrieve(tickers=",".join(batch), timeout=timeout, **params)
+        except Exception as exc:
+            _BREAKERS["brapi"].failure(exc)
+            if _is_brapi_refusal(exc):
+                refused.extend(batch)
+            continue
+        _BREAKERS["brapi"].success()
+        if not data:
+            continue
+        for result in _brapi_get(data, "results") or []:
+            symbol = str(_brapi_get(result, "symbol") or "").upper()
+            if symbol in batch:
+                quotes[symbol] = result
+            elif len(batch) == 1:
+                quotes[batch[0]] = result
+    return quotes, refused
+
+def _parse_brapi_quote(quote):
+    # Cada resposta é lida uma vez: preço, indicadores, patrimônio e o
+    # histórico (vazio quando a chamada não pediu range).
+    return {
+        "price": _extract_brapi_price(quote),
+        "metrics": _extract_brapi_metrics(quote),
+        "equity": _extract_brapi_equity(quote),
+        "history": _brapi_history_to_df(quote),
+    }
+
+def _brapi_parts(ticker, range_value, interval, modules):
+    # (classe, chave de cache) de cada parte coberta por uma chamada.
+    parts = [("price", ("brapi", ticker, None, None, None))]
     if range_value:
-        params["range"] = range_value
-    if interval:
-        params["interval"] = interval
+        parts.append(("history", ("brapi", ticker, range_value, interval, None)))
     if modules:
-        params["modules"] = modules
-    try:
-        data = client.quote.retrieve(tickers=ticker, **params)
-    except Exception:
-        return None
-    if not data:
-        return None
-    results = _brapi_get(data, "results") or []
-    if not results:
-        return None
-    return results[0]
+        parts.append(("fundamentals", ("brapi", ticker, None, None, modules)))
+    return parts
+
+def _merge_brapi_parts(parts):
+    quote = parts.get("price") or parts.get("fundamentals") or parts.get("history")
+    fundamentals = parts.get("fundamentals") or quote
+    history = parts.get("history")
+    return {
+        "price": quote["price"],
+        "metrics": fundamentals["metrics"],
+        "equity": fundamentals["equity"],
+        "history": history["history"] if history else None,
+    }
+
+def _fetch_brapi(tickers, ranges=None, interval="1d", fundamentals=(), deadline=None):
+    # Plano de requisições: para cada ticker, tudo o que ainda falta no cache
+    # (cotação, histórico no range pedido e, para os tickers em fundamentals,
+    # os módulos) sai numa chamada só, e a resposta abastece o cache de cada
+    # parte com a validade dela.
+    ranges = ranges or {}
+    fundamentals = set(fundamentals)
+    found, plans = {}, {}
+    for ticker in tickers:
+        modules = BRAPI_FUNDAMENTAL_MODULES if ticker in fundamentals else None
+        parts = {}
+        for data_class, key in _brapi_parts(ticker, ranges.get(ticker), interval, modules):
+            hit, value = _CACHE.get(data_class, key)
+            if hit:
+                parts[data_class] = value
+        found[ticker] = parts
+        plan = (
+            ranges.get(ticker) if "history" not in parts else None,
+            modules if "fundamentals" not in parts else None,
+        )
+        if plan != (None, None) or "price" not in parts:
+            plans.setdefault(plan, []).append(ticker)
+
+    pending = [(plan, group, []) for plan, group in plans.items()]
+    while pending:
+        (range_value, plan_modules), group, dropped = pending.pop()
+        params = {"range": range_value, "interval": interval} if range_value else {}
+        if plan_modules:
+            params["modules"] = plan_modules
+        refused = set()
+
+        def request(missing, params=params):
+            quotes, rejected = _request_brapi_quotes(missing, params, deadline)
+            refused.update(rejected)
+            return {ticker: _parse_brapi_quote(quote) for ticker, quote in quotes.items()}
+
+        fetched = _cached_batch(
+            "brapi-plan",
+            group,
+            lambda ticker: ("brapi", ticker, range_value, interval, plan_modules),
+            request,
+            deadline,
+        )
+        for ticker, parsed in fetched.items():
+            for data_class, key in _brapi_parts(ticker, range_value, interval, plan_modules):
+                _CACHE.set(data_class, key, parsed)
+                found[ticker][data_class] = parsed
+            for data_class, dropped_range, dropped_modules in dropped:
+                key = dict(_brapi_parts(ticker, dropped_range, interval, dropped_modules))[data_class]
+                _CACHE.set("refused", key, None)
+        # Chamada combinada recusada pelo plano da brapi (sem esse range ou sem
+        # módulos): só os tickers daquele lote tentam de novo pedindo menos,
+        # primeiro sem o histórico. Falha de rede não reduz o plano.
+        missing = [ticker for ticker in group if ticker in refused and ticker not in fetched]
+        if missing and range_value:
+            pending.append(((None, plan_modules), missing, dropped + [("history", range_value, None)]))
+        elif missing and plan_modules:
+            pending.append(((None, None), missing, dropped + [("fundamentals", None, plan_modules)]))
+        if missing and (range_value or plan_modules):
+            metrics.count("fallbacks", len(missing), metric="brapi.plan")
+    # Partes recusadas ficam no cache como None e não contam como resposta.
+    return {ticker: _merge_brapi_parts(parts) for ticker, parts in found.items() if any(parts.values())}
+
+def _submit_brapi(tickers, ranges=None, interval="1d", fundamentals=(), deadline=None):
+    return {
+        index: _submit(_fetch_brapi, batch, ranges, interval, fundamentals, deadline)
+        for index, batch in enumerate(_chunked(list(tickers), BRAPI_BATCH_SIZE))
+    }
 
 def _brapi_history_to_df(quote):
+    import pandas as pd
     if not quote:
         return pd.DataFrame()
     items = _brapi_get(quote, "historicalDataPrice", "historical_data_price") or []
@@ -265,14 +902,12 @@ def _brapi_history_to_df(quote):
         df = df[keep_cols]
     return df.sort_index()
 
-def _extract_brapi_price(quote, df=None):
+def _extract_brapi_price(quote):
     if not quote:
         return float("nan")
     price = _as_float(_brapi_get(quote, "regularMarketPrice", "regular_market_price"))
     if math.isnan(price):
         price = _as_float(_brapi_get(quote, "regularMarketPreviousClose", "regular_market_previous_close"))
-    if math.isnan(price) and df is not None and not df.empty and "Close" in df.columns:
-        price = _as_float(df["Close"].iloc[-1])
     return price
 
 def _extract_brapi_metrics(quote):
@@ -309,6 +944,7 @@ def _extract_brapi_metrics(quote):
     }
 
 def _extract_brapi_equity(quote):
+    import pandas as pd
     history = _brapi_get(quote, "balanceSheetHistory", "balance_sheet_history") or []
     rows = []
     for item in history:
@@ -363,13 +999,6 @@ def _select_price(primary, secondary, prefer_primary=True):
         return secondary
     return float("nan")
 
-def _select_metric(primary, secondary):
-    if _is_nan(primary) and _is_nan(secondary):
-        return float("nan")
-    if _is_nan(primary):
-        return secondary
-    return primary
-
 def _clean_price(value):
     if value is None:
         return None
@@ -380,181 +1009,816 @@ def _clean_price(value):
         pass
     return value
 
-def _fetch_yahoo_price(symbol):
+def _fetch_yahoo_price(symbol, deadline=None):
+    return _cached("price", ("yahoo-price", symbol, None, None, None), lambda: _request_yahoo_price(symbol, deadline), deadline)
+
+def _request_yahoo_price(symbol, deadline=None):
+    import yfinance as yf
+    if _request_timeout(deadline) <= 0:
+        metrics.deadline_expired("yahoo.price")
+        return float("nan")
+    if not _source_allowed("yahoo"):
+        return float("nan")
     try:
-        ticker_obj = yf.Ticker(symbol)
-        fast_info = getattr(ticker_obj, "fast_info", None)
-        if fast_info:
-            for key in ("lastPrice", "last_price", "regularMarketPrice", "regular_market_price"):
-                if key in fast_info and fast_info[key] is not None:
-                    return _as_float(fast_info[key])
-        info = ticker_obj.info or {}
-        return _as_float(
-            info.get("regularMarketPrice")
-            or info.get("currentPrice")
-            or info.get("previousClose")
+        _throttle("yahoo")
+        with metrics.span("yahoo.price"):
+            price = _read_yahoo_price(yf.Ticker(symbol))
+    except Exception as exc:
+        _BREAKERS["yahoo"].failure(exc)
+        return float("nan")
+    _BREAKERS["yahoo"].success()
+    return price
+
+def _read_yahoo_price(ticker_obj):
+    fast_info = getattr(ticker_obj, "fast_info", None)
+    if fast_info:
+        for key in ("lastPrice", "last_price", "regularMarketPrice", "regular_market_price"):
+            if key in fast_info and fast_info[key] is not None:
+                return _as_float(fast_info[key])
+    info = ticker_obj.info or {}
+    return _as_float(
+        info.get("regularMarketPrice")
+        or info.get("currentPrice")
+        or info.get("previousClose")
+    )
+
+def _download_history_batch(batch, period="1y", interval="1d", start=None, adjusted=True, deadline=None):
+    data_class = "price" if start is None and period in {"1d", "5d"} else "history"
+    source = "yahoo" if adjusted else "yahoo-raw"
+    return _cached_batch(
+        data_class,
+        batch,
+        lambda ticker: (source, ticker, str(start) if start is not None else period, interval, None),
+        lambda missing: _request_yahoo_history(missing, period, interval, start, adjusted, deadline),
+        deadline,
+    )
+
+class _YahooErrorLog:
+    # O yf.download não levanta exceção: os erros de cada símbolo só aparecem
+    # no log "yfinance", emitido pela própria thread que chamou o download.
+    # O handler guarda essas mensagens por thread enquanto a captura está ativa.
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def _install(self):
+        import logging
+        with self._lock:
+            if self._installed:
+                return
+            local = self._local
+
+            class _Handler(logging.Handler):
+                def emit(self, record):
+                    messages = getattr(local, "messages", None)
+                    if messages is not None:
+                        messages.append(record.getMessage())
+
+            logging.getLogger("yfinance").addHandler(_Handler(logging.ERROR))
+            self._installed = True
+
+    def __enter__(self):
+        self._install()
+        self._local.messages = []
+        return self._local.messages
+
+    def __exit__(self, *exc):
+        self._local.messages = None
+        return False
+
+
+_YAHOO_ERRORS = _YahooErrorLog()
+# Erros do yfinance que indicam a fonte fora do ar; "possibly delisted", "no price
+# data found" e 404 são só o ticker sem dados.
+_YAHOO_OUTAGE_RE = re.compile(
+    r"time[d ]?\s*out|connection|too many requests|rate ?limit|\b429\b|server error|bad gateway"
+    r"|service unavailable|(?:http error|status(?: code)?)\W*5\d\d|curl",
+    re.IGNORECASE,
+)
+
+def _yahoo_outage(messages):
+    return any(_YAHOO_OUTAGE_RE.search(message) for message in messages)
+
+def _request_yahoo_history(batch, period, interval, start, adjusted=True, deadline=None):
+    import pandas as pd
+    import yfinance as yf
+    symbols = [f"{ticker}.SA" for ticker in batch]
+    window = {"start": start.strftime("%Y-%m-%d")} if start is not None else {"period": period}
+    if not adjusted:
+        # Preço efetivamente negociado (só ajustado por desdobramentos) e proventos em coluna própria.
+        window.update(auto_adjust=False, actions=True)
+    if _request_timeout(deadline) <= 0:
+        metrics.deadline_expired("yahoo.request")
+        return {}
+    if not _source_allowed("yahoo"):
+        return {}
+    try:
+        _throttle("yahoo")
+        timeout = _request_timeout(deadline)
+        if timeout <= 0:
+            _BREAKERS["yahoo"].abandon()
+            metrics.deadline_expired("yahoo.request")
+            return {}
+        with metrics.span("yahoo.history"), _YAHOO_ERRORS as errors:
+            df = yf.download(
+                symbols if len(symbols) > 1 else symbols[0],
+                interval=interval,
+                **window,
+                progress=False,
+                timeout=timeout,
+                threads=len(symbols) > 1,
+            )
+    except Exception as exc:
+        _BREAKERS["yahoo"].failure(exc)
+        return {}
+    # Lote vazio também é a resposta para ticker digitado errado ou deslistado:
+    # só conta como falha da fonte com timeout, 429 ou 5xx no log do yfinance.
+    if df is None or df.empty:
+        if _yahoo_outage(errors):
+            _BREAKERS["yahoo"].failure()
+        else:
+            _BREAKERS["yahoo"].success()
+        return {}
+    _BREAKERS["yahoo"].success()
+    frames = {}
+    for ticker, symbol in zip(batch, symbols):
+        if isinstance(df.columns, pd.MultiIndex) and symbol not in df.columns.get_level_values(-1):
+            continue
+        frame = _normalize_columns(df, symbol)
+        if "Close" in frame.columns:
+            frame = frame.dropna(subset=["Close"])
+        frames[ticker] = frame
+    return frames
+
+def _submit_history_downloads(tickers, period="1y", interval="1d", start=None, adjusted=True, deadline=None):
+    return {
+        (start, index): _submit(_download_history_batch, batch, period, interval, start, adjusted, deadline)
+        for index, batch in enumerate(_chunked(list(tickers), YAHOO_BATCH_SIZE))
+    }
+
+def _merge_batches(results):
+    merged = {}
+    for batch in results.values():
+        merged.update(batch or {})
+    return merged
+
+_BRAPI_RANGES = [
+    ("5d", 5),
+    ("1mo", 31),
+    ("3mo", 92),
+    ("6mo", 183),
+    ("1y", 366),
+    ("2y", 731),
+    ("5y", 1827),
+    ("10y", 3653),
+]
+
+def _period_start(period):
+    import pandas as pd
+    today = pd.Timestamp.now().normalize()
+    if period == "max":
+        return pd.Timestamp(0)
+    if period == "ytd":
+        return today.replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period or "")
+    if not match:
+        return today - pd.DateOffset(years=1)
+    amount = int(match.group(1))
+    unit = match.group(2)
+    if unit == "d":
+        return today - pd.Timedelta(days=amount)
+    if unit == "wk":
+        return today - pd.Timedelta(weeks=amount)
+    if unit == "mo":
+        return today - pd.DateOffset(months=amount)
+    return today - pd.DateOffset(years=amount)
+
+def _brapi_range_for(start):
+    import pandas as pd
+    days = (pd.Timestamp.now().normalize() - start).days + 1
+    for range_value, range_days in _BRAPI_RANGES:
+        if days <= range_days:
+            return range_value
+    return "max"
+
+def _fetch_histories(tickers, period, interval, deadline, with_brapi=False, fundamentals=()):
+    # Só busca na rede o que falta no store local: tickers novos baixam o
+    # período inteiro, os já conhecidos apenas as barras desde a penúltima salva.
+    # Com with_brapi, cotação, histórico reserva e (para os tickers em
+    # fundamentals) os módulos da brapi saem numa chamada só, em paralelo com o Yahoo.
+    import pandas as pd
+    import history_store
+    since = _period_start(period)
+    use_store = _env_truthy("USE_HISTORY_STORE", default=True)
+    stored, anchors = {}, {}
+    if use_store:
+        try:
+            with metrics.span("history_store.read"):
+                stored = history_store.coverage(tickers, interval)
+                anchors = history_store.anchors(tickers, interval)
+        except Exception:
+            use_store = False
+    starts = {}
+    for ticker in tickers:
+        covered = stored.get(ticker)
+        anchor = anchors.get(ticker)
+        starts[ticker] = anchor[0] if covered and anchor and covered[0] <= since else None
+    ranges = {ticker: period if starts[ticker] is None else _brapi_range_for(starts[ticker]) for ticker in tickers}
+    brapi_futures = _submit_brapi(tickers, ranges, interval, fundamentals, deadline) if with_brapi else {}
+
+    downloads = {}
+    for start in set(starts.values()):
+        group = [ticker for ticker in tickers if starts[ticker] == start]
+        downloads.update(_submit_history_downloads(group, period, interval, start, deadline=deadline))
+    fetched = _merge_batches(_collect(downloads, deadline, "yahoo.history"))
+
+    # O auto_adjust recalcula todo o passado a cada provento ou desdobramento:
+    # se a barra de sobreposição não bate com a salva, o que está no store está
+    # noutra base e o ticker baixa o período inteiro de novo, substituindo tudo.
+    rebased = [
+        ticker for ticker in tickers
+        if starts[ticker] is not None and fetched.get(ticker) is not None and not fetched[ticker].empty
+        and not _prices_match(
+            history_store.close_on(fetched[ticker], interval, anchors[ticker][0]),
+            anchors[ticker][1],
+            HISTORY_ADJUST_TOLERANCE,
         )
+    ]
+    if rebased:
+        metrics.count("refetches", len(rebased), metric="history")
+        # RSI e SMA200 em cache foram acumulados na base antiga; descartados
+        # aqui, o próximo cálculo reconstrói o estado sobre a história nova.
+        with _INDICATOR_LOCK:
+            for ticker in rebased:
+                _INDICATOR_STATES.pop(ticker, None)
+        refetched = _merge_batches(_collect(_submit_history_downloads(rebased, period, interval, deadline=deadline), deadline, "yahoo.history"))
+        for ticker in rebased:
+            df = refetched.get(ticker)
+            if df is None or df.empty:
+                fetched.pop(ticker)
+            else:
+                fetched[ticker] = df
+                starts[ticker] = None
+
+    failed = [ticker for ticker in tickers if fetched.get(ticker) is None or fetched[ticker].empty]
+    if not with_brapi and failed:
+        brapi_futures = _submit_brapi(failed, ranges, interval, deadline=deadline)
+    brapi = _merge_batches(_collect(brapi_futures, deadline, "brapi"))
+    # O histórico da brapi é reserva de uma resposta só: vem sem o mesmo ajuste
+    # do Yahoo, então não vai para o store (que só guarda barras do Yahoo).
+    fallback = {}
+    for ticker in failed:
+        df = (brapi.get(ticker) or {}).get("history")
+        if df is not None and not df.empty:
+            fallback[ticker] = df
+            metrics.count("fallbacks", metric="history")
+
+    if use_store:
+        try:
+            with metrics.span("history_store.write"):
+                for ticker, df in fetched.items():
+                    if starts[ticker] is None:
+                        history_store.append(ticker, interval, df, since=since, replace=ticker in rebased)
+                    else:
+                        history_store.append(ticker, interval, df)
+                frames = history_store.load(tickers, interval, since=since)
+        except Exception:
+            use_store = False
+    if not use_store:
+        frames = {ticker: df[df.index >= since] for ticker, df in fetched.items()}
+    for ticker, df in fallback.items():
+        # Com barras salvas, a brapi só completa o que veio depois da última delas.
+        kept = frames.get(ticker)
+        if kept is not None and not kept.empty:
+            index = history_store._index(df, interval)
+            df = df.set_axis(index)[index > kept.index[-1]]
+            df = kept if df.empty else pd.concat([kept, df.reindex(columns=kept.columns)])
+        frames[ticker] = df[df.index >= since]
+    return frames, brapi
+
+def get_history_batch(tickers, period="1y", interval="1d", deadline=None):
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
+    try:
+        _prepare_yfinance_cache()
     except Exception:
-        return float("nan")
+        pass
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    frames, _ = _fetch_histories(tickers, period, interval, deadline)
+    return frames
 
-def get_price_details(ticker):
-    ticker = ticker.upper()
-    symbol = f"{ticker}.SA"
+def get_monthly_history_batch(tickers, start, deadline=None):
+    # Barras mensais sem ajuste de proventos, com a coluna Dividends: é o que
+    # uma simulação de aportes precisa (o histórico diário vem ajustado).
+    import pandas as pd
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
     try:
         _prepare_yfinance_cache()
     except Exception:
         pass
-    yahoo_price = _fetch_yahoo_price(symbol)
-    brapi_quote = _fetch_brapi_quote(ticker)
-    brapi_price = _extract_brapi_price(brapi_quote)
-    price = _select_price(yahoo_price, brapi_price, prefer_primary=True)
-    if math.isnan(price):
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    futures = _submit_history_downloads(tickers, interval="1mo", start=pd.Timestamp(start), adjusted=False, deadline=deadline)
+    return _merge_batches(_collect(futures, deadline, "yahoo.history"))
+
+def get_intraday_history_batch(tickers, period, interval, deadline=None):
+    # Barras de 1m/5m/15m direto das fontes, sem o histórico local em disco e
+    # sem o cache em memória: a única cópia que fica é a dos buffers float32 do
+    # intraday.py, que já pede só os últimos pregões a cada consulta.
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
+    try:
+        _prepare_yfinance_cache()
+    except Exception:
+        pass
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    downloads = {
+        index: _submit(_request_yahoo_history, batch, period, interval, None, True, deadline)
+        for index, batch in enumerate(_chunked(tickers, YAHOO_BATCH_SIZE))
+    }
+    frames = _merge_batches(_collect(downloads, deadline, "yahoo.history"))
+    failed = [ticker for ticker in tickers if frames.get(ticker) is None or frames[ticker].empty]
+    if failed:
+        params = {"range": period, "interval": interval}
+        requests = {
+            index: _submit(_request_brapi_quotes, batch, params, deadline)
+            for index, batch in enumerate(_chunked(failed, BRAPI_BATCH_SIZE))
+        }
+        for quotes, _ in _collect(requests, deadline, "brapi").values():
+            for ticker, quote in quotes.items():
+                df = _brapi_history_to_df(quote)
+                if ticker in failed and not df.empty:
+                    frames[ticker] = df
+                    metrics.count("fallbacks", metric="intraday")
+    return frames
+
+def _fetch_yahoo_info(symbol, deadline=None):
+    def _fetch():
+        import yfinance as yf
+        if _request_timeout(deadline) <= 0:
+            metrics.deadline_expired("yahoo.info")
+            return {}
+        if not _source_allowed("yahoo"):
+            return {}
+        try:
+            _throttle("yahoo")
+            with metrics.span("yahoo.info"):
+                info = yf.Ticker(symbol).info or {}
+        except Exception as exc:
+            _BREAKERS["yahoo"].failure(exc)
+            return {}
+        _BREAKERS["yahoo"].success()
+        return info
+    return _cached("fundamentals", ("yahoo-info", symbol, None, None, None), _fetch, deadline)
+
+def _close_panel(frames):
+    # Alinha as séries pela posição (última barra em comum), não pela data,
+    # para que feriados ou horários diferentes entre fontes não abram buracos.
+    import numpy as np
+    import pandas as pd
+    length = max((len(df) for df in frames.values()), default=0)
+    panel = np.full((length, len(frames)), np.nan)
+    for column, df in enumerate(frames.values()):
+        values = pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=float)
+        if len(values):
+            panel[length - len(values):, column] = values
+    return panel
+
+def _advance_indicator_state(ticker, df, sma_length):
+    # Reaproveita o estado da última análise: reescreve a barra que estava em
+    # aberto e aplica só as barras novas, em O(1) cada.
+    import pandas as pd
+    cached = _INDICATOR_STATES.get(ticker)
+    if cached is None:
         return None
-    match = None
-    if not math.isnan(yahoo_price) and not math.isnan(brapi_price):
-        match = _prices_match(yahoo_price, brapi_price)
+    last_bar, state = cached
+    if last_bar not in df.index:
+        return None
+    position = df.index.get_loc(last_bar)
+    if not isinstance(position, int):
+        return None
+    closes = pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=float)
+    new_bars = closes[position + 1:]
+    if len(new_bars) > sma_length:
+        return None
+    state.amend(closes[position:position + 1])
+    for close in new_bars:
+        state.update([close])
+    return state
+
+def _compute_indicators(frames, rsi_length=14, sma_length=200, advance_only=False):
+    # advance_only: só avança quem já tem estado (frames curtos, como os do
+    # /monitor); os demais ficam fora do resultado em vez de serem recalculados.
+    import indicators
+    if not frames:
+        return {}
+    states = {}
+    with _INDICATOR_LOCK, metrics.span("indicators"):
+        rebuild = {}
+        for ticker, df in frames.items():
+            state = _advance_indicator_state(ticker, df, sma_length)
+            if state is None:
+                rebuild[ticker] = df
+            else:
+                states[ticker] = state
+        if rebuild and not advance_only:
+            # Painel inteiro de uma vez (barras x tickers) para quem não tem estado.
+            panel_state = indicators.IndicatorState.from_history(
+                _close_panel(rebuild), rsi_length, sma_length
+            )
+            for column, ticker in enumerate(rebuild):
+                states[ticker] = panel_state.column(column)
+        for ticker, state in states.items():
+            _INDICATOR_STATES[ticker] = (frames[ticker].index[-1], state)
+            _INDICATOR_STATES.move_to_end(ticker)
+        while len(_INDICATOR_STATES) > CACHE_MAX_ENTRIES:
+            _INDICATOR_STATES.popitem(last=False)
     return {
-        "price": price,
-        "sources": {
-            "yahoo": _clean_price(yahoo_price),
-            "brapi": _clean_price(brapi_price),
-        },
-        "match": match,
+        ticker: (_as_float(state.rsi[0]), _as_float(state.sma[0]))
+        for ticker, state in states.items()
     }
 
+def _latest_closes(frames):
+    prices = {}
+    for ticker, df in frames.items():
+        if df.empty or "Close" not in df.columns:
+            continue
+        prices[ticker] = _as_float(df["Close"].iloc[-1])
+    return prices
+
+def _price_source(yahoo_price, brapi_price):
+    # Mesma preferência do _select_price(prefer_primary=True).
+    if not math.isnan(yahoo_price):
+        return "yahoo"
+    if not math.isnan(brapi_price):
+        return "brapi"
+    return None
+
+def get_price_details_batch(tickers, deadline=None):
+    with metrics.span("preco"):
+        return _get_price_details_batch(tickers, deadline)
+
+def _get_price_details_batch(tickers, deadline):
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
+    try:
+        _prepare_yfinance_cache()
+    except Exception:
+        pass
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    downloads = _submit_history_downloads(tickers, period="5d", interval="1d", deadline=deadline)
+    quotes = _submit_brapi(tickers, deadline=deadline)
+    yahoo_prices = _latest_closes(_merge_batches(_collect(downloads, deadline, "yahoo.history")))
+    brapi = _merge_batches(_collect(quotes, deadline, "brapi"))
+    details = {}
+    for ticker in tickers:
+        yahoo_price = yahoo_prices.get(ticker, float("nan"))
+        brapi_price = (brapi.get(ticker) or {}).get("price", float("nan"))
+        fallback = False
+        if math.isnan(yahoo_price) and math.isnan(brapi_price):
+            yahoo_price = _fetch_yahoo_price(f"{ticker}.SA", deadline)
+            fallback = True
+        price = _select_price(yahoo_price, brapi_price, prefer_primary=True)
+        source = _price_source(yahoo_price, brapi_price)
+        metrics.attribute("price", source, fallback=fallback or source == "brapi")
+        if math.isnan(price):
+            continue
+        match = None
+        if not math.isnan(yahoo_price) and not math.isnan(brapi_price):
+            match = _prices_match(yahoo_price, brapi_price)
+            if not match:
+                metrics.count("price_divergence")
+        details[ticker] = {
+            "price": price,
+            "sources": {
+                "yahoo": _clean_price(yahoo_price),
+                "brapi": _clean_price(brapi_price),
+            },
+            "match": match,
+        }
+    return details
+
+def get_recent_bars(tickers, deadline=None):
+    # Últimos pregões (5d) direto do Yahoo, sem passar pelo histórico local.
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
+    try:
+        _prepare_yfinance_cache()
+    except Exception:
+        pass
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    downloads = _submit_history_downloads(tickers, period="5d", interval="1d", deadline=deadline)
+    return _merge_batches(_collect(downloads, deadline, "yahoo.history"))
+
+def get_price_details(ticker):
+    ticker = ticker.upper()
+    return get_price_details_batch([ticker]).get(ticker)
+
 def get_price(ticker):
     details = get_price_details(ticker)
     if not details:
         return None
     return details["price"]
 
-def get_analysis(ticker):
-    ticker = ticker.upper()
-    symbol = f"{ticker}.SA"
-    ticker_obj = yf.Ticker(symbol)
-    
+def _fetch_investidor10_metrics(tickers, deadline):
+    # Todas as páginas de FIIs num só event loop (http_client), reaproveitando as
+    # conexões com o Investidor10 em vez de uma thread e um handshake por ticker.
+    if not tickers or not _env_truthy("USE_INVESTIDOR10", default=True):
+        return {}
+    import http_client
+
+    def _fetch(missing):
+        timeout = deadline - time.monotonic()
+        return http_client.run(_scan_investidor10_many(missing, timeout), timeout=max(timeout, 0) + 1)
+
+    return _cached_batch("fundamentals", tickers, lambda ticker: ("investidor10", ticker, None, None, None), _fetch, deadline)
+
+def _load_fundamentals(tickers):
+    # ({ticker: (idade em segundos, Fundamentals, precisa atualizar)}, rotas).
+    # Fundamentos só valem até FUNDAMENTALS_MAX_AGE; incompletos são servidos,
+    # mas já pedem atualização. A rota (fontes que responderam da última vez)
+    # vale por SOURCE_ROUTE_TTL, mesmo com os números vencidos.
+    if not tickers or not _env_truthy("USE_FUNDAMENTALS_STORE", default=True):
+        return {}, {}
+    import fundamentals_store
+    try:
+        with metrics.span("fundamentals_store.read"):
+            rows = fundamentals_store.load(tickers)
+    except Exception:
+        return {}, {}
+    use_routes = _env_truthy("USE_SOURCE_ROUTING", default=True)
+    now = time.time()
+    stored, routes = {}, {}
+    for ticker, (fetched_at, complete, data) in rows.items():
+        record = resolver.Fundamentals.from_dict(data)
+        age = max(now - fetched_at, 0.0)
+        if age <= FUNDAMENTALS_MAX_AGE:
+            stored[ticker] = (age, record, age > FUNDAMENTALS_FRESH or not complete)
+        if use_routes and record.sources and record.probed_at and now - record.probed_at <= SOURCE_ROUTE_TTL:
+            routes[ticker] = (frozenset(record.sources), record.probed_at)
+    return stored, routes
+
+def _routed(routes, ticker, source):
+    # Sem rota conhecida, todas as fontes estão na rota.
+    route = routes.get(ticker)
+    return route is None or source in route[0]
+
+def _source_available(ticker, source):
+    if source == "investidor10":
+        return ticker.endswith("11") and _env_truthy("USE_INVESTIDOR10", default=True)
+    return True
+
+def _brapi_payload(view):
+    return dict(view["metrics"], equity=view["equity"]) if view else {}
+
+def _fetch_fundamental_source(source, tickers, deadline):
+    if source == "yahoo":
+        futures = {ticker: _submit(_fetch_yahoo_info, f"{ticker}.SA", deadline) for ticker in tickers}
+        return _collect(futures, deadline, "yahoo.info")
+    if source == "brapi":
+        views = _merge_batches(_collect(_submit_brapi(tickers, fundamentals=tickers, deadline=deadline), deadline, "brapi"))
+        return {ticker: _brapi_payload(view) for ticker, view in views.items()}
+    return _fetch_investidor10_metrics(tickers, deadline)
+
+def _resolve_batch(tickers, deadline, routes, info_futures=None, brapi=None):
+    # Resolve os fundamentos pelo plano do resolver. info_futures e brapi são
+    # o que já foi pedido junto com o histórico; o resto é buscado sob demanda,
+    # fonte a fonte (primeiro as da rota do ticker, depois as demais), e só
+    # para quem ainda tem métrica do score sem valor.
+    info_futures = info_futures or {}
+    brapi = brapi or {}
+    infos = _collect(info_futures, deadline, "yahoo.info")
+    resolutions = {}
+    for ticker in tickers:
+        resolution = resolutions[ticker] = resolver.Resolution(ticker)
+        if ticker in info_futures:
+            resolution.add("yahoo", infos.get(ticker))
+        if ticker in brapi:
+            resolution.add("brapi", _brapi_payload(brapi[ticker]))
+
+    for in_route in (True, False):
+        for source in resolver.SOURCES:
+            wanted = [
+                ticker
+                for ticker, resolution in resolutions.items()
+                if _routed(routes, ticker, source) == in_route
+                and _source_available(ticker, source)
+                and resolution.wants(source)
+            ]
+            if not wanted:
+                continue
+            if not in_route:
+                metrics.count("route_misses", len(wanted), source=source)
+            fetched = _fetch_fundamental_source(source, wanted, deadline)
+            for ticker in wanted:
+                resolutions[ticker].add(source, fetched.get(ticker))
+
+    now = time.time()
+    resolved = {}
+    for ticker, resolution in resolutions.items():
+        for source in resolver.SOURCES:
+            if source not in resolution.payloads and _source_available(ticker, source):
+                reason = "rota" if not _routed(routes, ticker, source) else "resolvido"
+                metrics.count("source_skips", source=source, reason=reason)
+        record = resolution.fundamentals()
+        # Completo: toda fonte consultada respondeu (a brapi só complementa).
+        complete = all(payload for source, payload in resolution.payloads.items() if source != "brapi")
+        # Só busca completa ensina a rota; a data da sondagem só avança quando
+        # todas as fontes puderam ser consultadas (sem rota).
+        if not complete:
+            record.sources = None
+        else:
+            route = routes.get(ticker)
+            record.probed_at = route[1] if route else now
+        resolved[ticker] = (record, complete)
+    _save_fundamentals(resolved)
+    return {ticker: record for ticker, (record, _) in resolved.items()}
+
+def _save_fundamentals(resolved):
+    # Só grava quem tem ao menos uma métrica: falha total não apaga o que já havia.
+    if not _env_truthy("USE_FUNDAMENTALS_STORE", default=True):
+        return
+    import fundamentals_store
+    records = {
+        ticker: (record.to_dict(), complete)
+        for ticker, (record, complete) in resolved.items()
+        if record.has_values()
+    }
+    if not records:
+        return
+    try:
+        with metrics.span("fundamentals_store.write"):
+            fundamentals_store.save(records)
+    except Exception:
+        pass
+
+def _get_refresh_executor():
+    # Uma thread só: atualizações em segundo plano não disputam o pool das buscas.
+    global _REFRESH_EXECUTOR
+    if _REFRESH_EXECUTOR is not None:
+        return _REFRESH_EXECUTOR
+    with _FETCH_EXECUTOR_LOCK:
+        if _REFRESH_EXECUTOR is None:
+            _REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="investbot-refresh")
+    return _REFRESH_EXECUTOR
+
+def _refresh_fundamentals_later(tickers, routes):
+    with _FETCH_EXECUTOR_LOCK:
+        tickers = [ticker for ticker in tickers if ticker not in _REFRESHING]
+        _REFRESHING.update(tickers)
+    if tickers:
+        metrics.count("fundamentals_refresh", len(tickers))
+        _get_refresh_executor().submit(_refresh_fundamentals, tickers, routes)
+
+def _refresh_fundamentals(tickers, routes):
+    # Em segundo plano não há pressa: cada fonte, inclusive os módulos da
+    # brapi, só é pedida para quem ainda precisa dela.
+    try:
+        _resolve_batch(tickers, ANALYSIS_DEADLINE, routes)
+    except Exception as exc:
+        metrics.error("fundamentals.refresh", exc)
+    finally:
+        with _FETCH_EXECUTOR_LOCK:
+            _REFRESHING.difference_update(tickers)
+
+def get_scores_batch(tickers, deadline=None):
+    # Só o score e os números que o compõem, sem montar o relatório em texto.
+    tickers = _unique_tickers(tickers)
+    if not tickers:
+        return {}
     try:
         # Gerenciamento de Cache para evitar Rate Limiting
         _prepare_yfinance_cache()
-        df = yf.download(symbol, period="1y", interval="1d", progress=False, timeout=DEFAULT_TIMEOUT, threads=False)
-        info = ticker_obj.info or {}
     except Exception:
-        df = pd.DataFrame()
-        info = {}
-
-    df = _normalize_columns(df, symbol)
-    brapi_quote = None
-    if df.empty or len(df) < 100:
-        brapi_quote = _fetch_brapi_quote(ticker, range_value="1y", interval="1d")
-        df = _brapi_history_to_df(brapi_quote)
-    if df.empty or len(df) < 100:
-        return None
+        pass
+
+    # Fundamentos salvos em disco são servidos na hora (mesmo vencidos, com
+    # aviso no relatório) e atualizados em segundo plano; só quem não está
+    # no store espera as fontes de fundamentos.
+    stored, routes = _load_fundamentals(tickers)
+    pending = [ticker for ticker in tickers if ticker not in stored]
+    for ticker, (_, _, refresh) in stored.items():
+        metrics.count("fundamentals_store", result="stale" if refresh else "fresh")
+    if pending:
+        metrics.count("fundamentals_store", len(pending), result="miss")
+
+    # .info do Yahoo e os módulos da brapi (na chamada combinada com o
+    # histórico) saem junto com o histórico e dividem um único prazo; o
+    # Investidor10 só é consultado depois, para quem ainda precisar dele.
+    deadline = time.monotonic() + (ANALYSIS_DEADLINE if deadline is None else deadline)
+    info_futures = {
+        ticker: _submit(_fetch_yahoo_info, f"{ticker}.SA", deadline)
+        for ticker in pending
+        if _routed(routes, ticker, "yahoo")
+    }
+    with_modules = [ticker for ticker in pending if _routed(routes, ticker, "brapi")]
+
+    frames, brapi = _fetch_histories(tickers, "1y", "1d", deadline, with_brapi=True, fundamentals=with_modules)
+    frames = {
+        ticker: frames[ticker]
+        for ticker in tickers
+        if ticker in frames and len(frames[ticker]) >= MIN_HISTORY_BARS
+    }
 
     # --- INDICADORES TÉCNICOS ---
-    df['RSI'] = ta.rsi(df['Close'], length=14)
-    df['SMA200'] = ta.sma(df['Close'], length=200)
-
-    last = df.iloc[-1]
-    yahoo_price = _as_float(last['Close'])
-    if brapi_quote is None:
-        brapi_quote = _fetch_brapi_quote(ticker)
-    brapi_price = _extract_brapi_price(brapi_quote, df)
+    indicators = _compute_indicators(frames)
+
+    resolved = _resolve_batch(
+        [ticker for ticker in pending if ticker in frames],
+        deadline,
+        routes,
+        info_futures,
+        {ticker: brapi.get(ticker) for ticker in with_modules},
+    )
+    stale = [ticker for ticker, (_, _, refresh) in stored.items() if refresh and ticker in frames]
+    if stale:
+        _refresh_fundamentals_later(stale, routes)
+
+    results = {}
+    with metrics.span("score"):
+        for ticker, df in frames.items():
+            rsi, sma200 = indicators[ticker]
+            age, fundamentals = (0.0, resolved[ticker]) if ticker in resolved else stored[ticker][:2]
+            record = _score_analysis(
+                ticker,
+                df,
+                rsi,
+                sma200,
+                (brapi.get(ticker) or {}).get("price", float("nan")),
+                fundamentals,
+            )
+            record["fundamentals_age"] = age
+            record["fundamentals_refreshing"] = ticker in stale
+            results[ticker] = record
+    return results
+
+def _load_indexed(tickers):
+    if not tickers or not _env_truthy("USE_UNIVERSE_INDEX", default=True):
+        return {}
+    try:
+        with metrics.span("index.lookup"):
+            found = universe_index.lookup(tickers, INDEX_MAX_AGE)
+    except Exception:
+        return {}
+    for record in found.values():
+        record["trend"] = _trend(record["price"], record["sma200"])
+        record["veredito"] = _verdict(record["score"])
+    if found:
+        metrics.count("index_hits", len(found))
+    if len(found) < len(tickers):
+        metrics.count("index_misses", len(tickers) - len(found))
+    return found
+
+def get_records_batch(tickers, deadline=None):
+    # Registros do score sem o texto do relatório: do índice noturno quando
+    # houver, o resto ao vivo.
+    tickers = _unique_tickers(tickers)
+    results = _load_indexed(tickers)
+    live = [ticker for ticker in tickers if ticker not in results]
+    if live:
+        results.update(get_scores_batch(live, deadline))
+    return results
+
+def get_analysis_batch(tickers, deadline=None):
+    with metrics.span("analise"):
+        results = get_records_batch(tickers, deadline)
+        with metrics.span("format"):
+            for record in results.values():
+                record["msg"] = _format_report(record)
+    return results
+
+def get_analysis(ticker):
+    ticker = ticker.upper()
+    return get_analysis_batch([ticker]).get(ticker)
+
+def _score_analysis(ticker, df, rsi, sma200, brapi_price, fundamentals):
+    yahoo_price = _as_float(df['Close'].iloc[-1])
     price = _select_price(yahoo_price, brapi_price, prefer_primary=True)
-    rsi = _as_float(last['RSI'])
-    sma200 = _as_float(last['SMA200'])
 
     # --- LÓGICA DE SCORE EQUILIBRADA (ANALOGIAS DE PROGRAMADOR) ---
     score = 0
     sinais = []
 
+    price_source = _price_source(yahoo_price, brapi_price)
+    if math.isnan(price) and not math.isnan(fundamentals.fallback_price):
+        price = fundamentals.fallback_price
+        price_source = "investidor10"
+    metrics.attribute("price", price_source, fallback=price_source not in (None, "yahoo"))
+
     # 1. P/VP - Valor real vs. Valor de mercado
     # ANALOGIA: Refatoração - o código faz o mesmo, mas custa menos recursos.
-    pvp_yahoo = _as_float(info.get('priceToBook'))
-    book_value_yahoo = _as_float(info.get('bookValue'))
-    nav_yahoo = _as_float(info.get('netAssetValue') or info.get('navPrice'))
-    dy_yahoo = _as_float(info.get('dividendYield') or info.get('trailingAnnualDividendYield'))
-    avg_vol_yahoo = _as_float(info.get('averageVolume') or info.get('volume'))
-    debt_yahoo = _as_float(info.get('debtToEquity'))
-    market_cap_yahoo = _as_float(info.get('marketCap'))
-
-    brapi_fundamentals = None
-    if (
-        _is_nan(pvp_yahoo)
-        or _is_nan(book_value_yahoo)
-        or _is_nan(nav_yahoo)
-        or _is_nan(dy_yahoo)
-        or _is_nan(avg_vol_yahoo)
-        or _is_nan(debt_yahoo)
-        or _is_nan(market_cap_yahoo)
-    ):
-        brapi_fundamentals = _fetch_brapi_quote(
-            ticker,
-            modules="defaultKeyStatistics,financialData,balanceSheetHistory"
-        )
-
-    brapi_metrics = _extract_brapi_metrics(brapi_fundamentals or brapi_quote)
-    investidor10_metrics = {}
-    if ticker.endswith("11"):
-        need_fii_source = (
-            _is_nan(pvp_yahoo)
-            or _is_nan(book_value_yahoo)
-            or _is_nan(dy_yahoo)
-            or _is_nan(avg_vol_yahoo)
-            or _is_nan(debt_yahoo)
-            or _is_nan(market_cap_yahoo)
-            or math.isnan(price)
-        )
-        if need_fii_source:
-            investidor10_metrics = _extract_investidor10_metrics(_fetch_investidor10_html(ticker))
-            if math.isnan(price):
-                price_from_fii = investidor10_metrics.get("price")
-                if price_from_fii is not None and not math.isnan(price_from_fii):
-                    price = price_from_fii
-
-    pvp = _select_metric(pvp_yahoo, brapi_metrics.get("pvp"))
-    pvp = _select_metric(pvp, investidor10_metrics.get("pvp"))
-    if math.isnan(pvp):
-        book_value = _select_metric(book_value_yahoo, brapi_metrics.get("book_value"))
-        book_value = _select_metric(book_value, investidor10_metrics.get("book_value"))
-        if math.isnan(book_value):
-            nav_value = _select_metric(nav_yahoo, brapi_metrics.get("nav"))
-            nav_value = _select_metric(nav_value, investidor10_metrics.get("book_value"))
-            if not math.isnan(nav_value):
-                book_value = nav_value
-        if math.isnan(book_value):
-            shares_outstanding = _select_metric(
-                _as_float(info.get("sharesOutstanding")),
-                brapi_metrics.get("shares_outstanding"),
-            )
-            shares_outstanding = _select_metric(shares_outstanding, investidor10_metrics.get("shares_outstanding"))
-            equity_yahoo = _as_float(
-                info.get("totalStockholderEquity")
-                or info.get("totalStockholdersEquity")
-                or info.get("shareholdersEquity")
-            )
-            equity_brapi = _extract_brapi_equity(brapi_fundamentals or brapi_quote)
-            equity = _select_metric(equity_yahoo, equity_brapi)
-            equity = _select_metric(equity, investidor10_metrics.get("equity"))
-            if (
-                not math.isnan(shares_outstanding)
-                and not math.isnan(equity)
-                and shares_outstanding > 0
-            ):
-                book_value = equity / shares_outstanding
-        if math.isnan(book_value):
-            equity_brapi = _extract_brapi_equity(brapi_fundamentals or brapi_quote)
-            equity_yahoo = _as_float(
-                info.get("totalStockholderEquity")
-                or info.get("totalStockholdersEquity")
-                or info.get("shareholdersEquity")
-            )
-            equity = _select_metric(equity_yahoo, equity_brapi)
-            equity = _select_metric(equity, investidor10_metrics.get("equity"))
-            market_cap = _select_metric(market_cap_yahoo, brapi_metrics.get("market_cap"))
-            if not math.isnan(equity) and equity > 0 and not math.isnan(market_cap):
-                pvp = market_cap / equity
-        if not math.isnan(book_value) and book_value > 0 and not math.isnan(price):
-            pvp = price / book_value
+    pvp, pvp_source = fundamentals.pvp, fundamentals.pvp_source
+    book_value = fundamentals.book_value
+    if not math.isnan(book_value) and book_value > 0 and not math.isnan(price):
+        pvp = price / book_value
+        pvp_source = "calculado"
+    metrics.attribute("pvp", pvp_source, fallback=pvp_source not in (None, "yahoo"))
     if not math.isnan(pvp):
         if pvp < 0.95: 
             score += 3
@@ -568,12 +1832,9 @@ def get_analysis(ticker):
 
     # 2. Dividend Yield - "Salário" que o ativo paga
     # ANALOGIA: Uptime de lucro passivo - sistema gerando valor sem intervenção.
-    dy_raw = _select_metric(dy_yahoo, brapi_metrics.get("dividend_yield"))
-    dy_raw = _select_metric(dy_raw, investidor10_metrics.get("dividend_yield"))
-    dy_pct = float("nan")
-    if not math.isnan(dy_raw):
-
-        dy_pct = dy_raw if dy_raw > 1.0 else dy_raw * 100
+    dy_pct = fundamentals.dy_pct
+    metrics.attribute("dy", fundamentals.dy_source, fallback=fundamentals.dy_source not in (None, "yahoo"))
+    if not math.isnan(dy_pct):
         if dy_pct >= 8: 
             score += 2
             sinais.append("💰 Rendimento Alto")
@@ -583,11 +1844,13 @@ def get_analysis(ticker):
 
     # 3. Liquidez Diária - Facilidade de sair do ativo
     # ANALOGIA: Velocidade de Deploy/Rollback.
-    avg_vol = _select_metric(avg_vol_yahoo, brapi_metrics.get("avg_volume"))
+    avg_vol, liquidez_source = fundamentals.avg_volume, fundamentals.liquidez_source
     if math.isnan(avg_vol):
-        liquidez_brl = investidor10_metrics.get("liquidez_brl")
-        if liquidez_brl is not None and not math.isnan(liquidez_brl) and price and not math.isnan(price):
+        liquidez_brl = fundamentals.liquidez_brl
+        if not math.isnan(liquidez_brl) and price and not math.isnan(price):
             avg_vol = liquidez_brl / price
+            liquidez_source = "investidor10"
+    metrics.attribute("liquidez", liquidez_source, fallback=liquidez_source not in (None, "yahoo"))
     liquidez = avg_vol * price
     if not math.isnan(liquidez):
         if liquidez < 500_000: 
@@ -598,8 +1861,9 @@ def get_analysis(ticker):
             sinais.append("✅ Boa Liquidez")
 
     # 4. Endividamento (Dívida) - Risco de infraestrutura
-    debt = _select_metric(debt_yahoo, brapi_metrics.get("debt_to_equity"))
-    debt_label = f"{debt:.1f}%" if not math.isnan(debt) else "N/A"
+    debt, debt_source = fundamentals.debt, fundamentals.debt_source
+    if not ticker.endswith("11"):
+        metrics.attribute("debt", debt_source, fallback=debt_source not in (None, "yahoo"))
     if not ticker.endswith("11") and not math.isnan(debt):
         if debt > 150: 
             score -= 2
@@ -610,47 +1874,99 @@ def get_analysis(ticker):
 
     # 5. IFR (RSI) - Emoção do mercado
     # ANALOGIA: Load Average do Servidor - estresse do sistema.
-    if not math.isnan(rsi):
-        if rsi < 35: 
-            score += 3
-            sinais.append("🔥 Sobrevendido")
-        elif 35 <= rsi <= 60:
-            score += 1 # Zona neutra agora é vista como saudável
-        elif rsi > 75: 
-            score -= 3
-            sinais.append("⚠️ Sobrecomprado")
+    points, sinal = _rsi_signal(rsi)
+    score += points
+    if sinal:
+        sinais.append(sinal)
     
     # Tendência de Longo Prazo
-    trend = "Alta 📈" if price > sma200 else "Baixa 📉"
+    trend = _trend(price, sma200)
+    veredito = _verdict(score)
 
+    return {
+        "ticker": ticker,
+        "price": price,
+        "pvp": pvp,
+        "rsi": rsi,
+        "sma200": sma200,
+        "dy_pct": dy_pct,
+        "liquidez": liquidez,
+        "debt": debt,
+        "trend": trend,
+        "sinais": sinais,
+        "score": score,
+        "veredito": veredito,
+        "sources": {
+            name: source
+            for name, source in (
+                ("price", price_source), ("pvp", pvp_source), ("dy", fundamentals.dy_source),
+                ("liquidez", liquidez_source), ("debt", None if ticker.endswith("11") else debt_source),
+            )
+            if source
+        },
+    }
+
+def _rsi_signal(rsi):
+    # Parte técnica do score, (pontos, sinal). Fica separada para o /monitor
+    # refazer o score a cada preço sem buscar os fundamentos de novo.
+    if math.isnan(rsi):
+        return 0, None
+    if rsi < 35:
+        return 3, "🔥 Sobrevendido"
+    if 35 <= rsi <= 60:
+        return 1, None # Zona neutra agora é vista como saudável
+    if rsi > 75:
+        return -3, "⚠️ Sobrecomprado"
+    return 0, None
+
+def _trend(price, sma200):
+    return "Alta 📈" if price > sma200 else "Baixa 📉"
+
+def _verdict(score):
     if score >= 7:
-        veredito = "FORTE COMPRA 🟢"
-    elif score >= 4:
-        veredito = "COMPRA MODERADA 🔵"
-    elif score >= 1:
-        veredito = "NEUTRO / AGUARDAR 🟡"
-    else:
-        veredito = "EVITAR / RISCO ALTO 🔴"
+        return "FORTE COMPRA 🟢"
+    if score >= 4:
+        return "COMPRA MODERADA 🔵"
+    if score >= 1:
+        return "NEUTRO / AGUARDAR 🟡"
+    return "EVITAR / RISCO ALTO 🔴"
+
+def _format_age(seconds):
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} d"
 
-    # Formatação final
+def _format_report(record):
+    pvp, rsi, dy_pct, debt = record["pvp"], record["rsi"], record["dy_pct"], record["debt"]
+    sinais = record["sinais"]
     pvp_display = f"{pvp:.2f}" if not math.isnan(pvp) else "N/A"
     rsi_display = f"{rsi:.1f}" if not math.isnan(rsi) else "N/A"
     dy_display = f"{dy_pct:.2f}%" if not math.isnan(dy_pct) else "N/A"
+    debt_label = f"{debt:.1f}%" if not math.isnan(debt) else "N/A"
 
-    msg = (
-        f"🔎 *RELATÓRIO: {ticker}*\n"
-        f"💵 *Preço:* R$ {price:.2f}\n"
+    report = (
+        f"🔎 *RELATÓRIO: {record['ticker']}*\n"
+        f"💵 *Preço:* R$ {record['price']:.2f}\n"
         f"---------------------------\n"
         f"📏 *P/VP:* {pvp_display} (Alvo: <1.0)\n"
         f"📊 *IFR (RSI):* {rsi_display} (Alvo: <35)\n"
         f"💰 *Yield:* {dy_display} (Alvo: >8%)\n"
-        f"🌊 *Liquidez:* {_format_currency(liquidez)}/dia\n"
+        f"🌊 *Liquidez:* {_format_currency(record['liquidez'])}/dia\n"
         f"🏗️ *Dívida:* {debt_label}\n"
-        f"📈 *Tendência:* {trend}\n"
+        f"📈 *Tendência:* {record['trend']}\n"
         f"---------------------------\n"
         f"💡 *Sinais:* {' | '.join(sinais) if sinais else 'Neutro'}\n"
-        f"⭐ *Score:* {score}/10\n"
-        f"🎯 *Veredito:* {veredito}"
+        f"⭐ *Score:* {record['score']}/10\n"
+        f"🎯 *Veredito:* {record['veredito']}"
     )
-
-    return {"msg": msg, "price": price, "score": score}
\ No newline at end of file
+    # Fundamentos vindos do store em disco: mostra a idade e se já estão sendo renovados.
+    age = record.get("fundamentals_age", 0.0)
+    if age >= 60:
+        refreshing = " · atualizando" if record.get("fundamentals_refreshing") else ""
+        report += f"\n🕒 *Fundamentos:* salvos há {_format_age(age)}{refreshing}"
+    indexed_at = record.get("indexed_at")
+    if indexed_at is not None:
+        report += f"\n🗂️ *Índice noturno:* gerado há {_format_age(max(time.time() - indexed_at, 0))}"
+    return report
@@ -0,0 +1,94 @@
+import numpy as np
+
+import analysis
+import indicators
+
+
+BACKTEST_PERIOD = "5y"
+BACKTEST_DEADLINE = analysis._load_float("BACKTEST_DEADLINE", 60.0)
+
+# Mesmas faixas de IFR do score do /analise.
+RSI_OVERSOLD = 35
+RSI_OVERBOUGHT = 75
+
+
+def _forward_fill(values):
+    rows = np.arange(len(values))[:, None]
+    last = np.where(np.isnan(values), 0, rows)
+    np.maximum.accumulate(last, axis=0, out=last)
+    return values[last, np.arange(values.shape[1])]
+
+def _positions(close, rsi, sma):
+    # Compra com IFR sobrevendido e preço acima da SMA200; sai com IFR
+    # sobrecomprado ou preço abaixo da SMA200. Entre um sinal e outro a
+    # posição se mantém, e a ordem só é executada no fechamento seguinte.
+    with np.errstate(invalid="ignore"):
+        buy = (rsi < RSI_OVERSOLD) & (close > sma)
+        sell = (rsi > RSI_OVERBOUGHT) | (close < sma)
+    signal = np.full(close.shape, np.nan)
+    signal[sell] = 0.0
+    signal[buy] = 1.0
+    position = np.nan_to_num(_forward_fill(signal))
+    held = np.zeros_like(position)
+    held[1:] = position[:-1]
+    return held
+
+def backtest_panel(close, rsi_length=14, sma_length=200):
+    # close: painel barras x tickers alinhado à direita (NaN à esquerda).
+    close = np.asarray(close, dtype=float)
+    if close.ndim == 1:
+        close = close[:, None]
+    rsi = indicators.rsi(close, rsi_length)
+    sma = indicators.sma(close, sma_length)
+    held = _positions(close, rsi, sma)
+
+    returns = np.zeros_like(close)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns[1:] = close[1:] / close[:-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    equity = np.cumprod(1 + held * returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    # Operações: cada trecho contínuo com posição comprada vira um trade; o
+    # último pode estar em aberto e entra marcado a mercado.
+    size = close.shape[1]
+    padded = np.zeros((close.shape[0] + 2, size))
+    padded[1:-1] = held
+    changes = np.diff(padded, axis=0).T
+    entry_cols, entry_rows = np.nonzero(changes == 1)
+    exit_cols, exit_rows = np.nonzero(changes == -1)
+    trade_returns = equity[exit_rows - 1, exit_cols] / equity[entry_rows - 1, entry_cols] - 1
+    trades = np.bincount(entry_cols, minlength=size)
+    hits = np.bincount(entry_cols, weights=trade_returns > 0, minlength=size)
+
+    valid = ~np.isnan(close)
+    bars = valid.sum(axis=0)
+    first = valid.argmax(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        buy_hold = close[-1] / close[first, np.arange(size)] - 1
+        exposure = (held * valid).sum(axis=0) / bars
+    return {
+        "bars": bars,
+        "total_return": equity[-1] - 1,
+        "buy_hold": buy_hold,
+        "max_drawdown": drawdown.min(axis=0),
+        "trades": trades,
+        "hits": hits.astype(int),
+        "exposure": exposure,
+        "open": held[-1] > 0,
+    }
+
+def run_backtest(tickers, period=BACKTEST_PERIOD, deadline=BACKTEST_DEADLINE):
+    frames = analysis.get_history_batch(tickers, period=period, interval="1d", deadline=deadline)
+    frames = {ticker: frames[ticker] for ticker in tickers if ticker in frames and not frames[ticker].empty}
+    if not frames:
+        return {}
+    stats = backtest_panel(analysis._close_panel(frames))
+    results = {}
+    for column, ticker in enumerate(frames):
+        record = {name: values[column].item() for name, values in stats.items()}
+        record["ticker"] = ticker
+        record["start"] = frames[ticker].index[0]
+        record["end"] = frames[ticker].index[-1]
+        results[ticker] = record
+    return results
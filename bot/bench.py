@@ -0,0 +1,460 @@
+import argparse
+import html as html_lib
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import analysis
+import backtest
+import indicators
+
+
+def _legacy_strip_html(raw_html):
+    if not raw_html:
+        return ""
+    text = re.sub(r"(?is)<(script|style).*?>.*?</\1>", " ", raw_html)
+    text = re.sub(r"(?is)<[^>]+>", " ", text)
+    text = html_lib.unescape(text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+def _legacy_investidor10(html):
+    # Extrator antigo (página inteira + uma re.search por campo), mantido só como referência.
+    if not html:
+        return {}
+    metrics = {}
+    text = _legacy_strip_html(html)
+    pvp_match = re.search(r"\bP/VP\b[:\s]*([0-9][0-9\.\,]+)", text, re.IGNORECASE)
+    if pvp_match:
+        metrics["pvp"] = analysis._parse_pt_number(pvp_match.group(1))
+    dy_match = re.search(r"\bDY\s*\(12M\)\s*([0-9][0-9\.\,]+)", text, re.IGNORECASE)
+    if not dy_match:
+        dy_match = re.search(r"Dividend\s*Y(?:ield|eld).*?([0-9][0-9\.\,]+)\s*%", text, re.IGNORECASE)
+    if dy_match:
+        metrics["dividend_yield"] = analysis._parse_pt_number(dy_match.group(1))
+    liq_match = re.search(r"Liquidez\s*Di[áa]ria\s*R\$\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
+    if liq_match:
+        metrics["liquidez_brl"] = analysis._parse_brl_value(liq_match.group(1))
+    nav_match = re.search(r"VAL(?:\.|OR)?\s*PATRIMONIAL\s*P/\s*COTA\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
+    if not nav_match:
+        nav_match = re.search(r"VALOR\s*PATRIMONIAL\s*P/\s*COTA\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
+    if nav_match:
+        metrics["book_value"] = analysis._parse_pt_number(nav_match.group(1))
+    patr_match = re.search(r"VALOR\s*PATRIMONIAL\s*R\$\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
+    if patr_match:
+        metrics["equity"] = analysis._parse_brl_value(patr_match.group(1))
+    shares_match = re.search(r"COTAS\s*EMITIDAS\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
+    if not shares_match:
+        shares_match = re.search(r"N[ÚU]MERO\s*DE\s*COTAS\s*([0-9\.\,]+\s*[a-zA-Z]*)", text, re.IGNORECASE)
+    if shares_match:
+        metrics["shares_outstanding"] = analysis._parse_brl_value(shares_match.group(1))
+    price_match = re.search(r"Cotação\s*R\$\s*([0-9\.\,]+)", text, re.IGNORECASE)
+    if price_match:
+        metrics["price"] = analysis._parse_pt_number(price_match.group(1))
+    return metrics
+
+def _streaming_investidor10(html, chunk_size):
+    scanner = analysis._Investidor10Scanner()
+    consumed = 0
+    for start in range(0, len(html), chunk_size):
+        chunk = html[start:start + chunk_size]
+        consumed += len(chunk)
+        scanner.feed(chunk)
+        if scanner.done:
+            break
+    return scanner.close(), consumed
+
+def _same_metrics(a, b):
+    if a.keys() != b.keys():
+        return False
+    for key, value in a.items():
+        other = b[key]
+        if isinstance(value, float) and isinstance(other, float) and math.isnan(value) and math.isnan(other):
+            continue
+        if value != other:
+            return False
+    return True
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_investidor10(args):
+    ok = True
+    print(f"{'pagina':<28}{'bytes':>10}{'lidos':>10}{'antigo ms':>12}{'novo ms':>10}{'antigo KB':>11}{'novo KB':>9}  iguais")
+    for path in args.pages:
+        with open(path, encoding="utf-8", errors="ignore") as handle:
+            html = handle.read()
+        legacy = _legacy_investidor10(html)
+        streamed, consumed = _streaming_investidor10(html, args.chunk_size)
+        same = _same_metrics(legacy, streamed)
+        ok = ok and same
+        legacy_time = _best_time(lambda: _legacy_investidor10(html), args.repeat)
+        new_time = _best_time(lambda: _streaming_investidor10(html, args.chunk_size), args.repeat)
+        legacy_peak = _peak_memory(lambda: _legacy_investidor10(html))
+        new_peak = _peak_memory(lambda: _streaming_investidor10(html, args.chunk_size))
+        print(
+            f"{path[-28:]:<28}{len(html):>10}{consumed:>10}"
+            f"{legacy_time * 1000:>12.2f}{new_time * 1000:>10.2f}"
+            f"{legacy_peak / 1024:>11.0f}{new_peak / 1024:>9.0f}  {'sim' if same else 'NAO'}"
+        )
+        if not same:
+            print(f"  antigo: {legacy}\n  novo:   {streamed}")
+    return 0 if ok else 1
+
+def _synthetic_panel(bars, tickers, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, tickers)), axis=0))
+    spread = rng.uniform(0, 0.02, (bars, tickers))
+    return close * (1 + spread), close * (1 - spread), close
+
+def _indicator_reference():
+    # (módulo, barras iniciais ignoradas). O pandas-ta-classic semeia a média de
+    # Wilder (IFR, ATR) com a média simples, como o TA-Lib: a diferença para o
+    # pandas_ta some depois de algumas centenas de barras.
+    try:
+        import pandas_ta as ta
+        return ta, 0
+    except ImportError:
+        pass
+    try:
+        import pandas_ta_classic as ta
+        return ta, 300
+    except ImportError:
+        return None, 0
+
+def bench_indicators(args):
+    ta, warmup = _indicator_reference()
+    if ta is None:
+        print("pandas_ta não instalado: pip install pandas-ta ou pandas-ta-classic (só é usado como referência)")
+        return 2
+
+    high, low, close = _synthetic_panel(args.bars, args.tickers)
+    frames = [
+        (pd.Series(high[:, i]), pd.Series(low[:, i]), pd.Series(close[:, i]))
+        for i in range(args.tickers)
+    ]
+    cases = {
+        "rsi14": (
+            lambda: indicators.rsi(close, 14),
+            lambda: [ta.rsi(c, length=14) for _, _, c in frames],
+        ),
+        "sma200": (
+            lambda: indicators.sma(close, 200),
+            lambda: [ta.sma(c, length=200) for _, _, c in frames],
+        ),
+        "ema20": (
+            lambda: indicators.ema(close, 20),
+            lambda: [ta.ema(c, length=20) for _, _, c in frames],
+        ),
+        "macd": (
+            lambda: indicators.macd(close)[0],
+            lambda: [ta.macd(c).iloc[:, 0] for _, _, c in frames],
+        ),
+        "bbands20": (
+            lambda: indicators.bollinger(close, 20)[2],
+            lambda: [ta.bbands(c, length=20, ddof=1).iloc[:, 2] for _, _, c in frames],
+        ),
+        "atr14": (
+            lambda: indicators.atr(high, low, close, 14),
+            lambda: [ta.atr(h, l, c, length=14) for h, l, c in frames],
+        ),
+    }
+    ok = True
+    print(f"painel: {args.bars} barras x {args.tickers} tickers, referência {ta.__name__}")
+    print(f"{'indicador':<12}{'numpy ms':>10}{'pandas_ta ms':>14}{'erro max':>12}")
+    for name, (ours, theirs) in cases.items():
+        got = np.asarray(ours())
+        expected = np.column_stack([series.to_numpy(dtype=float) for series in theirs()])
+        both = ~np.isnan(got) & ~np.isnan(expected)
+        both[:warmup] = False
+        error = float(np.max(np.abs(got[both] - expected[both]) / np.maximum(1, np.abs(expected[both])))) if both.any() else 0.0
+        ok = ok and error <= args.tolerance
+        print(
+            f"{name:<12}{_best_time(ours, args.repeat) * 1000:>10.2f}"
+            f"{_best_time(theirs, args.repeat) * 1000:>14.2f}{error:>12.2e}"
+        )
+
+    state = indicators.IndicatorState.from_history(close[:-1])
+    start = time.perf_counter()
+    for _ in range(args.repeat * 100):
+        state.amend(close[-1])
+    elapsed = (time.perf_counter() - start) / (args.repeat * 100)
+    print(f"IndicatorState.amend: {elapsed * 1e6:.1f} us por barra para {args.tickers} tickers")
+    return 0 if ok else 1
+
+def _loop_backtest(close, rsi, sma):
+    # Referência dia a dia, do jeito ingênuo, para conferir o motor vetorizado.
+    equity, peak, drawdown = 1.0, 1.0, 0.0
+    position, held = 0.0, 0.0
+    trades, hits, entry = 0, 0, None
+    for t in range(len(close)):
+        if t and held:
+            equity *= close[t] / close[t - 1]
+        peak = max(peak, equity)
+        drawdown = min(drawdown, equity / peak - 1)
+        if rsi[t] < backtest.RSI_OVERSOLD and close[t] > sma[t]:
+            position = 1.0
+        elif rsi[t] > backtest.RSI_OVERBOUGHT or close[t] < sma[t]:
+            position = 0.0
+        if position and not held:
+            trades, entry = trades + 1, equity
+        elif held and not position:
+            hits += equity > entry
+        held = position
+    if held:
+        hits += equity > entry
+    return equity - 1, drawdown, trades, hits
+
+def bench_backtest(args):
+    _, _, close = _synthetic_panel(args.bars, args.tickers)
+    stats = backtest.backtest_panel(close)
+    elapsed = _best_time(lambda: backtest.backtest_panel(close), args.repeat)
+
+    rsi = indicators.rsi(close, 14)
+    sma = indicators.sma(close, 200)
+    start = time.perf_counter()
+    ok = True
+    for column in range(args.tickers):
+        total, drawdown, trades, hits = _loop_backtest(close[:, column], rsi[:, column], sma[:, column])
+        ok = ok and math.isclose(total, stats["total_return"][column], rel_tol=1e-9, abs_tol=1e-12)
+        ok = ok and math.isclose(drawdown, stats["max_drawdown"][column], rel_tol=1e-9, abs_tol=1e-12)
+        ok = ok and trades == stats["trades"][column] and hits == stats["hits"][column]
+    loop_time = time.perf_counter() - start
+
+    print(f"painel: {args.bars} barras x {args.tickers} tickers")
+    print(f"vetorizado: {elapsed * 1000:.1f} ms | loop: {loop_time * 1000:.1f} ms | iguais: {'sim' if ok else 'NAO'}")
+    print(f"operações: {int(stats['trades'].sum())} | retorno médio: {np.nanmean(stats['total_return']) * 100:+.1f}%")
+    return 0 if ok else 1
+
+_HEAVY_MODULES = ("numpy", "pandas", "yfinance", "brapi")
+# /preco de ponta a ponta num interpretador novo, sem rede: as fixtures e os
+# stores ficam no diretório temporário que o processo pai prepara.
+_PRECO_STARTUP = """
+import os, sys
+import commands, analysis, replay
+for limiter in analysis._RATE_LIMITS.values():
+    limiter.rate = 0
+workdir = {workdir!r}
+replay.reset_state(*(os.path.join(workdir, name) for name in ("history.sqlite", "fundamentals.sqlite", "sem-indice.idx")))
+with replay.Replay.load(os.path.join(workdir, "fixtures.json"), latency=0):
+    response = commands.build_response("/preco {ticker}")
+sys.exit(0 if response and not response.startswith("⚠️") else 1)
+"""
+_STARTUP_CASES = {
+    # cenário: (código, pode carregar módulos pesados, orçamento, medida comparada ao orçamento)
+    "ajuda": ("import terminal; terminal._print_help()", False, "budget_ms", "imports"),
+    "invalido": ("import terminal; terminal._run_command('/comando')", False, "budget_ms", "imports"),
+    "preco": (_PRECO_STARTUP, True, "preco_budget_ms", "total"),
+}
+
+def _import_profile(code):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    total_us = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+    return elapsed, total_us, modules, proc.returncode == 0
+
+def bench_startup(args):
+    import tempfile
+    import replay
+
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        replay.save_fixtures(replay.synthetic_fixtures([args.ticker], bars=300), os.path.join(workdir, "fixtures.json"))
+        print(f"{'cenario':<10}{'total ms':>10}{'imports ms':>12}  pesados")
+        for name, (code, heavy_allowed, budget, measure) in _STARTUP_CASES.items():
+            code = code.format(workdir=workdir, ticker=args.ticker)
+            runs = [_import_profile(code) for _ in range(args.repeat)]
+            elapsed, total_us, modules, succeeded = min(runs, key=lambda run: run[0])
+            heavy = [module for module in _HEAVY_MODULES if module in modules]
+            spent_ms = elapsed * 1000 if measure == "total" else total_us / 1000
+            over_budget = spent_ms > getattr(args, budget)
+            ok = ok and (heavy_allowed or not heavy) and not over_budget and succeeded
+            flag = "  <- falhou" if not succeeded else "  <- acima do orçamento" if over_budget else ""
+            print(f"{name:<10}{elapsed * 1000:>10.0f}{total_us / 1000:>12.0f}  {', '.join(heavy) or '-'}{flag}")
+    return 0 if ok else 1
+
+_COMMAND_CASES = ("/preco {ticker}", "/aporte {ticker}", "/aporte {ticker} --desde 2018", "/analise {ticker}")
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def _fixture_tickers(fixtures):
+    return sorted(symbol[:-3] for symbol in fixtures["yahoo"] if symbol.endswith(".SA"))
+
+def bench_commands(args):
+    import tempfile
+    import commands
+    import replay
+    import screener
+
+    if args.fixtures:
+        session = replay.Replay.load(args.fixtures, latency=args.latency)
+        batch = _fixture_tickers(session.session.fixtures)[:args.batch]
+    else:
+        batch = screener.UNIVERSES["todos"][:args.batch]
+        fixtures = replay.synthetic_fixtures(sorted(set(batch) | {args.ticker}))
+        session = replay.Replay.from_fixtures(fixtures, latency=args.latency)
+    if not args.rate_limits:
+        for limiter in analysis._RATE_LIMITS.values():
+            limiter.rate = 0
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmpdir, session:
+        runs = 0
+
+        def _reset():
+            nonlocal runs
+            runs += 1
+            replay.reset_state(
+                os.path.join(tmpdir, f"history-{runs}.sqlite"),
+                os.path.join(tmpdir, f"fundamentals-{runs}.sqlite"),
+                os.path.join(tmpdir, "sem-indice.idx"),
+            )
+
+        _reset()
+        print(f"latência simulada: {session.session.latency} | {'quente' if args.warm else 'frio'} | {args.repeat} rodadas")
+        print(f"{'comando':<32}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for template in _COMMAND_CASES:
+            command = template.format(ticker=args.ticker)
+            times = []
+            for _ in range(args.repeat):
+                if not args.warm:
+                    _reset()
+                start = time.perf_counter()
+                response = commands.build_response(command)
+                times.append(time.perf_counter() - start)
+                ok = ok and bool(response) and not response.startswith("⚠️")
+            print(
+                f"{command:<32}{_percentile(times, 0.5) * 1000:>9.1f}"
+                f"{_percentile(times, 0.95) * 1000:>9.1f}{max(times) * 1000:>9.1f}"
+            )
+
+        _reset()
+        start = time.perf_counter()
+        results = analysis.get_analysis_batch(batch, deadline=args.deadline)
+        elapsed = time.perf_counter() - start
+        print(f"lote /analise: {len(results)}/{len(batch)} tickers em {elapsed:.2f}s ({len(results) / elapsed:.1f} tickers/s)")
+        ok = ok and len(results) == len(batch)
+    return 0 if ok else 1
+
+def bench_record(args):
+    import tempfile
+    import commands
+    import fundamentals_store
+    import history_store
+    import replay
+    import universe_index
+
+    # Histórico, fundamentos e caches vazios (e nada do índice noturno) para gravar os
+    # downloads completos, não só o incremento.
+    original_stores = (history_store.STORE_PATH, fundamentals_store.STORE_PATH, universe_index.INDEX_PATH)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        replay.reset_state(
+            os.path.join(tmpdir, "history.sqlite"),
+            os.path.join(tmpdir, "fundamentals.sqlite"),
+            os.path.join(tmpdir, "sem-indice.idx"),
+        )
+        try:
+            with replay.Replay.record(args.fixtures) as recorder:
+                for command in args.commands:
+                    response = commands.build_response(command)
+                    print(f"{command}: {'ok' if response else 'sem resposta'}")
+        finally:
+            replay.reset_state(*original_stores)
+    fixtures = recorder.session.fixtures
+    print(
+        f"fixtures em {args.fixtures}: {len(fixtures['yahoo'])} históricos, {len(fixtures['info'])} infos, "
+        f"{len(fixtures['brapi'])} respostas da brapi, {len(fixtures['html'])} páginas"
+    )
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do InvestBot")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    inv10 = sub.add_parser("investidor10", help="extrator de FIIs contra páginas HTML salvas")
+    inv10.add_argument("pages", nargs="+", help="arquivos .html salvos do Investidor10")
+    inv10.add_argument("--chunk-size", type=int, default=16384)
+    inv10.add_argument("--repeat", type=int, default=20)
+    inv10.set_defaults(func=bench_investidor10)
+
+    ind = sub.add_parser("indicators", help="motor NumPy contra pandas_ta")
+    ind.add_argument("--bars", type=int, default=2500)
+    ind.add_argument("--tickers", type=int, default=50)
+    ind.add_argument("--repeat", type=int, default=3)
+    ind.add_argument("--tolerance", type=float, default=1e-6)
+    ind.set_defaults(func=bench_indicators)
+
+    bt = sub.add_parser("backtest", help="backtest vetorizado contra um loop dia a dia")
+    bt.add_argument("--bars", type=int, default=2520)
+    bt.add_argument("--tickers", type=int, default=50)
+    bt.add_argument("--repeat", type=int, default=5)
+    bt.set_defaults(func=bench_backtest)
+
+    st = sub.add_parser("startup", help="custo de importação do terminal (python -X importtime)")
+    st.add_argument("--budget-ms", type=float, default=150.0, help="limite de imports para ajuda/comando inválido")
+    st.add_argument("--preco-budget-ms", type=float, default=2000.0, help="limite de tempo total do /preco a frio")
+    st.add_argument("--ticker", default="PETR4")
+    st.add_argument("--repeat", type=int, default=3)
+    st.set_defaults(func=bench_startup)
+
+    cmd = sub.add_parser("commands", help="p50/p95 dos comandos e vazão do lote, sem rede (replay)")
+    cmd.add_argument("--fixtures", help="arquivo gravado com 'bench.py record' (padrão: dados sintéticos)")
+    cmd.add_argument("--latency", default="yahoo=0.3,brapi=0.15,investidor10=0.4",
+                     help="latência artificial por fonte, em segundos")
+    cmd.add_argument("--ticker", default="PETR4")
+    cmd.add_argument("--batch", type=int, default=100, help="tickers no teste de vazão")
+    cmd.add_argument("--repeat", type=int, default=10)
+    cmd.add_argument("--deadline", type=float, default=120.0)
+    cmd.add_argument("--warm", action="store_true", help="mantém caches e histórico entre as rodadas")
+    cmd.add_argument("--rate-limits", action="store_true", help="aplica os limites por fonte também no replay")
+    cmd.set_defaults(func=bench_commands)
+
+    rec = sub.add_parser("record", help="roda comandos na rede e grava as respostas como fixtures")
+    rec.add_argument("--fixtures", required=True)
+    rec.add_argument("commands", nargs="+", help='ex: "/analise PETR4 MXRF11" "/aporte PETR4 --desde 2018"')
+    rec.set_defaults(func=bench_record)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
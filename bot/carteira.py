@@ -0,0 +1,181 @@
+import math
+import re
+
+import numpy as np
+
+import analysis
+import metrics
+
+
+# Divide o aporte entre vários tickers em cotas inteiras. É uma mochila
+# limitada: cada ticker entra com no máximo `hi` cotas, a capacidade é o
+# aporte em centavos e cada real gasto vale o score do ativo mais
+# CARTEIRA_SOBRA, o quanto pesa cada real que ficaria parado como sobra.
+# Como o ganho é linear, sem teto o aporte inteiro iria para o maior score:
+# o peso máximo padrão fica abaixo de 1 (e sobe para 1/n com poucos tickers,
+# para o aporte ainda caber).
+CARTEIRA_PESO_MIN = analysis._load_float("CARTEIRA_PESO_MIN", 0.0)
+CARTEIRA_PESO_MAX = analysis._load_float("CARTEIRA_PESO_MAX", 0.4)
+CARTEIRA_SOBRA = max(analysis._load_float("CARTEIRA_SOBRA", 5.0), 0.0)
+CARTEIRA_DEADLINE = analysis._load_float("CARTEIRA_DEADLINE", 60.0)
+# Células da tabela da DP. Aportes grandes passam a andar em passos maiores
+# que um centavo (preços arredondados para cima, então nunca estoura o aporte).
+CARTEIRA_CELULAS = max(analysis._load_int("CARTEIRA_CELULAS", 20_000), 1000)
+
+_BOUNDS_RE = re.compile(r"^([A-Z0-9.]+):(\d+(?:[.,]\d+)?)?%?(?:-(\d+(?:[.,]\d+)?)%?)?$", re.IGNORECASE)
+
+
+def _percent(text):
+    if text is None:
+        return None
+    return float(text.replace(",", ".").rstrip("%")) / 100
+
+def parse_args(parts, budget):
+    # /aporte-carteira T1 T2:10-40 ... [--min 5] [--max 40] [--valor 500]
+    tickers = []
+    bounds = {}
+    low, high = CARTEIRA_PESO_MIN, None
+    items = iter(parts[1:])
+    for part in items:
+        lowered = part.lower()
+        if lowered in ("--min", "--max", "--valor"):
+            value = next(items, "")
+            try:
+                number = float(value.replace(",", ".").rstrip("%"))
+            except ValueError:
+                return None, None, None, f"⚠️ Valor inválido para {lowered}. Ex: /aporte-carteira MXRF11 PETR4 {lowered} 40"
+            if lowered == "--valor":
+                budget = number
+            elif lowered == "--min":
+                low = number / 100
+            else:
+                high = number / 100
+            continue
+        match = _BOUNDS_RE.match(part)
+        if match:
+            ticker = match.group(1).upper()
+            bounds[ticker] = (_percent(match.group(2)), _percent(match.group(3)))
+        else:
+            ticker = part.upper()
+        if ticker not in tickers:
+            tickers.append(ticker)
+    if not tickers:
+        return None, None, None, "⚠️ Informe os tickers. Ex: /aporte-carteira MXRF11 PETR4 VALE3"
+    if budget <= 0:
+        return None, None, None, "⚠️ O aporte precisa ser maior que zero."
+    if high is None:
+        high = max(CARTEIRA_PESO_MAX, 1 / len(tickers))
+    limits = {}
+    for ticker in tickers:
+        ticker_low, ticker_high = bounds.get(ticker, (None, None))
+        limits[ticker] = (
+            low if ticker_low is None else ticker_low,
+            high if ticker_high is None else ticker_high,
+        )
+    return tickers, budget, limits, None
+
+def _split(count):
+    # 1, 2, 4, ..., resto: qualquer quantidade até `count` sai de uma soma única.
+    parts = []
+    size = 1
+    while count > 0:
+        take = min(size, count)
+        parts.append(take)
+        count -= take
+        size *= 2
+    return parts
+
+def allocate(prices, weights, budget, lows, highs, leftover=CARTEIRA_SOBRA, max_cells=CARTEIRA_CELULAS):
+    # prices/weights/lows/highs: uma entrada por ticker (pesos mínimo e máximo
+    # como fração do aporte). Devolve (cotas por ticker, gasto) ou None quando
+    # os mínimos já passam do aporte.
+    cents = int(round(budget * 100))
+    price_cents = [int(round(price * 100)) for price in prices]
+    size = len(prices)
+    lo = [0] * size
+    hi = [0] * size
+    for index, price in enumerate(price_cents):
+        if price <= 0:
+            continue
+        hi[index] = int(highs[index] * cents // price)
+        lo[index] = min(math.ceil(lows[index] * cents / price), hi[index])
+    quantities = list(lo)
+    spent = sum(q * price for q, price in zip(quantities, price_cents))
+    if spent > cents:
+        return None
+
+    unit = max(math.ceil(cents / max_cells), 1)
+    capacity = (cents - spent) // unit
+    dp = np.zeros(capacity + 1, dtype=np.int64)
+    items = []
+    for index, price in enumerate(price_cents):
+        if price <= 0 or weights[index] <= 0:
+            continue
+        cost = math.ceil(price / unit)
+        # Em centésimos de ponto, para a tabela ficar em inteiros.
+        gain = price * int(round((weights[index] + leftover) * 100))
+        for count in _split(hi[index] - lo[index]):
+            step = cost * count
+            if step > capacity:
+                continue
+            candidate = dp[:capacity + 1 - step] + gain * count
+            taken = candidate > dp[step:]
+            np.maximum(dp[step:], candidate, out=dp[step:])
+            items.append((index, count, step, np.packbits(taken)))
+
+    cell = capacity
+    for index, count, step, taken in reversed(items):
+        offset = cell - step
+        if offset >= 0 and taken[offset >> 3] >> (7 - (offset & 7)) & 1:
+            quantities[index] += count
+            cell = offset
+
+    # Com passos maiores que um centavo pode sobrar o bastante para mais cotas.
+    spent = sum(q * price for q, price in zip(quantities, price_cents))
+    for index in sorted(range(size), key=lambda i: -weights[i]):
+        price = price_cents[index]
+        if price <= 0 or weights[index] <= 0:
+            continue
+        extra = min((cents - spent) // price, hi[index] - quantities[index])
+        if extra > 0:
+            quantities[index] += extra
+            spent += extra * price
+    return quantities, spent / 100
+
+def run_carteira(tickers, budget, limits, deadline=CARTEIRA_DEADLINE):
+    results = analysis.get_scores_batch(tickers, deadline)
+    found = [
+        ticker for ticker in tickers
+        if ticker in results and not analysis._is_nan(results[ticker]["price"]) and results[ticker]["price"] > 0
+    ]
+    if not found:
+        return None
+    prices = [results[ticker]["price"] for ticker in found]
+    weights = [max(results[ticker]["score"], 0) for ticker in found]
+    lows = [limits[ticker][0] for ticker in found]
+    highs = [limits[ticker][1] for ticker in found]
+    with metrics.span("carteira.solver"):
+        solution = allocate(prices, weights, budget, lows, highs)
+    if solution is None:
+        return {"error": "⚠️ Os pesos mínimos somam mais que o aporte.", "missing": [t for t in tickers if t not in found]}
+    quantities, spent = solution
+    positions = []
+    for ticker, quantity in zip(found, quantities):
+        record = results[ticker]
+        positions.append({
+            "ticker": ticker,
+            "price": record["price"],
+            "score": record["score"],
+            "veredito": record["veredito"],
+            "quantity": quantity,
+            "value": quantity * record["price"],
+        })
+    positions.sort(key=lambda position: (-position["value"], -position["score"]))
+    return {
+        "error": None,
+        "budget": budget,
+        "spent": spent,
+        "leftover": budget - spent,
+        "positions": positions,
+        "missing": [ticker for ticker in tickers if ticker not in found],
+    }
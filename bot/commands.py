@@ -1,16 +1,249 @@
 import os
+import re
+import math
 import analysis
+import metrics
+import screener
 
 
 APORTE_MENSAL = float(os.getenv("VALOR_APORTE", 185.00))
 
-def _extract_ticker(parts, command_hint):
-    if len(parts) < 2:
+def _extract_tickers(parts, command_hint):
+    tickers = []
+    for part in parts[1:]:
+        ticker = part.upper()
+        if ticker.startswith("/"):
+            continue
+        if ticker not in tickers:
+            tickers.append(ticker)
+    if not tickers:
         return None, f"⚠️ Informe o ticker. Ex: {command_hint} PETR4"
-    ticker = parts[-1].upper()
-    if ticker.startswith("/"):
-        return None, f"⚠️ Informe o ticker. Ex: {command_hint} PETR4"
-    return ticker, None
+    return tickers, None
+
+def _simulate_aporte(price):
+    qtd = int(APORTE_MENSAL // price)
+    sobra = APORTE_MENSAL % price
+    return qtd, sobra
+
+def _parse_screener_args(parts):
+    source = "todos"
+    top = screener.SCREENER_TOP
+    for part in parts[1:]:
+        if part.isdigit():
+            top = int(part)
+        else:
+            source = part
+    return source, top
+
+def _format_screener(source, result):
+    ranked = result["ranked"]
+    title = source.upper() if source.lower() in screener.UNIVERSES else os.path.basename(source)
+    lines = [f"🏆 *SCREENER: {title}*",
+             f"{result['analyzed']} de {result['requested']} ativos analisados em {result['elapsed']:.0f}s",
+             "---------------------------"]
+    for position, record in enumerate(ranked, start=1):
+        sinais = " | ".join(record["sinais"]) if record["sinais"] else "Neutro"
+        lines.append(f"{position}. *{record['ticker']}* R$ {record['price']:.2f} "
+                     f"⭐ {record['score']}/10 {record['veredito']}\n"
+                     f"   💡 {sinais}")
+    return "\n".join(lines)
+
+_PERIOD_RE = re.compile(r"^(\d+(d|wk|mo|y)|ytd|max)$", re.IGNORECASE)
+
+def _split_period(parts, default):
+    period = default
+    remaining = [parts[0]]
+    for part in parts[1:]:
+        if _PERIOD_RE.match(part):
+            period = part.lower()
+        else:
+            remaining.append(part)
+    return remaining, period
+
+def _format_pct(value):
+    return f"{value * 100:+.1f}%" if not analysis._is_nan(value) else "N/A"
+
+def _format_backtest(record, period):
+    trades = record["trades"]
+    hit_rate = f" ({record['hits'] / trades * 100:.0f}%)" if trades else ""
+    open_label = " | 1 em aberto" if record["open"] else ""
+    return (f"📊 *BACKTEST: {record['ticker']}* ({period}, {record['bars']} pregões)\n"
+            f"🗓️ {record['start']:%d/%m/%Y} a {record['end']:%d/%m/%Y}\n"
+            f"📈 *Estratégia:* {_format_pct(record['total_return'])} | "
+            f"*Buy & Hold:* {_format_pct(record['buy_hold'])}\n"
+            f"📉 *Drawdown máx:* {_format_pct(record['max_drawdown'])}\n"
+            f"🎯 *Acertos:* {record['hits']}/{trades}{hit_rate}\n"
+            f"🔁 *Operações:* {trades}{open_label} | *Exposição:* {_format_pct(record['exposure']).lstrip('+')}")
+
+_SINCE_RE = re.compile(r"^(\d{4})(?:[-/](\d{1,2}))?$")
+
+def _split_dca_flags(parts):
+    remaining = []
+    since = None
+    reinvest = False
+    index = 0
+    while index < len(parts):
+        part = parts[index]
+        lowered = part.lower()
+        if lowered == "--dividendos":
+            reinvest = True
+        elif lowered == "--desde":
+            index += 1
+            match = _SINCE_RE.match(parts[index]) if index < len(parts) else None
+            if not match:
+                return None, None, False, "⚠️ Informe o início. Ex: /aporte PETR4 --desde 2018 (ou 2018-06)"
+            since = f"{match.group(1)}-{int(match.group(2) or 1):02d}-01"
+        else:
+            remaining.append(part)
+        index += 1
+    return remaining, since, reinvest, None
+
+def _format_dca(record, since):
+    sobra = f"\n💰 Sobra em caixa: R$ {record['cash']:.2f}" if record["cash"] else ""
+    if record["reinvest"]:
+        proventos = f"\n🔁 Proventos reinvestidos: R$ {record['dividends']:.2f}"
+    else:
+        proventos = f"\n💵 Proventos recebidos (fora da posição): R$ {record['dividends']:.2f}"
+    start = record["first_month"].strftime("%m/%Y") if record["first_month"] is not None else since
+    return (f"📅 *{record['ticker']}* desde {start} ({record['months']} aportes)\n"
+            f"✅ Cotas acumuladas: *{record['shares']:.0f}*\n"
+            f"🏦 Investido: R$ {record['invested']:.2f}\n"
+            f"📈 Valor atual: R$ {record['value']:.2f} (R$ {record['price']:.2f}/cota)"
+            f"{sobra}{proventos}\n"
+            f"🎯 Resultado: {_format_pct(record['return'])}")
+
+def _format_carteira(result):
+    lines = [f"💼 *APORTE NA CARTEIRA: R$ {result['budget']:.2f}*"]
+    for position in result["positions"]:
+        if not position["quantity"]:
+            motivo = "score sem peso" if position["score"] <= 0 else "fora da solução"
+            lines.append(f"⏸️ {position['ticker']}: 0 cotas ({motivo}, ⭐ {position['score']}/10)")
+            continue
+        weight = position["value"] / result["budget"] * 100
+        lines.append(f"✅ *{position['quantity']}* cotas de {position['ticker']} x R$ {position['price']:.2f} = "
+                     f"R$ {position['value']:.2f} ({weight:.1f}%) ⭐ {position['score']}/10")
+    for ticker in result["missing"]:
+        lines.append(f"⚠️ {ticker}: Ação ou Fundo não encontrado.")
+    lines.append(f"💰 Sobra para o próximo mês: R$ {result['leftover']:.2f}")
+    return "\n".join(lines)
+
+def _format_diversificacao(result, period, threshold, top):
+    count = len(result["tickers"])
+    mean = result["mean_corr"]
+    if mean < 0.3:
+        leitura = "✅ Boa diversificação"
+    elif mean < 0.6:
+        leitura = "🟡 Diversificação moderada"
+    else:
+        leitura = "🚩 Carteira concentrada"
+    lines = [f"🧩 *DIVERSIFICAÇÃO* ({count} ativos, {period}, {result['days']} pregões)",
+             f"🗓️ {result['start'].item():%d/%m/%Y} a {result['end'].item():%d/%m/%Y}",
+             "---------------------------",
+             f"📊 *Correlação média:* {mean:.2f} (últimos 3 meses: {result['mean_recent']:.2f})",
+             f"🎯 *Apostas independentes:* {result['effective']:.1f} de {count} | "
+             f"fator principal explica {result['top_share'] * 100:.0f}% da variância",
+             leitura]
+    pairs = result["pairs"]
+    if pairs:
+        lines.append(f"🔗 *Pares muito correlacionados* (≥ {threshold:.2f}):")
+        for pair in pairs[:top]:
+            first, second = pair["pair"]
+            recent = f"{pair['recent']:.2f}" if not math.isnan(pair["recent"]) else "N/A"
+            lines.append(f"  {first} × {second}: {pair['corr']:.2f} "
+                         f"(3 meses: {recent}, faixa {pair['low']:.2f} a {pair['high']:.2f})")
+        if len(pairs) > top:
+            lines.append(f"  ... e mais {len(pairs) - top} pares")
+    else:
+        lines.append(f"🔗 Nenhum par com correlação ≥ {threshold:.2f}.")
+    for group in result["groups"]:
+        lines.append(f"🧺 *Grupo que anda junto:* {', '.join(group)}")
+    if result["missing"]:
+        lines.append(f"⚠️ Sem histórico: {', '.join(result['missing'])}")
+    return "\n".join(lines)
+
+def _format_stats(data, cache, health):
+    if not data["enabled"]:
+        return "⚠️ Métricas desligadas (METRICS=0)."
+    lines = [f"📈 *ESTATÍSTICAS* (últimos {data['uptime'] / 60:.0f} min)"]
+    if data["spans"]:
+        lines.append("⏱️ *Etapas* (n | p50 | p95 | máx, em ms)")
+        for name, stats in sorted(data["spans"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"  {name}: {stats['count']} | {stats['p50'] * 1000:.0f} | "
+                         f"{stats['p95'] * 1000:.0f} | {stats['max'] * 1000:.0f}")
+    groups = {}
+    for counter in data["counters"]:
+        groups.setdefault(counter["name"], []).append(counter)
+    if groups.get("errors") or groups.get("deadline_expired"):
+        lines.append("🚨 *Falhas*")
+        for counter in groups.get("errors", []):
+            labels = counter["labels"]
+            lines.append(f"  {labels['source']}: {counter['value']}x {labels['kind']} ({labels['type']})")
+        for counter in groups.get("deadline_expired", []):
+            lines.append(f"  {counter['labels']['stage']}: {counter['value']}x prazo esgotado")
+        for counter in groups.get("abandoned", []):
+            lines.append(f"  {counter['labels']['stage']}: {counter['value']}x seguiu rodando após o prazo")
+    if groups.get("metric_source"):
+        sources = {}
+        for counter in groups["metric_source"]:
+            labels = counter["labels"]
+            sources.setdefault(labels["metric"], []).append(f"{labels['source']} {counter['value']}")
+        lines.append("🧭 *Fonte de cada indicador*")
+        for metric, values in sorted(sources.items()):
+            lines.append(f"  {metric}: " + ", ".join(values))
+    if groups.get("fallbacks"):
+        fallbacks = ", ".join(f"{c['labels']['metric']} {c['value']}" for c in groups["fallbacks"])
+        lines.append(f"🔁 *Fallbacks:* {fallbacks}")
+    unhealthy = {source: state for source, state in health.items() if state["state"] != "fechado" or state["failures"]}
+    if unhealthy or groups.get("circuit_skipped") or groups.get("source_skips"):
+        lines.append("🔌 *Saúde das fontes*")
+        for source, state in sorted(unhealthy.items()):
+            retry = f", volta em {state['retry_in']:.0f}s" if state["state"] == "aberto" else ""
+            lines.append(f"  {source}: {state['state']} ({state['failures']} falhas seguidas{retry})")
+        for counter in groups.get("circuit_skipped", []):
+            lines.append(f"  {counter['labels']['source']}: {counter['value']}x pulada (circuito aberto)")
+        reasons = {"rota": "fora da rota do ticker", "resolvido": "métricas já resolvidas"}
+        for counter in groups.get("source_skips", []):
+            labels = counter["labels"]
+            lines.append(f"  {labels['source']}: {counter['value']}x dispensada ({reasons.get(labels['reason'], labels['reason'])})")
+    if groups.get("index_hits") or groups.get("index_misses"):
+        index_hits = sum(counter["value"] for counter in groups.get("index_hits", []))
+        index_misses = sum(counter["value"] for counter in groups.get("index_misses", []))
+        lines.append(f"🗂️ *Índice noturno:* {index_hits} servidos, {index_misses} ao vivo")
+    hits, misses = sum(cache["hits"].values()), sum(cache["misses"].values())
+    if hits or misses:
+        lines.append(f"🗄️ *Cache:* {hits} acertos, {misses} faltas, {cache['entries']} entradas")
+    if len(lines) == 1:
+        lines.append("Nenhum comando executado ainda.")
+    return "\n".join(lines)
+
+_INTERVAL_ARG_RE = re.compile(r"^\d+(m|h|d|wk|mo)$", re.IGNORECASE)
+
+def _parse_intraday_args(parts, intervals, default):
+    interval = default
+    tickers = []
+    for part in parts[1:]:
+        # Qualquer coisa com cara de intervalo (5m, 1h, 1d) é intervalo, mesmo os não suportados.
+        if part.lower() in intervals or _INTERVAL_ARG_RE.match(part):
+            interval = part.lower()
+            continue
+        ticker = part.upper()
+        if ticker not in tickers:
+            tickers.append(ticker)
+    return tickers, interval
+
+def _format_intraday(record, sma_length):
+    from datetime import datetime
+    rsi, sma = record["rsi"], record["sma"]
+    rsi_display = f"{rsi:.1f}" if not math.isnan(rsi) else "N/A"
+    sma_display = f"R$ {sma:.2f}" if not math.isnan(sma) else "N/A"
+    trend = analysis._trend(record["price"], sma) if not math.isnan(sma) else "N/A"
+    _, sinal = analysis._rsi_signal(rsi)
+    last = datetime.fromtimestamp(record["last_time"])
+    return (
+        f"⏱️ *{record['ticker']}* ({record['interval']}, {record['bars']} barras até {last:%H:%M %d/%m})\n"
+        f"💵 R$ {record['price']:.2f} | 📊 IFR {rsi_display} | 📏 SMA{sma_length} {sma_display} | {trend}"
+        + (f"\n💡 {sinal}" if sinal else "")
+    )
 
 def build_response(text):
     if not text:
@@ -24,61 +257,188 @@ def build_response(text):
 
     # COMANDO UNIFICADO: ANÁLISE + APORTE + TÍTULO
     if lowered.startswith("/analise"):
-        ticker, error = _extract_ticker(parts, "/analise")
+        tickers, error = _extract_tickers(parts, "/analise")
         if error:
             return error
-        
-        res = analysis.get_analysis(ticker)
-        if not res:
+
+        results = analysis.get_analysis_batch(tickers)
+        if not results:
             return "⚠️ Ação ou Fundo não encontrado. Verifique o ticker."
 
-        # Cálculo do Aporte Automático
-        qtd = int(APORTE_MENSAL // res["price"])
-        sobra = APORTE_MENSAL % res["price"]
-        
-       
+        sections = []
+        for ticker in tickers:
+            res = results.get(ticker)
+            if not res:
+                sections.append(f"⚠️ {ticker}: Ação ou Fundo não encontrado. Verifique o ticker.")
+                continue
+
+            # Cálculo do Aporte Automático
+            qtd, sobra = _simulate_aporte(res["price"])
+
+            aporte_msg = (f"\n💸 *SIMULADOR DE APORTE*\n"
+                          f"Com seu aporte mensal de R$ {APORTE_MENSAL:.2f}:\n"
+                          f"✅ Compra sugerida: *{qtd}* cotas de {ticker}\n"
+                          f"💰 Sobra para o próximo mês: R$ {sobra:.2f}")
+            sections.append(f"{res['msg']}\n{aporte_msg}")
+
         header = "🚀 *ESTRATÉGIA INVESTBOT 2026 - RELATÓRIO COMPLETO* 🚀\n"
         
-        aporte_msg = (f"\n💸 *SIMULADOR DE APORTE*\n"
-                      f"Com seu aporte mensal de R$ {APORTE_MENSAL:.2f}:\n"
-                      f"✅ Compra sugerida: *{qtd}* cotas de {ticker}\n"
-                      f"💰 Sobra para o próximo mês: R$ {sobra:.2f}")
-        
-        footer = "\n\n💡 *Dica:* Mantenha sua diversificação para segurança máxima!"
+        footer = "\n\n💡 *Dica:* Mantenha sua diversificação para segurança máxima! Meça com /diversificacao."
         
-        return f"{header}\n{res['msg']}\n{aporte_msg}{footer}"
+        return f"{header}\n" + "\n\n".join(sections) + footer
+
+
+    if lowered.startswith("/aporte-carteira"):
+        import carteira
+        tickers, budget, limits, error = carteira.parse_args(parts, APORTE_MENSAL)
+        if error:
+            return error
+        result = carteira.run_carteira(tickers, budget, limits)
+        if not result:
+            return "⚠️ Nenhum ativo encontrado. Verifique os tickers."
+        if result["error"]:
+            return result["error"]
+        return _format_carteira(result)
 
-    
     if lowered.startswith("/aporte"):
-        ticker, error = _extract_ticker(parts, "/aporte")
+        parts, since, reinvest, error = _split_dca_flags(parts)
         if error:
             return error
-        res = analysis.get_analysis(ticker)
-        if not res:
+        tickers, error = _extract_tickers(parts, "/aporte")
+        if error:
+            return error
+        if since:
+            import dca
+            results = dca.run_dca(tickers, since, APORTE_MENSAL, reinvest=reinvest)
+            if not results:
+                return "⚠️ Sem histórico para simular os aportes. Verifique o ticker."
+            sections = [f"💸 *APORTES MENSAIS DE R$ {APORTE_MENSAL:.2f}*"]
+            for ticker in tickers:
+                record = results.get(ticker)
+                if not record:
+                    sections.append(f"⚠️ {ticker}: sem histórico desde {since[:7]}.")
+                    continue
+                sections.append(_format_dca(record, since[:7]))
+            return "\n\n".join(sections)
+        results = analysis.get_analysis_batch(tickers)
+        if not results:
             return "⚠️ Ação não encontrada."
-        
-        qtd = int(APORTE_MENSAL // res["price"])
-        sobra = APORTE_MENSAL % res["price"]
-        
-        return (f"💸 *SIMULADOR DE APORTE*\n\n"
-                f"Com seu aporte de R$ {APORTE_MENSAL:.2f}:\n"
-                f"✅ Compra: *{qtd}* cotas de {ticker.upper()}\n"
-                f"💰 Sobra: R$ {sobra:.2f}")
+
+        lines = [f"💸 *SIMULADOR DE APORTE*\n\n"
+                 f"Com seu aporte de R$ {APORTE_MENSAL:.2f}:"]
+        for ticker in tickers:
+            res = results.get(ticker)
+            if not res:
+                lines.append(f"⚠️ {ticker}: Ação não encontrada.")
+                continue
+            qtd, sobra = _simulate_aporte(res["price"])
+            lines.append(f"✅ Compra: *{qtd}* cotas de {ticker}\n"
+                         f"💰 Sobra: R$ {sobra:.2f}")
+        return "\n".join(lines)
+
+    if lowered.startswith("/backtest"):
+        import backtest
+        parts, period = _split_period(parts, backtest.BACKTEST_PERIOD)
+        tickers, error = _extract_tickers(parts, "/backtest")
+        if error:
+            return error
+        results = backtest.run_backtest(tickers, period=period)
+        if not results:
+            return "⚠️ Sem histórico para o backtest. Verifique o ticker."
+        sections = []
+        for ticker in tickers:
+            record = results.get(ticker)
+            if not record:
+                sections.append(f"⚠️ {ticker}: sem histórico para o backtest.")
+                continue
+            sections.append(_format_backtest(record, period))
+        footer = (f"\n\n💡 *Regra:* compra com IFR < {backtest.RSI_OVERSOLD} e preço acima da SMA200; "
+                  f"vende com IFR > {backtest.RSI_OVERBOUGHT} ou preço abaixo da SMA200.")
+        return "\n\n".join(sections) + footer
+
+    if lowered.startswith("/diversificacao") or lowered.startswith("/diversificação"):
+        import diversificacao
+        parts, period = _split_period(parts, diversificacao.DIVERSIFICACAO_PERIOD)
+        tickers, error = _extract_tickers(parts, "/diversificacao VALE3")
+        if error:
+            return error
+        if len(tickers) > diversificacao.DIVERSIFICACAO_MAX_TICKERS:
+            return f"⚠️ No máximo {diversificacao.DIVERSIFICACAO_MAX_TICKERS} tickers por análise."
+        result = diversificacao.run_diversificacao(tickers, period=period)
+        if len(result["tickers"]) < 2:
+            return "⚠️ São precisos ao menos 2 ativos com histórico. Ex: /diversificacao PETR4 VALE3 MXRF11"
+        return _format_diversificacao(result, period, diversificacao.DIVERSIFICACAO_LIMIAR, diversificacao.DIVERSIFICACAO_TOP)
+
+    if lowered.startswith("/screener"):
+        source, top = _parse_screener_args(parts)
+        tickers = screener.load_universe(source)
+        if not tickers:
+            universes = ", ".join(screener.UNIVERSES)
+            return f"⚠️ Universo não encontrado. Use {universes} ou um arquivo de tickers. Ex: /screener fiis 10"
+        result = screener.run_screener(tickers, top=top)
+        if not result["ranked"]:
+            return "⚠️ Nenhum ativo do universo retornou dados."
+        return _format_screener(source, result)
+
+    if lowered.startswith("/monitor"):
+        return "⚠️ O /monitor fica rodando e só funciona no modo terminal (python bot/terminal.py)."
+
+    if lowered.startswith("/intraday"):
+        import intraday
+        tickers, interval = _parse_intraday_args(parts, intraday.INTERVALS, intraday.INTRADAY_INTERVAL)
+        if not tickers:
+            return "⚠️ Informe o ticker. Ex: /intraday PETR4 5m"
+        if interval not in intraday.INTERVALS:
+            return f"⚠️ Intervalo inválido. Use {', '.join(intraday.INTERVALS)}."
+        results = intraday.analyze(tickers, interval)
+        if not results:
+            return "⚠️ Sem barras intradiárias. Verifique o ticker."
+        sections = []
+        for ticker in tickers:
+            record = results.get(ticker)
+            if not record:
+                sections.append(f"⚠️ {ticker}: sem barras intradiárias.")
+                continue
+            sections.append(_format_intraday(record, intraday.INTRADAY_SMA))
+        usage = intraday.stats()
+        sections.append(
+            f"🧠 Intraday em memória: {usage['tickers']} ticker(s), "
+            f"{usage['bytes'] / 1024 / 1024:.1f} MB de {usage['budget'] / 1024 / 1024:.0f} MB"
+        )
+        return "\n\n".join(sections)
+
+    if lowered.startswith("/stats"):
+        output = parts[1].lower() if len(parts) > 1 else ""
+        if output == "json":
+            return metrics.render_json()
+        if output in {"prometheus", "prom"}:
+            return metrics.render_prometheus()
+        if output == "reset":
+            metrics.reset()
+            return "🧹 Métricas zeradas."
+        return _format_stats(metrics.snapshot(), analysis.cache_stats(), analysis.source_health())
 
     if lowered.startswith("/preco"):
-        ticker, error = _extract_ticker(parts, "/preco")
+        tickers, error = _extract_tickers(parts, "/preco")
         if error:
             return error
-        details = analysis.get_price_details(ticker)
-        if not details or details.get("price") is None:
+        details_by_ticker = analysis.get_price_details_batch(tickers)
+        if not details_by_ticker:
             return "⚠️ Ação não encontrada."
-        price = details["price"]
-        msg = f"💵 Preço atual de {ticker}: R$ {price:.2f}"
-        sources = details.get("sources") or {}
-        yahoo = sources.get("yahoo")
-        brapi = sources.get("brapi")
-        if yahoo is not None and brapi is not None and details.get("match") is False:
-            msg += f"\n⚠️ Fontes divergentes: Yahoo R$ {yahoo:.2f} | Brapi R$ {brapi:.2f}"
-        return msg
-
-    return None
\ No newline at end of file
+        lines = []
+        for ticker in tickers:
+            details = details_by_ticker.get(ticker)
+            if not details or details.get("price") is None:
+                lines.append(f"⚠️ {ticker}: Ação não encontrada.")
+                continue
+            price = details["price"]
+            msg = f"💵 Preço atual de {ticker}: R$ {price:.2f}"
+            sources = details.get("sources") or {}
+            yahoo = sources.get("yahoo")
+            brapi = sources.get("brapi")
+            if yahoo is not None and brapi is not None and details.get("match") is False:
+                msg += f"\n⚠️ Fontes divergentes: Yahoo R$ {yahoo:.2f} | Brapi R$ {brapi:.2f}"
+            lines.append(msg)
+        return "\n".join(lines)
+
+    return None
@@ -0,0 +1,157 @@
+import json
+import os
+import socket
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+import analysis
+
+
+# Endereço do daemon: caminho de socket Unix ou host:porta (TCP em localhost).
+_DEFAULT_ADDRESS = (
+    os.path.join(os.path.dirname(__file__), ".cache", "investbot.sock")
+    if hasattr(socket, "AF_UNIX")
+    else "127.0.0.1:8765"
+)
+DAEMON_ADDRESS = os.getenv("INVESTBOT_DAEMON_ADDRESS", _DEFAULT_ADDRESS)
+DAEMON_WORKERS = analysis._load_int("DAEMON_WORKERS", 8)
+DAEMON_TIMEOUT = analysis._load_float("DAEMON_TIMEOUT", 600.0)
+_MAX_REQUEST_BYTES = 64 * 1024
+
+
+def _tcp_address(address):
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit() or "/" in address:
+        return None
+    return host or "127.0.0.1", int(port)
+
+def _connect(timeout):
+    tcp = _tcp_address(DAEMON_ADDRESS)
+    if tcp is not None:
+        return socket.create_connection(tcp, timeout=timeout)
+    if not os.path.exists(DAEMON_ADDRESS):
+        raise FileNotFoundError(DAEMON_ADDRESS)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(DAEMON_ADDRESS)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+def _read_line(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+def forward(command):
+    # (True, resposta) quando um daemon respondeu; (False, None) quando não há
+    # daemon no ar e o comando deve rodar no próprio processo.
+    if not analysis._env_truthy("USE_DAEMON", default=True):
+        return False, None
+    try:
+        sock = _connect(timeout=1.0)
+    except OSError:
+        return False, None
+    with sock:
+        try:
+            sock.settimeout(DAEMON_TIMEOUT)
+            sock.sendall((json.dumps({"command": command}, ensure_ascii=False) + "\n").encode("utf-8"))
+            reply = json.loads(_read_line(sock).decode("utf-8"))
+        except Exception:
+            return True, "⚠️ O daemon não respondeu a tempo. Tente de novo."
+    if not reply.get("ok"):
+        return True, f"⚠️ Erro no daemon: {reply.get('error')}"
+    return True, reply.get("response")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    timeout = 30
+
+    def handle(self):
+        from commands import build_response
+        line = self.rfile.readline(_MAX_REQUEST_BYTES)
+        if not line.strip():
+            # Conexão só para testar se o daemon está no ar.
+            return
+        try:
+            command = json.loads(line.decode("utf-8"))["command"]
+            reply = {"ok": True, "response": build_response(command)}
+        except Exception as exc:
+            reply = {"ok": False, "error": str(exc)}
+        self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+class _PooledServer:
+    # Cada conexão vai para um pool limitado em vez de abrir uma thread nova:
+    # vários scripts podem chamar ao mesmo tempo sem multiplicar as requisições às fontes.
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class _TCPServer(_PooledServer, socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixServer(_PooledServer, socketserver.UnixStreamServer):
+        pass
+
+
+def _warm_up():
+    # Carrega as bibliotecas e abre clientes/store antes do primeiro comando.
+    try:
+        analysis._prepare_yfinance_cache()
+        analysis._get_brapi_client()
+        analysis._get_fetch_executor()
+        import pandas, numpy, yfinance, indicators, history_store
+    except Exception:
+        pass
+
+def _make_server():
+    tcp = _tcp_address(DAEMON_ADDRESS)
+    if tcp is not None:
+        return _TCPServer(tcp, _Handler), f"{tcp[0]}:{tcp[1]}"
+    if os.path.exists(DAEMON_ADDRESS):
+        try:
+            _connect(timeout=1.0).close()
+            raise RuntimeError(f"já existe um daemon em {DAEMON_ADDRESS}")
+        except OSError:
+            # Socket órfão de um daemon que não saiu direito.
+            os.unlink(DAEMON_ADDRESS)
+    os.makedirs(os.path.dirname(DAEMON_ADDRESS) or ".", exist_ok=True)
+    return _UnixServer(DAEMON_ADDRESS, _Handler), DAEMON_ADDRESS
+
+def serve():
+    try:
+        server, address = _make_server()
+    except (RuntimeError, OSError) as exc:
+        print(f"⚠️ Não foi possível iniciar o daemon: {exc}")
+        return
+    _warm_up()
+    server.pool = ThreadPoolExecutor(max_workers=max(1, DAEMON_WORKERS), thread_name_prefix="investbot-daemon")
+    print(f"🛰️ Daemon ativo em {address} ({DAEMON_WORKERS} workers). Ctrl+C encerra.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando daemon.")
+    finally:
+        server.server_close()
+        server.pool.shutdown(wait=False, cancel_futures=True)
+        if _tcp_address(DAEMON_ADDRESS) is None and os.path.exists(DAEMON_ADDRESS):
+            os.unlink(DAEMON_ADDRESS)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+import analysis
+
+
+DCA_DEADLINE = analysis._load_float("DCA_DEADLINE", 60.0)
+
+
+def _monthly_panel(frames):
+    # Uma linha por mês para todos os tickers: preço de compra (abertura do
+    # primeiro pregão), último fechamento e proventos pagos no mês.
+    opens, closes, dividends = {}, {}, {}
+    for ticker, df in frames.items():
+        if df is None or df.empty or "Open" not in df.columns:
+            continue
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        months = index.to_period("M")
+        frame = pd.DataFrame({
+            "Open": pd.to_numeric(df["Open"], errors="coerce").to_numpy(),
+            "Close": pd.to_numeric(df["Close"], errors="coerce").to_numpy(),
+            "Dividends": pd.to_numeric(df["Dividends"], errors="coerce").to_numpy() if "Dividends" in df.columns else 0.0,
+        }, index=months)
+        grouped = frame.groupby(level=0)
+        opens[ticker] = grouped["Open"].first()
+        closes[ticker] = grouped["Close"].last()
+        dividends[ticker] = grouped["Dividends"].sum()
+    if not opens:
+        return None
+    opens = pd.DataFrame(opens).sort_index()
+    closes = pd.DataFrame(closes).reindex(opens.index)
+    dividends = pd.DataFrame(dividends).reindex(opens.index).fillna(0.0)
+    return opens, closes, dividends
+
+def simulate_dca(prices, dividends, contribution, reinvest=False):
+    # prices/dividends: painéis meses x tickers (NaN antes da listagem). Cada
+    # mês entra o aporte, compra-se o máximo de cotas inteiras e a sobra vai
+    # para o mês seguinte. A sobra depende do mês anterior, então o laço é por
+    # mês e cada passo é vetorizado entre os tickers.
+    prices = np.asarray(prices, dtype=float)
+    dividends = np.nan_to_num(np.asarray(dividends, dtype=float))
+    size = prices.shape[1]
+    shares = np.zeros(size)
+    cash = np.zeros(size)
+    invested = np.zeros(size)
+    received = np.zeros(size)
+    months = np.zeros(size, dtype=int)
+    for price, paid in zip(prices, dividends):
+        active = ~np.isnan(price) & (price > 0)
+        cash += np.where(active, contribution, 0.0)
+        invested += np.where(active, contribution, 0.0)
+        months += active
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bought = np.where(active, np.floor(cash / price), 0.0)
+        shares += bought
+        cash -= np.where(active, bought * price, 0.0)
+        income = shares * paid
+        received += income
+        if reinvest:
+            cash += income
+    return {
+        "months": months,
+        "invested": invested,
+        "shares": shares,
+        "cash": cash,
+        "dividends": received,
+    }
+
+def run_dca(tickers, since, contribution, reinvest=False, deadline=DCA_DEADLINE):
+    start = pd.Timestamp(since)
+    frames = analysis.get_monthly_history_batch(tickers, start, deadline=deadline)
+    panel = _monthly_panel({ticker: frames.get(ticker) for ticker in tickers if ticker in frames})
+    if panel is None:
+        return {}
+    opens, closes, dividends = panel
+    opens = opens[opens.index >= start.to_period("M")]
+    closes = closes.reindex(opens.index)
+    dividends = dividends.reindex(opens.index)
+    stats = simulate_dca(opens.to_numpy(), dividends.to_numpy(), contribution, reinvest)
+
+    results = {}
+    for column, ticker in enumerate(opens.columns):
+        if not stats["months"][column]:
+            continue
+        last_price = analysis._as_float(closes[ticker].dropna().iloc[-1]) if closes[ticker].notna().any() else float("nan")
+        record = {name: values[column].item() for name, values in stats.items()}
+        record["ticker"] = ticker
+        record["price"] = last_price
+        record["first_month"] = opens[ticker].first_valid_index()
+        record["reinvest"] = reinvest
+        record["value"] = record["shares"] * last_price + record["cash"]
+        # Sem reinvestir, os proventos ficam em caixa fora da posição.
+        total = record["value"] + (0.0 if reinvest else record["dividends"])
+        record["return"] = total / record["invested"] - 1 if record["invested"] else float("nan")
+        results[ticker] = record
+    return results
@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+
+import analysis
+import metrics
+
+
+DIVERSIFICACAO_PERIOD = "5y"
+DIVERSIFICACAO_DEADLINE = analysis._load_float("DIVERSIFICACAO_DEADLINE", 60.0)
+# Pares (e grupos) com correlação a partir deste valor são sinalizados.
+DIVERSIFICACAO_LIMIAR = analysis._load_float("DIVERSIFICACAO_LIMIAR", 0.8)
+# Janela da correlação móvel, em pregões (63 ~ 3 meses).
+DIVERSIFICACAO_JANELA = max(analysis._load_int("DIVERSIFICACAO_JANELA", 63), 10)
+# Mínimo de pregões em comum para um par ter correlação.
+DIVERSIFICACAO_MIN_OBS = max(analysis._load_int("DIVERSIFICACAO_MIN_OBS", 60), 2)
+DIVERSIFICACAO_TOP = analysis._load_int("DIVERSIFICACAO_TOP", 10)
+DIVERSIFICACAO_MAX_TICKERS = analysis._load_int("DIVERSIFICACAO_MAX_TICKERS", 300)
+
+
+def _returns_panel(frames):
+    # Retornos diários (log) alinhados pela data: pregões x tickers, NaN onde o
+    # ticker não negociou (antes da listagem ou sem barra naquele dia).
+    import pandas as pd
+    days, closes = [], []
+    for df in frames.values():
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days.append(index.to_numpy().astype("datetime64[D]"))
+        closes.append(pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=float))
+    calendar = np.unique(np.concatenate(days))
+    panel = np.full((len(calendar), len(frames)), np.nan)
+    for column, (dates, values) in enumerate(zip(days, closes)):
+        panel[np.searchsorted(calendar, dates), column] = values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(np.where(panel > 0, panel, np.nan)), axis=0)
+    returns[~np.isfinite(returns)] = np.nan
+    return calendar[1:], returns
+
+def correlation_matrix(returns, min_obs=DIVERSIFICACAO_MIN_OBS):
+    # Pearson par a par só com os pregões em que os dois têm retorno. As somas
+    # de todos os pares saem de quatro produtos de matrizes.
+    valid = ~np.isnan(returns)
+    mask = valid.astype(float)
+    values = np.where(valid, returns, 0.0)
+    count = mask.T @ mask
+    sums = values.T @ mask
+    squares = (values * values).T @ mask
+    cross = values.T @ values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = cross - sums * sums.T / count
+        variance = squares - sums * sums / count
+        corr = covariance / np.sqrt(variance * variance.T)
+    corr[count < min_obs] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    diagonal = np.diag_indices_from(corr)
+    corr[diagonal] = np.where(np.diag(count) >= min_obs, 1.0, np.nan)
+    return corr
+
+def rolling_pairs(returns, pairs, window=DIVERSIFICACAO_JANELA):
+    # Correlação móvel só dos pares pedidos, com somas acumuladas: (pregões x pares).
+    if not len(pairs):
+        return np.empty((0, 0))
+    x = returns[:, pairs[:, 0]]
+    y = returns[:, pairs[:, 1]]
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    zero = np.zeros((1, len(pairs)))
+    sums = [
+        np.concatenate([zero, np.cumsum(series, axis=0)])
+        for series in (valid.astype(float), x, y, x * x, y * y, x * y)
+    ]
+    n, sx, sy, sxx, syy, sxy = (total[window:] - total[:-window] for total in sums)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+    corr[n < window // 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+def _groups(corr, threshold):
+    # Componentes conexas do grafo "correlação >= limiar" (ligação simples).
+    size = len(corr)
+    linked = np.nan_to_num(corr, nan=0.0) >= threshold
+    labels = np.arange(size)
+    while True:
+        updated = np.where(linked, labels[None, :], size).min(axis=1)
+        updated = np.minimum(updated, labels)
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    groups = {}
+    for index, label in enumerate(labels):
+        groups.setdefault(label, []).append(index)
+    return [members for members in groups.values() if len(members) > 1]
+
+def _concentration(corr):
+    # Autovalores da matriz de correlação: quantas apostas independentes há de
+    # fato e quanto da variância o fator principal explica.
+    filled = np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(filled, 1.0)
+    eigenvalues = np.clip(np.linalg.eigvalsh(filled), 0.0, None)
+    total = eigenvalues.sum()
+    if total <= 0:
+        return float("nan"), float("nan")
+    return float(total ** 2 / (eigenvalues ** 2).sum()), float(eigenvalues.max() / total)
+
+def _mean_offdiagonal(corr):
+    upper = corr[np.triu_indices_from(corr, k=1)]
+    upper = upper[~np.isnan(upper)]
+    return float(upper.mean()) if len(upper) else float("nan")
+
+def summarize(tickers, returns, threshold=DIVERSIFICACAO_LIMIAR, window=DIVERSIFICACAO_JANELA):
+    with metrics.span("diversificacao.corr"):
+        corr = correlation_matrix(returns)
+        recent = correlation_matrix(returns[-window:], min_obs=min(DIVERSIFICACAO_MIN_OBS, window // 2))
+        effective, top_share = _concentration(corr)
+        rows, columns = np.triu_indices_from(corr, k=1)
+        values = corr[rows, columns]
+        flagged = np.flatnonzero(np.nan_to_num(values, nan=-1.0) >= threshold)
+        flagged = flagged[np.argsort(-values[flagged], kind="stable")]
+        pairs = np.column_stack([rows[flagged], columns[flagged]])
+        rolling = rolling_pairs(returns, pairs, window)
+    high_pairs = []
+    for position, (first, second) in enumerate(pairs):
+        series = rolling[:, position]
+        series = series[~np.isnan(series)]
+        high_pairs.append({
+            "pair": (tickers[first], tickers[second]),
+            "corr": float(corr[first, second]),
+            "recent": float(recent[first, second]),
+            "low": float(series.min()) if len(series) else float("nan"),
+            "high": float(series.max()) if len(series) else float("nan"),
+        })
+    return {
+        "tickers": list(tickers),
+        "corr": corr,
+        "recent": recent,
+        "mean_corr": _mean_offdiagonal(corr),
+        "mean_recent": _mean_offdiagonal(recent),
+        "effective": effective,
+        "top_share": top_share,
+        "pairs": high_pairs,
+        "groups": [[tickers[index] for index in members] for members in _groups(corr, threshold)],
+    }
+
+def run_diversificacao(tickers, period=DIVERSIFICACAO_PERIOD, deadline=DIVERSIFICACAO_DEADLINE):
+    tickers = analysis._unique_tickers(tickers)
+    frames = analysis.get_history_batch(tickers, period=period, interval="1d", deadline=deadline)
+    frames = {ticker: frames[ticker] for ticker in tickers if ticker in frames and not frames[ticker].empty}
+    missing = [ticker for ticker in tickers if ticker not in frames]
+    if len(frames) < 2:
+        return {"missing": missing, "tickers": list(frames)}
+    # Mesmo conjunto de tickers e mesma última barra: a conta anterior ainda vale.
+    key = ("correlation", period, DIVERSIFICACAO_LIMIAR, DIVERSIFICACAO_JANELA,
+           tuple(sorted((ticker, str(df.index[-1]), len(df)) for ticker, df in frames.items())))
+    hit, cached = analysis._CACHE.get("correlation", key)
+    if hit:
+        result = cached
+    else:
+        started = time.perf_counter()
+        days, returns = _returns_panel(frames)
+        result = summarize(list(frames), returns)
+        result["days"] = len(days)
+        result["start"], result["end"] = days[0], days[-1]
+        result["elapsed"] = time.perf_counter() - started
+        analysis._CACHE.set("correlation", key, result)
+    return dict(result, missing=missing)
@@ -0,0 +1,113 @@
+import csv
+import json
+import math
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import analysis
+
+
+# Saída estruturada (terminal.py --format json|csv): os mesmos números do
+# /analise, sem o texto com emojis. Os tickers andam em lotes pequenos e cada
+# lote é escrito assim que termina; só EXPORT_WORKERS lotes ficam em memória.
+EXPORT_BATCH_SIZE = max(analysis._load_int("EXPORT_BATCH_SIZE", 20), 1)
+EXPORT_WORKERS = max(analysis._load_int("EXPORT_WORKERS", 4), 1)
+EXPORT_DEADLINE = analysis._load_float("EXPORT_DEADLINE", 60.0)
+FORMATS = ("json", "csv")
+
+
+def _plain(text):
+    # "🛡️ Dívida Baixa" -> "Dívida Baixa": fica só o que tem letra, número ou pontuação ASCII.
+    return " ".join(word for word in text.split() if any(char.isalnum() or char.isascii() for char in word))
+
+def _number(value):
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class AnalysisRecord:
+    # Registro tipado de um ticker analisado; números ausentes ficam None.
+    __slots__ = (
+        "ticker", "price", "pvp", "rsi", "sma200", "dy_pct", "liquidez", "debt",
+        "trend", "sinais", "score", "veredito", "sources", "indexed_at",
+    )
+    NUMBERS = ("price", "pvp", "rsi", "sma200", "dy_pct", "liquidez", "debt")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_record(cls, record):
+        values = {name: _number(record.get(name)) for name in cls.NUMBERS}
+        values.update(
+            ticker=record["ticker"],
+            trend=_plain(record["trend"]).lower(),
+            sinais=[_plain(sinal) for sinal in record["sinais"]],
+            score=int(record["score"]),
+            veredito=_plain(record["veredito"]),
+            sources=dict(record.get("sources") or {}),
+            indexed_at=record.get("indexed_at"),
+        )
+        return cls(**values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_row(self):
+        row = []
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name == "sinais":
+                value = " | ".join(value)
+            elif name == "sources":
+                value = ";".join(f"{metric}={source}" for metric, source in sorted(value.items()))
+            row.append("" if value is None else value)
+        return row
+
+
+def records(tickers, deadline=EXPORT_DEADLINE):
+    # Gera (ticker, AnalysisRecord ou None) na ordem em que os lotes terminam.
+    batches = analysis._chunked(analysis._unique_tickers(tickers), EXPORT_BATCH_SIZE)
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="investbot-export") as pool:
+        pending = {}
+        for batch in batches:
+            pending[pool.submit(analysis.get_records_batch, batch, deadline)] = batch
+            if len(pending) < EXPORT_WORKERS:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _finish(future, pending.pop(future))
+        for future in as_completed(list(pending)):
+            yield from _finish(future, pending.pop(future))
+
+def _finish(future, batch):
+    try:
+        results = future.result()
+    except Exception:
+        results = {}
+    for ticker in batch:
+        record = results.get(ticker)
+        yield ticker, AnalysisRecord.from_record(record) if record else None
+
+def stream(tickers, fmt, out=None, errors=None):
+    out = out or sys.stdout
+    errors = errors or sys.stderr
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer:
+        writer.writerow(AnalysisRecord.__slots__)
+        out.flush()
+    written = 0
+    for ticker, record in records(tickers):
+        if record is None:
+            print(f"⚠️ {ticker}: Ação ou Fundo não encontrado.", file=errors)
+            continue
+        if writer:
+            writer.writerow(record.to_row())
+        else:
+            out.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+        out.flush()
+        written += 1
+    return written
@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+STORE_PATH = os.getenv(
+    "FUNDAMENTALS_STORE_PATH",
+    os.path.join(os.path.dirname(__file__), ".cache", "fundamentals.sqlite"),
+)
+
+_CONNECTION = None
+_LOCK = threading.Lock()
+
+
+def _connect():
+    global _CONNECTION
+    if _CONNECTION is not None:
+        return _CONNECTION
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS fundamentals ("
+        " ticker TEXT PRIMARY KEY, fetched_at INTEGER NOT NULL,"
+        " complete INTEGER NOT NULL, data TEXT NOT NULL)"
+    )
+    conn.commit()
+    _CONNECTION = conn
+    return conn
+
+def _placeholders(items):
+    return ",".join("?" for _ in items)
+
+def load(tickers):
+    # {ticker: (gravado em (epoch), todas as fontes responderam, métricas)}
+    if not tickers:
+        return {}
+    with _LOCK:
+        rows = _connect().execute(
+            "SELECT ticker, fetched_at, complete, data FROM fundamentals"
+            f" WHERE ticker IN ({_placeholders(tickers)})",
+            list(tickers),
+        ).fetchall()
+    return {
+        ticker: (fetched_at, bool(complete), json.loads(data))
+        for ticker, fetched_at, complete, data in rows
+    }
+
+def save(records, fetched_at=None):
+    # records: {ticker: (métricas, completo)}. Uma linha por ticker, sempre a última.
+    if not records:
+        return
+    fetched_at = int(time.time() if fetched_at is None else fetched_at)
+    rows = [
+        (ticker, fetched_at, int(complete), json.dumps(data))
+        for ticker, (data, complete) in records.items()
+    ]
+    with _LOCK:
+        conn = _connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO fundamentals (ticker, fetched_at, complete, data) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+
+STORE_PATH = os.getenv(
+    "HISTORY_STORE_PATH",
+    os.path.join(os.path.dirname(__file__), ".cache", "history.sqlite"),
+)
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+_CONNECTION = None
+_LOCK = threading.Lock()
+
+
+def _connect():
+    global _CONNECTION
+    if _CONNECTION is not None:
+        return _CONNECTION
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS bars ("
+        " ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,"
+        " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+        " PRIMARY KEY (ticker, interval, ts)) WITHOUT ROWID"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS coverage ("
+        " ticker TEXT NOT NULL, interval TEXT NOT NULL, since INTEGER NOT NULL,"
+        " PRIMARY KEY (ticker, interval)) WITHOUT ROWID"
+    )
+    conn.commit()
+    _CONNECTION = conn
+    return conn
+
+def _is_daily(interval):
+    return interval.endswith(("d", "wk", "mo"))
+
+def _to_epoch(timestamp):
+    return int(pd.Timestamp(timestamp).value // 1_000_000_000)
+
+def _index(df, interval):
+    # Mesmo carimbo de tempo que as barras têm no banco: sem fuso e, no diário, só a data.
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    if _is_daily(interval):
+        index = index.normalize()
+    return index
+
+def _placeholders(items):
+    return ",".join("?" for _ in items)
+
+def coverage(tickers, interval="1d"):
+    # {ticker: (início coberto, última barra salva)}
+    if not tickers:
+        return {}
+    with _LOCK:
+        conn = _connect()
+        rows = conn.execute(
+            "SELECT c.ticker, c.since, MAX(b.ts) FROM coverage c"
+            " JOIN bars b ON b.ticker = c.ticker AND b.interval = c.interval"
+            f" WHERE c.interval = ? AND c.ticker IN ({_placeholders(tickers)})"
+            " GROUP BY c.ticker, c.since",
+            [interval, *tickers],
+        ).fetchall()
+    return {
+        ticker: (pd.Timestamp(since, unit="s"), pd.Timestamp(last, unit="s"))
+        for ticker, since, last in rows
+        if last is not None
+    }
+
+def anchors(tickers, interval="1d"):
+    # {ticker: (penúltima barra salva, fechamento dela)}. A última pode ter sido
+    # gravada com o pregão aberto; a penúltima já estava fechada quando foi salva.
+    if not tickers:
+        return {}
+    with _LOCK:
+        rows = _connect().execute(
+            "SELECT c.ticker,"
+            " (SELECT b.ts FROM bars b WHERE b.ticker = c.ticker AND b.interval = c.interval"
+            "  ORDER BY b.ts DESC LIMIT 1 OFFSET 1),"
+            " (SELECT b.close FROM bars b WHERE b.ticker = c.ticker AND b.interval = c.interval"
+            "  ORDER BY b.ts DESC LIMIT 1 OFFSET 1)"
+            f" FROM coverage c WHERE c.interval = ? AND c.ticker IN ({_placeholders(tickers)})",
+            [interval, *tickers],
+        ).fetchall()
+    return {
+        ticker: (pd.Timestamp(ts, unit="s"), close)
+        for ticker, ts, close in rows
+        if ts is not None and close is not None
+    }
+
+def close_on(df, interval, timestamp):
+    # Fechamento de df na barra do carimbo dado (NaN se df não tem essa barra).
+    if df is None or df.empty or "Close" not in df.columns:
+        return float("nan")
+    matches = (_index(df, interval) == timestamp).nonzero()[0]
+    if not len(matches):
+        return float("nan")
+    return float(pd.to_numeric(df["Close"].iloc[matches[-1]], errors="coerce"))
+
+def append(ticker, interval, df, since=None, replace=False):
+    # INSERT OR REPLACE: a última barra do dia (ainda em aberto) é reescrita.
+    # Com replace, as barras antigas do ticker saem antes (histórico reajustado).
+    if df is None or df.empty or "Close" not in df.columns:
+        return
+    frame = df.reindex(columns=COLUMNS)
+    index = _index(frame, interval)
+    stamps = (index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    values = frame.to_numpy(dtype=float)
+    rows = [
+        (ticker, interval, int(ts), *(None if v != v else float(v) for v in row))
+        for ts, row in zip(stamps, values)
+        if row[3] == row[3]
+    ]
+    if not rows:
+        return
+    with _LOCK:
+        conn = _connect()
+        if replace:
+            conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval))
+            conn.execute("DELETE FROM coverage WHERE ticker = ? AND interval = ?", (ticker, interval))
+        conn.executemany(
+            "INSERT OR REPLACE INTO bars (ticker, interval, ts, open, high, low, close, volume)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        if since is not None:
+            conn.execute(
+                "INSERT INTO coverage (ticker, interval, since) VALUES (?, ?, ?)"
+                " ON CONFLICT(ticker, interval) DO UPDATE SET since = MIN(since, excluded.since)",
+                (ticker, interval, _to_epoch(since)),
+            )
+        conn.commit()
+
+def load(tickers, interval="1d", since=None):
+    if not tickers:
+        return {}
+    query = (
+        "SELECT ticker, ts, open, high, low, close, volume FROM bars"
+        f" WHERE interval = ? AND ticker IN ({_placeholders(tickers)})"
+    )
+    params = [interval, *tickers]
+    if since is not None:
+        query += " AND ts >= ?"
+        params.append(_to_epoch(since))
+    query += " ORDER BY ticker, ts"
+    with _LOCK:
+        rows = _connect().execute(query, params).fetchall()
+    if not rows:
+        return {}
+    data = pd.DataFrame(rows, columns=["ticker", "ts", *COLUMNS])
+    data["Date"] = pd.to_datetime(data["ts"], unit="s")
+    frames = {}
+    for ticker, group in data.groupby("ticker", sort=False):
+        frames[ticker] = group.set_index("Date")[COLUMNS]
+    return frames
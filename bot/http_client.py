@@ -0,0 +1,182 @@
+import asyncio
+import threading
+from contextlib import aclosing
+
+import httpx
+
+import analysis
+
+
+# Transporte HTTP único do bot: pool de conexões keep-alive, gzip (e br, com o
+# pacote brotli instalado) decodificados pelo httpx, limite de requisições
+# simultâneas por host e timeout por requisição em vez de socket global.
+
+HTTP_MAX_CONNECTIONS = analysis._load_int("HTTP_MAX_CONNECTIONS", 32)
+HTTP_MAX_PER_HOST = analysis._load_int("HTTP_MAX_PER_HOST", 6)
+HTTP_KEEPALIVE_EXPIRY = analysis._load_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP_TIMEOUT = analysis.DEFAULT_TIMEOUT
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+_CLIENT = None
+_ASYNC_CLIENT = None
+_LOOP = None
+_LOCK = threading.Lock()
+_HOST_SEMAPHORES = {}
+_ASYNC_HOST_SEMAPHORES = {}
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+def _host_semaphore(host):
+    with _LOCK:
+        semaphore = _HOST_SEMAPHORES.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(1, HTTP_MAX_PER_HOST))
+            _HOST_SEMAPHORES[host] = semaphore
+    return semaphore
+
+def _async_host_semaphore(host):
+    # Só é chamado de dentro do loop de I/O, então não precisa de trava.
+    semaphore = _ASYNC_HOST_SEMAPHORES.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, HTTP_MAX_PER_HOST))
+        _ASYNC_HOST_SEMAPHORES[host] = semaphore
+    return semaphore
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    # A vaga do host só é devolvida quando o corpo da resposta termina de ser lido
+    # (ou é fechado), não quando os cabeçalhos chegam.
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class _HostLimitedTransport(httpx.HTTPTransport):
+    def handle_request(self, request):
+        semaphore = _host_semaphore(request.url.host)
+        semaphore.acquire()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, semaphore.release),
+            extensions=response.extensions,
+        )
+
+
+class _AsyncHostLimitedTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        semaphore = _async_host_semaphore(request.url.host)
+        await semaphore.acquire()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, semaphore.release),
+            extensions=response.extensions,
+        )
+
+
+def get_client():
+    # Cliente síncrono compartilhado (threads do executor e SDK da brapi).
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+    with _LOCK:
+        if _CLIENT is None:
+            _CLIENT = httpx.Client(
+                transport=_HostLimitedTransport(limits=_limits(), retries=1),
+                timeout=HTTP_TIMEOUT,
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+            )
+    return _CLIENT
+
+def _get_loop():
+    # Um único event loop em thread própria: o cliente assíncrono e o pool de
+    # conexões dele sobrevivem entre chamadas, como o cliente síncrono.
+    global _LOOP
+    if _LOOP is not None:
+        return _LOOP
+    with _LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="investbot-http", daemon=True).start()
+            _LOOP = loop
+    return _LOOP
+
+def get_async_client():
+    # Deve ser usado só dentro de corrotinas executadas por run().
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            transport=_AsyncHostLimitedTransport(limits=_limits(), retries=1),
+            timeout=HTTP_TIMEOUT,
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+    return _ASYNC_CLIENT
+
+def run(coro, timeout=None):
+    # Executa a corrotina no loop de I/O compartilhado e espera o resultado.
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    try:
+        return future.result(timeout)
+    except Exception:
+        future.cancel()
+        raise
+
+async def astream_text(url, timeout=None, chunk_size=16384):
+    # Texto decodificado (charset da resposta) em pedaços, sem baixar a página inteira antes.
+    client = get_async_client()
+    async with client.stream("GET", url, timeout=HTTP_TIMEOUT if timeout is None else timeout) as response:
+        response.raise_for_status()
+        async with aclosing(response.aiter_text(chunk_size)) as chunks:
+            async for chunk in chunks:
+                yield chunk
@@ -0,0 +1,257 @@
+import math
+import numpy as np
+
+
+# Indicadores em NumPy sobre painéis 2-D (barras x tickers), reproduzindo as
+# fórmulas do pandas_ta 0.4 sem importá-lo. Séries mais curtas entram no painel
+# com NaN à esquerda; cada coluna é tratada como se fosse uma série isolada.
+# Lacunas no meio da série não são esperadas (o histórico já vem sem NaN).
+
+def _as_panel(values):
+    array = np.asarray(values, dtype=float)
+    if array.ndim == 1:
+        return array[:, None], True
+    return array, False
+
+def _restore(array, squeeze):
+    return array[:, 0] if squeeze else array
+
+def _first_valid(panel):
+    valid = ~np.isnan(panel)
+    first = valid.argmax(axis=0)
+    first[~valid.any(axis=0)] = panel.shape[0]
+    return first
+
+def _decayed_cumsum(values, decay):
+    # out[t] = sum(decay ** (t - k) * values[k], k <= t), em blocos para que
+    # decay ** -k não estoure nem perca precisão em séries longas.
+    out = np.empty_like(values)
+    if decay <= 0:
+        out[:] = values
+        return out
+    block = max(1, int(math.log(1e6) / -math.log(decay))) if decay < 1 else len(values)
+    carry = np.zeros(values.shape[1:])
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        steps = np.arange(len(chunk))
+        local = np.cumsum(chunk * (decay ** -steps)[:, None], axis=0) * (decay ** steps)[:, None]
+        out[start:start + len(chunk)] = local + carry * (decay ** (steps + 1))[:, None]
+        carry = out[start + len(chunk) - 1]
+    return out
+
+def _ewm_from(panel, alpha, start):
+    # Equivale a Series.ewm(alpha=alpha, adjust=False).mean() a partir da
+    # linha start de cada coluna (o valor em start entra com peso 1).
+    rows = np.arange(panel.shape[0])[:, None]
+    filled = np.nan_to_num(panel)
+    weights = np.where(rows > start[None, :], alpha, 0.0)
+    weights[rows == start[None, :]] = 1.0
+    out = _decayed_cumsum(filled * weights, 1.0 - alpha)
+    out[rows < start[None, :]] = np.nan
+    return out
+
+def _seeded_ewm(panel, length, alpha):
+    # Semente = média simples das primeiras length barras válidas (presma).
+    first = _first_valid(panel)
+    seed_row = first + length - 1
+    out = np.full_like(panel, np.nan)
+    ok = seed_row < panel.shape[0]
+    if not ok.any():
+        return out
+    columns = np.flatnonzero(ok)
+    seeded = panel[:, columns].copy()
+    for index, column in enumerate(columns):
+        start = first[column]
+        seeded[seed_row[column], index] = np.nanmean(panel[start:start + length, column])
+    out[:, columns] = _ewm_from(seeded, alpha, seed_row[columns])
+    return out
+
+def rma(values, length):
+    panel, squeeze = _as_panel(values)
+    out = _ewm_from(panel, 1.0 / length, _first_valid(panel))
+    return _restore(out, squeeze)
+
+def rsi(close, length=14):
+    panel, squeeze = _as_panel(close)
+    delta = np.full_like(panel, np.nan)
+    delta[1:] = panel[1:] - panel[:-1]
+    start = _first_valid(delta)
+    alpha = 1.0 / length
+    gains = _ewm_from(np.where(delta > 0, delta, 0.0), alpha, start)
+    losses = _ewm_from(np.where(delta < 0, -delta, 0.0), alpha, start)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = 100.0 * gains / (gains + losses)
+    return _restore(out, squeeze)
+
+def _rolling_sums(panel, length):
+    valid = ~np.isnan(panel)
+    filled = np.where(valid, panel, 0.0)
+    zeros = np.zeros((1, panel.shape[1]))
+    total = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    squares = np.concatenate([zeros, np.cumsum(filled * filled, axis=0)])
+    count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    window_sum = np.full_like(panel, np.nan)
+    window_sq = np.full_like(panel, np.nan)
+    if len(panel) >= length:
+        full = (count[length:] - count[:-length]) == length
+        window_sum[length - 1:] = np.where(full, total[length:] - total[:-length], np.nan)
+        window_sq[length - 1:] = np.where(full, squares[length:] - squares[:-length], np.nan)
+    return window_sum, window_sq
+
+def sma(close, length):
+    panel, squeeze = _as_panel(close)
+    window_sum, _ = _rolling_sums(panel, length)
+    return _restore(window_sum / length, squeeze)
+
+def ema(close, length):
+    panel, squeeze = _as_panel(close)
+    return _restore(_seeded_ewm(panel, length, 2.0 / (length + 1)), squeeze)
+
+def macd(close, fast=12, slow=26, signal=9):
+    panel, squeeze = _as_panel(close)
+    line = ema(panel, fast) - ema(panel, slow)
+    signal_line = ema(line, signal)
+    histogram = line - signal_line
+    return tuple(_restore(out, squeeze) for out in (line, signal_line, histogram))
+
+def bollinger(close, length=20, std=2.0, ddof=1):
+    panel, squeeze = _as_panel(close)
+    window_sum, window_sq = _rolling_sums(panel, length)
+    mid = window_sum / length
+    variance = (window_sq - window_sum * mid) / (length - ddof)
+    deviation = np.sqrt(np.clip(variance, 0.0, None))
+    lower = mid - std * deviation
+    upper = mid + std * deviation
+    return tuple(_restore(out, squeeze) for out in (lower, mid, upper))
+
+def atr(high, low, close, length=14):
+    high, squeeze = _as_panel(high)
+    low, _ = _as_panel(low)
+    close, _ = _as_panel(close)
+    previous = np.full_like(close, np.nan)
+    previous[1:] = close[:-1]
+    ranges = np.stack([high - low, np.abs(high - previous), np.abs(previous - low)])
+    with np.errstate(invalid="ignore"):
+        true_range = np.nanmax(np.where(np.isnan(ranges), -np.inf, ranges), axis=0)
+    true_range[np.isinf(true_range)] = np.nan
+    return _restore(_seeded_ewm(true_range, length, 1.0 / length), squeeze)
+
+
+class IndicatorState:
+    # Estado incremental de RSI (médias de Wilder) e SMA (soma móvel em buffer
+    # circular) para vários tickers: cada barra nova custa O(1) por ticker.
+    # amend() reescreve a última barra (pregão em aberto) sem refazer o resto.
+
+    def __init__(self, size, rsi_length=14, sma_length=200):
+        self.rsi_length = rsi_length
+        self.sma_length = sma_length
+        self._alpha = 1.0 / rsi_length
+        self._gain = np.full(size, np.nan)
+        self._loss = np.full(size, np.nan)
+        self._prev_close = np.full(size, np.nan)
+        self._window = np.full((sma_length, size), np.nan)
+        self._slot = 0
+        self._sum = np.zeros(size)
+        self._count = np.zeros(size)
+        self._undo = None
+        self.close = np.full(size, np.nan)
+        self.rsi = np.full(size, np.nan)
+        self.sma = np.full(size, np.nan)
+
+    @classmethod
+    def from_history(cls, close, rsi_length=14, sma_length=200):
+        panel, _ = _as_panel(close)
+        state = cls(panel.shape[1], rsi_length, sma_length)
+        if len(panel) == 0:
+            return state
+        history = panel[:-1]
+        if len(history):
+            delta = np.full_like(history, np.nan)
+            delta[1:] = history[1:] - history[:-1]
+            start = _first_valid(delta)
+            state._gain = _ewm_from(np.where(delta > 0, delta, 0.0), state._alpha, start)[-1]
+            state._loss = _ewm_from(np.where(delta < 0, -delta, 0.0), state._alpha, start)[-1]
+            state._prev_close = history[-1].copy()
+            tail = history[-sma_length:]
+            state._window[:len(tail)] = tail
+            state._slot = len(tail) % sma_length
+            state._sum = np.nansum(tail, axis=0)
+            state._count = (~np.isnan(tail)).sum(axis=0).astype(float)
+        state.update(panel[-1])
+        return state
+
+    def _snapshot(self):
+        return (
+            self._gain.copy(),
+            self._loss.copy(),
+            self._prev_close.copy(),
+            self._slot,
+            self._window[self._slot].copy(),
+            self._sum.copy(),
+            self._count.copy(),
+            self.close.copy(),
+            self.rsi.copy(),
+            self.sma.copy(),
+        )
+
+    def update(self, close):
+        close = np.asarray(close, dtype=float)
+        self._undo = self._snapshot()
+
+        delta = close - self._prev_close
+        valid = ~np.isnan(delta)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        started = ~np.isnan(self._gain)
+        decay = 1.0 - self._alpha
+        self._gain = np.where(valid, np.where(started, decay * self._gain + self._alpha * gain, gain), self._gain)
+        self._loss = np.where(valid, np.where(started, decay * self._loss + self._alpha * loss, loss), self._loss)
+        self._prev_close = close.copy()
+
+        old = self._window[self._slot]
+        self._sum -= np.nan_to_num(old)
+        self._count -= ~np.isnan(old)
+        self._window[self._slot] = close
+        self._sum += np.nan_to_num(close)
+        self._count += ~np.isnan(close)
+        self._slot = (self._slot + 1) % self.sma_length
+        if self._slot == 0:
+            # Recalcula a soma a cada volta do buffer para não acumular erro.
+            self._sum = np.nansum(self._window, axis=0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.rsi = 100.0 * self._gain / (self._gain + self._loss)
+        self.sma = np.where(self._count == self.sma_length, self._sum / self.sma_length, np.nan)
+        self.close = close.copy()
+        return self.rsi, self.sma
+
+    def amend(self, close):
+        if self._undo is None:
+            return self.update(close)
+        (
+            self._gain,
+            self._loss,
+            self._prev_close,
+            self._slot,
+            window_row,
+            self._sum,
+            self._count,
+            self.close,
+            self.rsi,
+            self.sma,
+        ) = self._undo
+        self._window[self._slot] = window_row
+        return self.update(close)
+
+    def column(self, index):
+        single = IndicatorState(1, self.rsi_length, self.sma_length)
+        for name in ("_gain", "_loss", "_prev_close", "_sum", "_count", "close", "rsi", "sma"):
+            setattr(single, name, getattr(self, name)[index:index + 1].copy())
+        single._window = self._window[:, index:index + 1].copy()
+        single._slot = self._slot
+        if self._undo is not None:
+            undo = list(self._undo)
+            for position in (0, 1, 2, 4, 5, 6, 7, 8, 9):
+                undo[position] = undo[position][index:index + 1].copy()
+            single._undo = tuple(undo)
+        return single
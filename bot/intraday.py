@@ -0,0 +1,215 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import analysis
+import indicators
+import metrics
+
+
+# Intraday em buffers circulares de tamanho fixo: por ticker e intervalo, as
+# últimas INTRADAY_BARS barras OHLCV em float32 e os horários em segundos
+# (epoch, UTC). O total de memória é limitado por INTRADAY_MEMORY_MB; acima
+# disso sai quem foi consultado há mais tempo.
+
+INTRADAY_BARS = max(analysis._load_int("INTRADAY_BARS", 1024), 32)
+INTRADAY_MEMORY_MB = analysis._load_float("INTRADAY_MEMORY_MB", 32.0)
+INTRADAY_INTERVAL = os.getenv("INTRADAY_INTERVAL", "5m")
+INTRADAY_RSI = analysis._load_int("INTRADAY_RSI", 14)
+INTRADAY_SMA = analysis._load_int("INTRADAY_SMA", 50)
+INTRADAY_DEADLINE = analysis._load_float("INTRADAY_DEADLINE", 15.0)
+# intervalo -> (período da primeira carga, período das atualizações). O Yahoo
+# só serve 1m dos últimos 7 dias e 5m/15m dos últimos 60.
+INTERVALS = {
+    "1m": ("5d", "1d"),
+    "5m": ("1mo", "5d"),
+    "15m": ("1mo", "5d"),
+}
+_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+_CLOSE = _COLUMNS.index("Close")
+
+
+class BarRing:
+    __slots__ = ("times", "bars", "start", "size")
+
+    def __init__(self, capacity):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.bars = np.zeros((capacity, len(_COLUMNS)), dtype=np.float32)
+        self.start = 0
+        self.size = 0
+
+    @property
+    def capacity(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.bars.nbytes
+
+    def _positions(self):
+        return (self.start + np.arange(self.size)) % self.capacity
+
+    def last_time(self):
+        if not self.size:
+            return None
+        return int(self.times[(self.start + self.size - 1) % self.capacity])
+
+    def extend(self, times, bars):
+        # Só entra o que é mais novo que a última barra; a barra com o mesmo
+        # horário da última (candle ainda em formação) é regravada.
+        last = self.last_time()
+        if last is not None:
+            same = np.flatnonzero(times == last)
+            if len(same):
+                self.bars[(self.start + self.size - 1) % self.capacity] = bars[same[-1]]
+            newer = times > last
+            times, bars = times[newer], bars[newer]
+        count = len(times)
+        if not count:
+            return 0
+        capacity = self.capacity
+        if count >= capacity:
+            self.times[:] = times[-capacity:]
+            self.bars[:] = bars[-capacity:]
+            self.start, self.size = 0, capacity
+            return count
+        positions = (self.start + self.size + np.arange(count)) % capacity
+        self.times[positions] = times
+        self.bars[positions] = bars
+        overflow = max(self.size + count - capacity, 0)
+        self.start = (self.start + overflow) % capacity
+        self.size = min(self.size + count, capacity)
+        return count
+
+    def closes(self):
+        return self.bars[self._positions(), _CLOSE]
+
+
+class IntradayStore:
+    def __init__(self, capacity=INTRADAY_BARS, budget_mb=INTRADAY_MEMORY_MB):
+        self.capacity = capacity
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    @property
+    def ring_bytes(self):
+        return self.capacity * (np.dtype(np.int64).itemsize + len(_COLUMNS) * np.dtype(np.float32).itemsize)
+
+    @property
+    def max_tickers(self):
+        return max(self.budget // self.ring_bytes, 1)
+
+    def last_times(self, keys):
+        with self._lock:
+            return {key: self._rings[key].last_time() for key in keys if key in self._rings}
+
+    def feed(self, key, times, bars):
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = BarRing(self.capacity)
+            self._rings.move_to_end(key)
+            added = ring.extend(times, bars)
+            while len(self._rings) > self.max_tickers:
+                self._rings.popitem(last=False)
+                self.evicted += 1
+                metrics.count("intraday_evicted")
+        return added
+
+    def snapshot(self, keys):
+        # Cópias das séries de fechamento e do último horário, para calcular fora da trava.
+        with self._lock:
+            found = {}
+            for key in keys:
+                ring = self._rings.get(key)
+                if ring is None or not ring.size:
+                    continue
+                self._rings.move_to_end(key)
+                found[key] = (ring.closes(), ring.last_time())
+            return found
+
+    def stats(self):
+        with self._lock:
+            used = sum(ring.nbytes for ring in self._rings.values())
+            return {
+                "tickers": len(self._rings),
+                "bytes": used,
+                "budget": self.budget,
+                "max_tickers": self.max_tickers,
+                "evicted": self.evicted,
+            }
+
+
+_STORE = IntradayStore()
+
+
+def _frame_arrays(df):
+    # DataFrame (Yahoo com fuso, brapi em UTC sem fuso) -> (segundos epoch, OHLCV float32).
+    import pandas as pd
+    df = df.reindex(columns=list(_COLUMNS))
+    df = df[df["Close"].notna()]
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    times = index.as_unit("s").asi8
+    bars = df.to_numpy(dtype=np.float32, na_value=np.nan)
+    order = np.argsort(times, kind="stable")
+    return times[order], bars[order]
+
+def refresh(tickers, interval=INTRADAY_INTERVAL, deadline=INTRADAY_DEADLINE, store=_STORE):
+    # Primeira carga com o período inteiro; depois só os últimos pregões.
+    initial, incremental = INTERVALS[interval]
+    known = store.last_times([(ticker, interval) for ticker in tickers])
+    groups = {}
+    for ticker in tickers:
+        period = incremental if (ticker, interval) in known else initial
+        groups.setdefault(period, []).append(ticker)
+    fed = []
+    with metrics.span("intraday.fetch"):
+        for period, group in groups.items():
+            frames = analysis.get_intraday_history_batch(group, period, interval, deadline=deadline)
+            for ticker, df in frames.items():
+                if df is None or df.empty:
+                    continue
+                times, bars = _frame_arrays(df)
+                store.feed((ticker, interval), times, bars)
+                fed.append(ticker)
+    return fed
+
+def compute(tickers, interval=INTRADAY_INTERVAL, rsi_length=INTRADAY_RSI, sma_length=INTRADAY_SMA, store=_STORE):
+    # Um painel (barras x tickers) com NaN à esquerda para as séries mais curtas
+    # e os indicadores de todos de uma vez, em float64 só durante o cálculo.
+    series = store.snapshot([(ticker, interval) for ticker in tickers])
+    if not series:
+        return {}
+    with metrics.span("intraday.indicators"):
+        length = max(len(closes) for closes, _ in series.values())
+        panel = np.full((length, len(series)), np.nan)
+        for column, (closes, _) in enumerate(series.values()):
+            panel[length - len(closes):, column] = closes
+        rsi = indicators.rsi(panel, rsi_length)[-1]
+        sma = indicators.sma(panel, sma_length)[-1]
+    results = {}
+    for column, ((ticker, _), (closes, last_time)) in enumerate(series.items()):
+        results[ticker] = {
+            "ticker": ticker,
+            "interval": interval,
+            "price": float(closes[-1]),
+            "rsi": float(rsi[column]),
+            "sma": float(sma[column]),
+            "bars": len(closes),
+            "last_time": last_time,
+        }
+    return results
+
+def analyze(tickers, interval=INTRADAY_INTERVAL, store=_STORE):
+    tickers = analysis._unique_tickers(tickers)
+    refresh(tickers, interval, store=store)
+    return compute(tickers, interval, store=store)
+
+def stats(store=_STORE):
+    return store.stats()
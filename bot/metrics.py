@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+
+# Métricas em memória do processo (ou do daemon): duração de cada etapa,
+# requisições e falhas por fonte e qual fonte respondeu cada indicador.
+# Com METRICS=0 as chamadas viram no-op e os spans devolvem um contexto vazio.
+
+ENABLED = os.getenv("METRICS", "1").strip().lower() not in {"0", "false", "no", "off"}
+_SAMPLES = 512
+# Limites dos buckets do histograma Prometheus, em segundos.
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_LOCK = threading.Lock()
+_SPANS = {}
+_COUNTERS = {}
+_STARTED = time.time()
+_NULL_SPAN = nullcontext()
+
+
+class _SpanStats:
+    __slots__ = ("count", "total", "max", "buckets", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(_BUCKETS)
+        self.samples = deque(maxlen=_SAMPLES)
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        for index, bound in enumerate(_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+        self.samples.append(elapsed)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            error(self.name, exc)
+        return False
+
+
+def span(name):
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+def observe(name, elapsed):
+    if not ENABLED:
+        return
+    with _LOCK:
+        stats = _SPANS.get(name)
+        if stats is None:
+            stats = _SPANS[name] = _SpanStats()
+        stats.add(elapsed)
+
+def count(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+
+def error(source, exc):
+    # Timeouts separados das demais exceções: um indica fonte lenta, o outro fonte quebrada.
+    if not ENABLED:
+        return
+    name = type(exc).__name__
+    if isinstance(exc, TimeoutError) or "timeout" in name.lower():
+        kind = "timeout"
+    elif name == "CancelledError":
+        kind = "cancelled"
+    else:
+        kind = "exception"
+    count("errors", source=source, kind=kind, type=name)
+
+def deadline_expired(stage, amount=1):
+    count("deadline_expired", amount, stage=stage)
+
+def attribute(metric, source, fallback=False):
+    # Qual fonte forneceu o indicador; fallback quando não foi a preferida.
+    if not ENABLED:
+        return
+    count("metric_source", metric=metric, source=source or "ausente")
+    if fallback:
+        count("fallbacks", metric=metric)
+
+def reset():
+    global _STARTED
+    with _LOCK:
+        _SPANS.clear()
+        _COUNTERS.clear()
+        _STARTED = time.time()
+
+def snapshot():
+    with _LOCK:
+        spans = {
+            name: {
+                "count": stats.count,
+                "total": stats.total,
+                "max": stats.max,
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+                "buckets": list(stats.buckets),
+            }
+            for name, stats in _SPANS.items()
+        }
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in _COUNTERS.items()
+        ]
+    counters.sort(key=lambda item: (item["name"], sorted(item["labels"].items())))
+    return {"enabled": ENABLED, "uptime": time.time() - _STARTED, "spans": spans, "counters": counters}
+
+def render_json(data=None):
+    data = snapshot() if data is None else data
+    return json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True)
+
+def _prom_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_prometheus(data=None):
+    data = snapshot() if data is None else data
+    lines = [
+        "# HELP investbot_span_seconds Duração das etapas de busca e cálculo.",
+        "# TYPE investbot_span_seconds histogram",
+    ]
+    for name, stats in sorted(data["spans"].items()):
+        cumulative = 0
+        for bound, amount in zip(_BUCKETS, stats["buckets"]):
+            cumulative += amount
+            lines.append(f'investbot_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'investbot_span_seconds_bucket{{span="{name}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'investbot_span_seconds_sum{{span="{name}"}} {stats["total"]:.6f}')
+        lines.append(f'investbot_span_seconds_count{{span="{name}"}} {stats["count"]}')
+    declared = set()
+    for counter in data["counters"]:
+        metric = f"investbot_{counter['name']}_total"
+        if metric not in declared:
+            lines.append(f"# TYPE {metric} counter")
+            declared.add(metric)
+        lines.append(f"{metric}{_prom_labels(counter['labels'])} {counter['value']}")
+    lines.append("# TYPE investbot_uptime_seconds gauge")
+    lines.append(f"investbot_uptime_seconds {data['uptime']:.0f}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+import re
+import time
+from datetime import datetime
+
+import analysis
+import backtest
+
+
+MONITOR_INTERVAL = analysis._load_float("MONITOR_INTERVAL", 60.0)
+MONITOR_MIN_INTERVAL = 15.0
+# Fundamentos (e o histórico de um ano) são refeitos neste intervalo; entre
+# uma atualização e outra só o IFR, a SMA200 e o preço andam.
+MONITOR_REFRESH = analysis._load_float("MONITOR_REFRESH", 3600.0)
+MONITOR_DEADLINE = analysis._load_float("MONITOR_DEADLINE", 30.0)
+# O estado dos indicadores vive no LRU do analysis; acima dele os tickers se
+# expulsariam a cada ciclo e tudo voltaria a ser recalculado do zero.
+MONITOR_MAX_TICKERS = min(analysis._load_int("MONITOR_MAX_TICKERS", 500), analysis.CACHE_MAX_ENTRIES)
+
+_INTERVAL_RE = re.compile(r"^(\d+(?:[.,]\d+)?)(s|m|min|h)?$", re.IGNORECASE)
+_UNITS = {"s": 1, "m": 60, "min": 60, "h": 3600}
+
+
+def parse_interval(text):
+    match = _INTERVAL_RE.match(text or "")
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", "."))
+    return value * _UNITS[(match.group(2) or "s").lower()]
+
+def parse_args(parts):
+    tickers = []
+    interval = MONITOR_INTERVAL
+    items = iter(parts[1:])
+    for part in items:
+        if part.lower().startswith("--a-cada"):
+            _, _, value = part.partition("=")
+            interval = parse_interval(value or next(items, ""))
+            if interval is None:
+                return None, None, "⚠️ Intervalo inválido. Ex: /monitor PETR4 --a-cada 60s"
+            continue
+        ticker = part.upper()
+        if ticker not in tickers:
+            tickers.append(ticker)
+    if not tickers:
+        return None, None, "⚠️ Informe os tickers. Ex: /monitor PETR4 VALE3 MXRF11 --a-cada 60s"
+    if len(tickers) > MONITOR_MAX_TICKERS:
+        return None, None, f"⚠️ No máximo {MONITOR_MAX_TICKERS} tickers por monitor."
+    return tickers, max(interval, MONITOR_MIN_INTERVAL), None
+
+def _daily_index(df):
+    # Mesmo formato de data do histórico local, para achar a última barra conhecida.
+    import pandas as pd
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    # Trunca pelo NumPy: normalize() infere a frequência e custava mais que o resto do ciclo.
+    return df.set_axis(pd.DatetimeIndex(index.to_numpy().astype("datetime64[D]")))
+
+def _snapshot(price, rsi, sma200, base):
+    points, _ = analysis._rsi_signal(rsi)
+    score = base + points
+    return {
+        "price": price,
+        "rsi": rsi,
+        "sma200": sma200,
+        "base": base,
+        "score": score,
+        "veredito": analysis._verdict(score),
+    }
+
+def _crossed(before, after, level):
+    # +1 cruzou para cima, -1 para baixo, 0 nada (NaN nunca cruza).
+    if before < level <= after:
+        return 1
+    if before >= level > after:
+        return -1
+    return 0
+
+def _alerts(before, after):
+    alerts = []
+    for level in (backtest.RSI_OVERSOLD, backtest.RSI_OVERBOUGHT):
+        direction = _crossed(before["rsi"], after["rsi"], level)
+        if direction:
+            arrow = "para cima 📈" if direction > 0 else "para baixo 📉"
+            alerts.append(f"IFR cruzou {level} {arrow} ({after['rsi']:.1f})")
+    before_gap = before["price"] - before["sma200"]
+    after_gap = after["price"] - after["sma200"]
+    direction = _crossed(before_gap, after_gap, 0)
+    if direction > 0:
+        alerts.append(f"🚀 Preço passou acima da SMA200 (R$ {after['price']:.2f} > R$ {after['sma200']:.2f})")
+    elif direction < 0:
+        alerts.append(f"⚠️ Preço caiu abaixo da SMA200 (R$ {after['price']:.2f} < R$ {after['sma200']:.2f})")
+    if before["veredito"] != after["veredito"]:
+        alerts.append(f"🔄 {before['veredito']} → {after['veredito']} (score {after['score']})")
+    return alerts
+
+
+class Monitor:
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.snapshots = {}
+        self.refreshed = None
+
+    def refresh(self):
+        # Análise completa: fundamentos, um ano de histórico e o estado dos indicadores.
+        records = analysis.get_scores_batch(self.tickers, deadline=MONITOR_DEADLINE)
+        alerts = []
+        for ticker, record in records.items():
+            points, _ = analysis._rsi_signal(record["rsi"])
+            after = _snapshot(record["price"], record["rsi"], record["sma200"], record["score"] - points)
+            before = self.snapshots.get(ticker)
+            if before is not None:
+                alerts.extend((ticker, alert) for alert in _alerts(before, after))
+            self.snapshots[ticker] = after
+        self.refreshed = time.monotonic()
+        return alerts
+
+    def tick(self):
+        if self.refreshed is None or time.monotonic() - self.refreshed >= MONITOR_REFRESH:
+            return self.refresh()
+        frames = analysis.get_recent_bars(list(self.snapshots), deadline=MONITOR_DEADLINE)
+        frames = {ticker: _daily_index(df) for ticker, df in frames.items() if not df.empty}
+        # O(1) por ticker: reescreve o pregão em aberto e aplica as barras novas.
+        values = analysis._compute_indicators(frames, advance_only=True)
+        stale = [ticker for ticker in frames if ticker not in values]
+        if stale:
+            # Estado expulso do LRU ou buraco maior que 5 pregões: refaz só esses.
+            history = analysis.get_history_batch(stale, period="1y", deadline=MONITOR_DEADLINE)
+            values.update(analysis._compute_indicators(history))
+        alerts = []
+        for ticker, (rsi, sma200) in values.items():
+            before = self.snapshots.get(ticker)
+            if before is None:
+                continue
+            price = analysis._as_float(frames[ticker]["Close"].iloc[-1])
+            after = _snapshot(price, rsi, sma200, before["base"])
+            alerts.extend((ticker, alert) for alert in _alerts(before, after))
+            self.snapshots[ticker] = after
+        return alerts
+
+
+def run(tickers, interval):
+    monitor = Monitor(tickers)
+    print(f"👀 Monitorando {len(tickers)} ativo(s) a cada {interval:.0f}s. Ctrl+C volta ao terminal.")
+    try:
+        monitor.refresh()
+        missing = [ticker for ticker in tickers if ticker not in monitor.snapshots]
+        if missing:
+            print(f"⚠️ Sem dados, fora do monitor: {', '.join(missing)}")
+        if not monitor.snapshots:
+            return
+        next_run = time.monotonic() + interval
+        while True:
+            time.sleep(max(next_run - time.monotonic(), 0))
+            started = time.monotonic()
+            for ticker, alert in monitor.tick():
+                print(f"[{datetime.now():%H:%M:%S}] {ticker}: {alert}")
+            elapsed = time.monotonic() - started
+            if elapsed > interval:
+                print(f"⏳ Ciclo levou {elapsed:.0f}s, mais que o intervalo de {interval:.0f}s.")
+            # Ciclo atrasado pula para o próximo horário em vez de acumular.
+            next_run += interval * (int((time.monotonic() - next_run) // interval) + 1)
+    except KeyboardInterrupt:
+        print("\n🛑 Monitor encerrado.")
+
+def run_command(text):
+    tickers, interval, error = parse_args(text.split())
+    if error:
+        print(error)
+        return
+    run(tickers, interval)
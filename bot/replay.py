@@ -0,0 +1,425 @@
+import json
+import os
+import random
+import threading
+import time
+
+import analysis
+
+
+# Grava e reproduz as respostas das fontes externas (yf.download, Ticker.info /
+# fast_info, brapi quote.retrieve e páginas do Investidor10) para rodar os
+# comandos sem rede. Na reprodução cada fonte pode ganhar uma latência
+# artificial, para que os benchmarks meçam o bot e não o humor da internet.
+
+FIXTURE_VERSION = 1
+_FAST_INFO_KEYS = ("lastPrice", "last_price", "regularMarketPrice", "regular_market_price")
+_SOURCES = ("yahoo", "brapi", "investidor10")
+
+
+def parse_latency(text):
+    # "yahoo=0.25,brapi=0.1" ou um número só para todas as fontes (segundos).
+    latency = {source: 0.0 for source in _SOURCES}
+    if not text:
+        return latency
+    for item in str(text).split(","):
+        name, sep, value = item.partition("=")
+        try:
+            if sep:
+                latency[name.strip()] = float(value)
+            else:
+                latency = {source: float(name) for source in _SOURCES}
+        except ValueError:
+            continue
+    return latency
+
+def _empty_fixtures():
+    return {"version": FIXTURE_VERSION, "yahoo": {}, "info": {}, "fast_info": {}, "brapi": {}, "html": {}}
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as handle:
+        fixtures = json.load(handle)
+    for key, value in _empty_fixtures().items():
+        fixtures.setdefault(key, value)
+    return fixtures
+
+def save_fixtures(fixtures, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(fixtures, handle, ensure_ascii=False, default=str)
+
+def _variant(interval, auto_adjust):
+    return f"{interval}|{'adj' if auto_adjust else 'raw'}"
+
+def _brapi_key(symbol, params):
+    return "|".join([symbol, *(str(params.get(name) or "") for name in ("range", "interval", "modules"))])
+
+def _frame_to_json(df):
+    import numpy as np
+    values = df.to_numpy(dtype=float)
+    return {
+        "index": [ts.isoformat() for ts in df.index],
+        "columns": [str(column) for column in df.columns],
+        "data": np.where(np.isnan(values), None, values).tolist(),
+    }
+
+def _frame_from_json(data):
+    import pandas as pd
+    index = pd.DatetimeIndex(pd.to_datetime(data["index"]), name="Date")
+    return pd.DataFrame(data["data"], index=index, columns=data["columns"], dtype=float)
+
+def _split_download(df, symbols):
+    import pandas as pd
+    frames = {}
+    if df is None or df.empty:
+        return frames
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex):
+            if symbol not in df.columns.get_level_values(-1):
+                continue
+            frame = df.xs(symbol, axis=1, level=-1)
+        else:
+            frame = df
+        frame = frame.dropna(how="all")
+        if not frame.empty:
+            frames[symbol] = frame
+    return frames
+
+
+class _Session:
+    def __init__(self, fixtures, latency=None, jitter=0.2, recording=False):
+        self.fixtures = fixtures
+        self.latency = parse_latency(latency) if not isinstance(latency, dict) else latency
+        self.jitter = jitter
+        self.recording = recording
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._saved = {}
+
+    def wait(self, source):
+        delay = self.latency.get(source, 0.0)
+        if delay > 0:
+            time.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def wait_async(self, source):
+        import asyncio
+        delay = self.latency.get(source, 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    # --- Yahoo -------------------------------------------------------------
+
+    def frame(self, symbol, variant):
+        key = (symbol, variant)
+        with self._lock:
+            if key not in self._frames:
+                data = self.fixtures["yahoo"].get(symbol, {}).get(variant)
+                self._frames[key] = _frame_from_json(data) if data else None
+            return self._frames[key]
+
+    def store_frame(self, symbol, variant, frame):
+        with self._lock:
+            known = self._frames.get((symbol, variant))
+            merged = frame if known is None else frame.combine_first(known)
+            self._frames[(symbol, variant)] = merged
+            self.fixtures["yahoo"].setdefault(symbol, {})[variant] = _frame_to_json(merged)
+
+    def download(self, tickers, period=None, start=None, interval="1d", auto_adjust=True, **kwargs):
+        import pandas as pd
+        symbols = list(tickers) if isinstance(tickers, (list, tuple)) else str(tickers).split()
+        self.wait("yahoo")
+        variant = _variant(interval, auto_adjust)
+        frames = {}
+        for symbol in symbols:
+            frame = self.frame(symbol, variant)
+            if frame is None or frame.empty:
+                continue
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            elif period:
+                # Período contado a partir da última barra gravada, para que a
+                # fixture continue servindo dias depois de gravada.
+                span = pd.Timestamp.now().normalize() - analysis._period_start(period)
+                frame = frame[frame.index >= frame.index[-1] - span]
+            if not frame.empty:
+                frames[symbol] = frame
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, axis=1)
+        return df.swaplevel(0, 1, axis=1)
+
+    # --- brapi -------------------------------------------------------------
+
+    def quotes(self, tickers, params):
+        self.wait("brapi")
+        results = []
+        for symbol in str(tickers).split(","):
+            result = self._quote(symbol.strip().upper(), params)
+            if result is not None:
+                results.append(result)
+        return {"results": results}
+
+    def _quote(self, symbol, params):
+        fixtures = self.fixtures["brapi"]
+        result = fixtures.get(_brapi_key(symbol, params))
+        if result is not None or not params:
+            return result
+        # Chamada combinada sem gravação própria: junta cotação, módulos e
+        # histórico gravados separadamente.
+        parts = [{}]
+        if params.get("modules"):
+            parts.append({"modules": params["modules"]})
+        if params.get("range"):
+            parts.append({"range": params["range"], "interval": params.get("interval")})
+        merged = {}
+        for part in parts:
+            merged.update(fixtures.get(_brapi_key(symbol, part)) or {})
+        return merged or None
+
+    def store_quotes(self, data, params):
+        with self._lock:
+            for result in analysis._brapi_get(data, "results") or []:
+                item = result.model_dump(mode="json") if hasattr(result, "model_dump") else analysis._brapi_to_dict(result)
+                symbol = str(analysis._brapi_get(item, "symbol") or "").upper()
+                if symbol:
+                    self.fixtures["brapi"][_brapi_key(symbol, params)] = item
+
+
+class _ReplayTicker:
+    def __init__(self, session, symbol):
+        self._session = session
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        self._session.wait("yahoo")
+        return dict(self._session.fixtures["info"].get(self.ticker) or {})
+
+    @property
+    def fast_info(self):
+        self._session.wait("yahoo")
+        return dict(self._session.fixtures["fast_info"].get(self.ticker) or {})
+
+
+class _RecordingTicker:
+    def __init__(self, session, ticker_cls, symbol):
+        self._session = session
+        self._ticker = ticker_cls(symbol)
+        self.ticker = symbol
+
+    def __getattr__(self, name):
+        return getattr(self._ticker, name)
+
+    @property
+    def info(self):
+        info = self._ticker.info or {}
+        with self._session._lock:
+            self._session.fixtures["info"][self.ticker] = json.loads(json.dumps(info, default=str))
+        return info
+
+    @property
+    def fast_info(self):
+        fast_info = self._ticker.fast_info
+        values = {}
+        for key in _FAST_INFO_KEYS:
+            try:
+                value = fast_info[key]
+            except Exception:
+                continue
+            if value is not None:
+                values[key] = float(value)
+        with self._session._lock:
+            self._session.fixtures["fast_info"][self.ticker] = values
+        return fast_info
+
+
+class _QuoteResource:
+    def __init__(self, session, real=None):
+        self._session = session
+        self._real = real
+
+    def retrieve(self, tickers, **params):
+        if self._real is None:
+            return self._session.quotes(tickers, params)
+        data = self._real.quote.retrieve(tickers=tickers, **params)
+        self._session.store_quotes(data, params)
+        return data
+
+
+class _BrapiClient:
+    def __init__(self, session, real=None):
+        self.quote = _QuoteResource(session, real)
+
+
+class Replay:
+    # Uso: with Replay.load("fixtures.json", latency="yahoo=0.2"): ...
+    #      with Replay.record("fixtures.json"): ...   (rede de verdade, grava no fim)
+    def __init__(self, session, path=None):
+        self.session = session
+        self.path = path
+        self._originals = None
+
+    @classmethod
+    def load(cls, path, latency=None, jitter=0.2):
+        return cls(_Session(load_fixtures(path), latency, jitter))
+
+    @classmethod
+    def from_fixtures(cls, fixtures, latency=None, jitter=0.2):
+        return cls(_Session(fixtures, latency, jitter))
+
+    @classmethod
+    def record(cls, path):
+        fixtures = load_fixtures(path) if os.path.exists(path) else _empty_fixtures()
+        return cls(_Session(fixtures, recording=True), path)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.restore()
+        if self.session.recording and self.path:
+            save_fixtures(self.session.fixtures, self.path)
+        return False
+
+    def install(self):
+        import yfinance
+        import http_client
+        session = self.session
+        self._originals = (yfinance.download, yfinance.Ticker, http_client.astream_text, analysis._BRAPI_CLIENT)
+        real_download, real_ticker, real_stream, _ = self._originals
+
+        if session.recording:
+            def download(tickers, *args, **kwargs):
+                df = real_download(tickers, *args, **kwargs)
+                symbols = list(tickers) if isinstance(tickers, (list, tuple)) else str(tickers).split()
+                variant = _variant(kwargs.get("interval", "1d"), kwargs.get("auto_adjust", True))
+                for symbol, frame in _split_download(df, symbols).items():
+                    session.store_frame(symbol, variant, frame)
+                return df
+
+            async def astream_text(url, *args, **kwargs):
+                chunks = []
+                try:
+                    async for chunk in real_stream(url, *args, **kwargs):
+                        chunks.append(chunk)
+                        yield chunk
+                finally:
+                    # Se o leitor parou cedo, grava só o que ele chegou a ler.
+                    with session._lock:
+                        session.fixtures["html"][url] = "".join(chunks)
+
+            yfinance.download = download
+            yfinance.Ticker = lambda symbol, *args, **kwargs: _RecordingTicker(session, real_ticker, symbol)
+            http_client.astream_text = astream_text
+            real_brapi = analysis._get_brapi_client()
+            analysis._BRAPI_CLIENT = _BrapiClient(session, real_brapi) if real_brapi else None
+        else:
+            async def astream_text(url, timeout=None, chunk_size=16384):
+                await session.wait_async("investidor10")
+                html = session.fixtures["html"].get(url)
+                if html is None:
+                    raise OSError(f"sem fixture para {url}")
+                for start in range(0, len(html), chunk_size):
+                    yield html[start:start + chunk_size]
+
+            yfinance.download = session.download
+            yfinance.Ticker = lambda symbol, *args, **kwargs: _ReplayTicker(session, symbol)
+            http_client.astream_text = astream_text
+            analysis._BRAPI_CLIENT = _BrapiClient(session)
+
+    def restore(self):
+        if self._originals is None:
+            return
+        import yfinance
+        import http_client
+        yfinance.download, yfinance.Ticker, http_client.astream_text, analysis._BRAPI_CLIENT = self._originals
+        self._originals = None
+
+
+def reset_state(store_path=None, fundamentals_path=None, index_path=None):
+    # Esquece caches em memória e a saúde das fontes e, se pedido, aponta o histórico, os
+    # fundamentos e o índice noturno para outros arquivos: a próxima chamada se comporta
+    # como a primeira do processo.
+    import fundamentals_store
+    import history_store
+    import universe_index
+    analysis._CACHE.clear()
+    with analysis._INDICATOR_LOCK:
+        analysis._INDICATOR_STATES.clear()
+    for breaker in analysis._BREAKERS.values():
+        breaker.success()
+    for store, path in ((history_store, store_path), (fundamentals_store, fundamentals_path)):
+        if path is None:
+            continue
+        with store._LOCK:
+            if store._CONNECTION is not None:
+                store._CONNECTION.close()
+            store._CONNECTION = None
+            store.STORE_PATH = path
+    if index_path is not None:
+        universe_index.INDEX_PATH = index_path
+
+
+def synthetic_fixtures(tickers, bars=2600, seed=11):
+    # Fixtures inventadas (passeio aleatório) para rodar os benchmarks sem nunca
+    # ter gravado nada. Os números não valem como análise, só como carga.
+    import numpy as np
+    import pandas as pd
+
+    fixtures = _empty_fixtures()
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.tseries.offsets.BDay(1), periods=bars, name="Date")
+    for position, ticker in enumerate(tickers):
+        rng = np.random.default_rng(seed + position)
+        symbol = f"{ticker}.SA"
+        is_fii = ticker.endswith("11")
+        close = (100.0 if is_fii else 20.0) * np.exp(np.cumsum(rng.normal(0.0002, 0.018, bars)))
+        spread = rng.uniform(0.002, 0.02, bars)
+        daily = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.004, bars)),
+            "High": close * (1 + spread),
+            "Low": close * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(50_000, 5_000_000, bars).astype(float),
+        }, index=index)
+        monthly = daily.groupby(daily.index.to_period("M")).agg(
+            {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+        )
+        monthly.index = monthly.index.to_timestamp()
+        monthly.index.name = "Date"
+        monthly["Adj Close"] = monthly["Close"]
+        monthly["Dividends"] = monthly["Close"] * (0.008 if is_fii else 0.02 * (monthly.index.month % 6 == 0))
+        monthly["Stock Splits"] = 0.0
+        fixtures["yahoo"][symbol] = {
+            _variant("1d", True): _frame_to_json(daily),
+            _variant("1mo", False): _frame_to_json(monthly),
+        }
+
+        last = float(close[-1])
+        fixtures["fast_info"][symbol] = {"lastPrice": last}
+        fixtures["info"][symbol] = {
+            "priceToBook": float(rng.uniform(0.6, 2.5)),
+            "dividendYield": float(rng.uniform(0.02, 0.14)),
+            "averageVolume": float(rng.integers(20_000, 3_000_000)),
+            "debtToEquity": None if is_fii else float(rng.uniform(10, 220)),
+            "regularMarketPrice": last,
+        }
+        quote = {"symbol": ticker, "regularMarketPrice": last * (1 + rng.normal(0, 0.002))}
+        fixtures["brapi"][_brapi_key(ticker, {})] = quote
+        fixtures["brapi"][_brapi_key(ticker, {"modules": analysis.BRAPI_FUNDAMENTAL_MODULES})] = {
+            **quote,
+            "defaultKeyStatistics": {"priceToBook": fixtures["info"][symbol]["priceToBook"]},
+            "financialData": {"debtToEquity": fixtures["info"][symbol]["debtToEquity"]},
+        }
+        if is_fii:
+            pvp = f"{fixtures['info'][symbol]['priceToBook']:.2f}".replace(".", ",")
+            dy = f"{fixtures['info'][symbol]['dividendYield'] * 100:.2f}".replace(".", ",")
+            url = f"{analysis.INVESTIDOR10_BASE_URL}/{ticker.lower()}/"
+            fixtures["html"][url] = (
+                "<html><body>" + "<div class='nav'>menu</div>" * 400
+                + f"<span>P/VP</span><span>{pvp}</span><span>DY (12M)</span><span>{dy}%</span>"
+                + "<span>Liquidez Diária</span><span>R$ 3,2 M</span>"
+                + f"<span>Cotação</span><span>R$ {last:.2f}</span>".replace(".", ",")
+                + "</body></html>"
+            )
+    return fixtures
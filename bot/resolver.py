@@ -0,0 +1,301 @@
+import math
+
+
+# Plano de resolução dos fundamentos. Cada métrica declara, em ordem de
+# preferência, de onde pode vir: um campo de uma fonte (Field) ou uma conta
+# sobre outras métricas (Derived). As fontes são consultadas da mais barata
+# para a mais cara e a próxima só é pedida quando alguma métrica usada no
+# score continua sem valor com o que já chegou.
+
+SOURCES = ("yahoo", "brapi", "investidor10")
+_NAN = float("nan")
+
+
+def _number(value):
+    if value is None:
+        return _NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+def _valid(value):
+    return not math.isnan(value)
+
+def _per_share(equity, shares):
+    return equity / shares if shares > 0 else _NAN
+
+def _market_ratio(market_cap, equity):
+    return market_cap / equity if equity > 0 else _NAN
+
+def _percent(dy):
+    return dy if dy > 1.0 else dy * 100
+
+
+class Field:
+    # Campo de uma fonte. Várias chaves funcionam como `a or b` do dict original.
+    __slots__ = ("source", "keys")
+
+    def __init__(self, source, *keys):
+        self.source = source
+        self.keys = keys
+
+    def origins(self):
+        return {self.source}
+
+    def evaluate(self, resolution):
+        payload = resolution.payloads.get(self.source)
+        if not payload:
+            return _NAN, None, frozenset()
+        value = None
+        for key in self.keys:
+            value = payload.get(key)
+            if value:
+                break
+        return _number(value), self.source, frozenset((self.source,))
+
+    def describe(self):
+        return f"{self.source}.{'|'.join(self.keys)}"
+
+
+class Derived:
+    # Conta sobre outras métricas; a fonte é `label` ou, sem ele, a da primeira entrada.
+    __slots__ = ("text", "fn", "inputs", "label")
+
+    def __init__(self, text, fn, *inputs, label=None):
+        self.text = text
+        self.fn = fn
+        self.inputs = inputs
+        self.label = label
+
+    def origins(self):
+        found = set()
+        for name in self.inputs:
+            found |= PLAN[name].origins()
+        return found
+
+    def evaluate(self, resolution):
+        values, origins, source = [], frozenset(), None
+        for name in self.inputs:
+            value, input_source, used = resolution.resolve(name)
+            if not _valid(value):
+                return _NAN, None, frozenset()
+            values.append(value)
+            origins |= used
+            source = source or input_source
+        return _number(self.fn(*values)), self.label or source, origins
+
+    def describe(self):
+        return self.text
+
+
+class Metric:
+    # unless: métricas que, com valor, tornam esta desnecessária (nem é avaliada).
+    __slots__ = ("name", "candidates", "unless", "usable", "_origins")
+
+    def __init__(self, name, *candidates, unless=(), usable=_valid):
+        self.name = name
+        self.candidates = candidates
+        self.unless = unless
+        self.usable = usable
+        self._origins = None
+
+    def origins(self):
+        if self._origins is None:
+            found = set()
+            for candidate in self.candidates:
+                found |= candidate.origins()
+            self._origins = frozenset(found)
+        return self._origins
+
+
+PLAN = {
+    metric.name: metric
+    for metric in (
+        Metric(
+            "pvp",
+            Field("yahoo", "priceToBook"),
+            Field("brapi", "pvp"),
+            Field("investidor10", "pvp"),
+        ),
+        # P/VP pelo valor patrimonial por cota/ação: fechado com o preço do dia no score.
+        Metric(
+            "book_value",
+            Field("yahoo", "bookValue"),
+            Field("brapi", "book_value"),
+            Field("investidor10", "book_value"),
+            Field("yahoo", "netAssetValue", "navPrice"),
+            Field("brapi", "nav"),
+            Derived("equity / shares_outstanding", _per_share, "equity", "shares_outstanding"),
+            unless=("pvp",),
+            usable=lambda value: _valid(value) and value > 0,
+        ),
+        Metric(
+            "pvp_market",
+            Derived("market_cap / equity", _market_ratio, "market_cap", "equity", label="calculado"),
+            unless=("pvp", "book_value"),
+        ),
+        Metric(
+            "equity",
+            Field("yahoo", "totalStockholderEquity", "totalStockholdersEquity", "shareholdersEquity"),
+            Field("brapi", "equity"),
+            Field("investidor10", "equity"),
+        ),
+        Metric(
+            "shares_outstanding",
+            Field("yahoo", "sharesOutstanding"),
+            Field("brapi", "shares_outstanding"),
+            Field("investidor10", "shares_outstanding"),
+        ),
+        Metric("market_cap", Field("yahoo", "marketCap"), Field("brapi", "market_cap")),
+        Metric(
+            "dy",
+            Field("yahoo", "dividendYield", "trailingAnnualDividendYield"),
+            Field("brapi", "dividend_yield"),
+            Field("investidor10", "dividend_yield"),
+        ),
+        Metric("dy_pct", Derived("dy em %", _percent, "dy")),
+        Metric("avg_volume", Field("yahoo", "averageVolume", "volume"), Field("brapi", "avg_volume")),
+        Metric("liquidez_brl", Field("investidor10", "liquidez_brl")),
+        Metric("debt", Field("yahoo", "debtToEquity"), Field("brapi", "debt_to_equity")),
+        Metric("price", Field("investidor10", "price")),
+    )
+}
+
+# O que o score usa: cada alvo está resolvido quando qualquer uma das métricas dele tem valor útil.
+TARGETS = {
+    "pvp": ("pvp", "book_value", "pvp_market"),
+    "dy": ("dy_pct",),
+    "liquidez": ("avg_volume", "liquidez_brl"),
+    "debt": ("debt",),
+}
+
+
+def targets_for(ticker):
+    # FIIs não pontuam dívida.
+    return [name for name in TARGETS if name != "debt" or not ticker.endswith("11")]
+
+def describe():
+    lines = []
+    for metric in PLAN.values():
+        line = f"{metric.name}: " + " → ".join(candidate.describe() for candidate in metric.candidates)
+        if metric.unless:
+            line += f"  (só sem {', '.join(metric.unless)})"
+        lines.append(line)
+    for target in TARGETS:
+        lines.append(f"alvo {target}: " + " | ".join(TARGETS[target]))
+    return "\n".join(lines)
+
+
+class Fundamentals:
+    # Fundamentos de um ticker já resolvidos, sem depender do preço do dia.
+    # É o que vai para o store em disco (to_dict/from_dict).
+    __slots__ = (
+        "pvp", "pvp_source", "book_value",
+        "dy_pct", "dy_source",
+        "avg_volume", "liquidez_brl", "liquidez_source",
+        "debt", "debt_source",
+        "fallback_price",
+        "sources", "probed_at",
+    )
+    NUMBERS = ("pvp", "book_value", "dy_pct", "avg_volume", "liquidez_brl", "debt", "fallback_price")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            value = values.get(name)
+            setattr(self, name, _number(value) if name in self.NUMBERS else value)
+
+    def has_values(self):
+        return any(_valid(getattr(self, name)) for name in self.NUMBERS)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+class Resolution:
+    # Estado da resolução de um ticker: respostas de cada fonte e valores já avaliados.
+    __slots__ = ("ticker", "payloads", "_memo")
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.payloads = {}
+        self._memo = {}
+
+    def add(self, source, payload):
+        # Resposta vazia também conta: a fonte foi consultada e não tinha o dado.
+        self.payloads[source] = payload or {}
+        self._memo.clear()
+
+    def resolve(self, name):
+        # (valor, fonte, fontes de origem) com o que já chegou.
+        result = self._memo.get(name)
+        if result is not None:
+            return result
+        metric = PLAN[name]
+        result = (_NAN, None, frozenset())
+        if not any(PLAN[other].usable(self.resolve(other)[0]) for other in metric.unless):
+            # Candidato sem valor útil (valor patrimonial zerado, por exemplo) passa a vez ao próximo.
+            for candidate in metric.candidates:
+                value, source, origins = candidate.evaluate(self)
+                if metric.usable(value):
+                    result = (value, source, origins)
+                    break
+        self._memo[name] = result
+        return result
+
+    def _used(self, target):
+        for name in TARGETS[target]:
+            value, _, origins = self.resolve(name)
+            if PLAN[name].usable(value):
+                return origins
+        return None
+
+    def unresolved(self):
+        return [target for target in targets_for(self.ticker) if self._used(target) is None]
+
+    def wants(self, source):
+        # A fonte ainda não consultada poderia resolver algum alvo em aberto?
+        if source in self.payloads:
+            return False
+        return any(
+            source in PLAN[name].origins()
+            for target in self.unresolved()
+            for name in TARGETS[target]
+        )
+
+    def supplied(self):
+        # Fontes que forneceram os números usados pelos alvos: vira a rota do ticker.
+        found = set()
+        for target in targets_for(self.ticker):
+            found |= self._used(target) or set()
+        return found
+
+    def fundamentals(self):
+        pvp, pvp_source, _ = self.resolve("pvp")
+        if not _valid(pvp):
+            pvp, pvp_source, _ = self.resolve("pvp_market")
+        dy_pct, dy_source, _ = self.resolve("dy_pct")
+        avg_volume, liquidez_source, _ = self.resolve("avg_volume")
+        debt, debt_source, _ = self.resolve("debt")
+        return Fundamentals(
+            pvp=pvp,
+            pvp_source=pvp_source,
+            book_value=self.resolve("book_value")[0],
+            dy_pct=dy_pct,
+            dy_source=dy_source,
+            avg_volume=avg_volume,
+            liquidez_brl=self.resolve("liquidez_brl")[0],
+            liquidez_source=liquidez_source,
+            debt=debt,
+            debt_source=debt_source,
+            fallback_price=self.resolve("price")[0],
+            sources=sorted(self.supplied()),
+        )
+
+
+if __name__ == "__main__":
+    print(describe())
@@ -0,0 +1,113 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import analysis
+
+
+SCREENER_TOP = analysis._load_int("SCREENER_TOP", 10)
+SCREENER_BATCH_SIZE = analysis._load_int("SCREENER_BATCH_SIZE", 50)
+SCREENER_WORKERS = analysis._load_int("SCREENER_WORKERS", 4)
+SCREENER_DEADLINE = analysis._load_float("SCREENER_DEADLINE", 120.0)
+
+# Universos embutidos: ações do Ibovespa e FIIs mais negociados.
+UNIVERSES = {
+    "acoes": [
+        "ABEV3", "ALOS3", "ASAI3", "AURE3", "AZUL4", "AZZA3", "B3SA3", "BBAS3",
+        "BBDC3", "BBDC4", "BBSE3", "BEEF3", "BPAC11", "BRAP4", "BRAV3", "BRFS3",
+        "BRKM5", "CMIG4", "CMIN3", "COGN3", "CPFE3", "CPLE6", "CRFB3", "CSAN3",
+        "CSMG3", "CSNA3", "CVCB3", "CXSE3", "CYRE3", "DIRR3", "EGIE3", "ELET3",
+        "ELET6", "EMBR3", "ENEV3", "ENGI11", "EQTL3", "FLRY3", "GGBR4", "GOAU4",
+        "HAPV3", "HYPE3", "IGTI11", "IRBR3", "ISAE4", "ITSA4", "ITUB4", "KLBN11",
+        "LREN3", "MGLU3", "MOTV3", "MRFG3", "MRVE3", "MULT3", "NTCO3", "PCAR3",
+        "PETR3", "PETR4", "PETZ3", "POMO4", "PRIO3", "PSSA3", "RADL3", "RAIL3",
+        "RAIZ4", "RDOR3", "RECV3", "RENT3", "SANB11", "SBSP3", "SLCE3", "SMFT3",
+        "SMTO3", "STBP3", "SUZB3", "TAEE11", "TIMS3", "TOTS3", "UGPA3", "USIM5",
+        "VALE3", "VAMO3", "VBBR3", "VIVA3", "VIVT3", "WEGE3", "YDUQ3",
+    ],
+    "fiis": [
+        "ALZR11", "BCFF11", "BRCO11", "BRCR11", "BTAL11", "BTLG11", "CPTS11", "DEVA11",
+        "GARE11", "GGRC11", "HCTR11", "HFOF11", "HGBS11", "HGCR11", "HGLG11", "HGRE11",
+        "HGRU11", "HSML11", "IRDM11", "JSRE11", "KNCR11", "KNHY11", "KNIP11", "KNRI11",
+        "KNSC11", "LVBI11", "MALL11", "MCCI11", "MXRF11", "PATL11", "PVBI11", "RBRF11",
+        "RBRP11", "RBRR11", "RBRY11", "RECR11", "RECT11", "RZAK11", "RZTR11", "SNAG11",
+        "SNCI11", "TGAR11", "TRXF11", "URPR11", "VGHF11", "VGIA11", "VGIP11", "VILG11",
+        "VINO11", "VISC11", "VRTA11", "XPCI11", "XPLG11", "XPML11",
+    ],
+}
+UNIVERSES["todos"] = UNIVERSES["acoes"] + UNIVERSES["fiis"]
+
+_SEPARATORS_RE = re.compile(r"[\s,;]+")
+
+
+def _read_ticker_file(path):
+    # Um ticker por linha ou separados por vírgula/espaço; "#" começa comentário.
+    tickers = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.split("#", 1)[0]
+            for token in _SEPARATORS_RE.split(line.strip()):
+                ticker = token.upper()
+                if ticker.endswith(".SA"):
+                    ticker = ticker[:-3]
+                if ticker:
+                    tickers.append(ticker)
+    return analysis._unique_tickers(tickers)
+
+def load_universe(source):
+    if not source:
+        return None
+    name = source.lower()
+    if name in UNIVERSES:
+        return list(UNIVERSES[name])
+    if os.path.isfile(source):
+        try:
+            return _read_ticker_file(source)
+        except Exception:
+            return None
+    return None
+
+def _rank_key(record):
+    # Score primeiro; no empate, o ativo mais líquido vem antes.
+    liquidez = record.get("liquidez")
+    if liquidez is None or analysis._is_nan(liquidez):
+        liquidez = 0.0
+    return (-record["score"], -liquidez, record["ticker"])
+
+def run_screener(tickers, top=SCREENER_TOP, deadline=SCREENER_DEADLINE):
+    # Cada lote passa por get_scores_batch (downloads em lote + fontes em paralelo);
+    # vários lotes rodam juntos e o limite por fonte fica a cargo do analysis.
+    started = time.monotonic()
+    batches = list(analysis._chunked(analysis._unique_tickers(tickers), SCREENER_BATCH_SIZE))
+    records = []
+    with ThreadPoolExecutor(max_workers=max(1, SCREENER_WORKERS), thread_name_prefix="investbot-screener") as pool:
+        futures = [pool.submit(analysis.get_scores_batch, batch, deadline) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                records.extend(future.result().values())
+            except Exception:
+                continue
+    records.sort(key=_rank_key)
+    return {
+        "ranked": records[:max(top, 0)],
+        "analyzed": len(records),
+        "requested": sum(len(batch) for batch in batches),
+        "elapsed": time.monotonic() - started,
+    }
+
+def build_index(source="todos", deadline=SCREENER_DEADLINE):
+    # Job noturno (terminal.py --build-index): analisa o universo inteiro e grava
+    # o índice que o /analise consulta antes de ir às fontes.
+    import universe_index
+    tickers = load_universe(source)
+    if not tickers:
+        return None
+    started = time.monotonic()
+    result = run_screener(tickers, top=len(tickers), deadline=deadline)
+    summary = universe_index.build(result["ranked"])
+    summary["requested"] = result["requested"]
+    summary["missing"] = sorted(set(tickers) - {record["ticker"] for record in result["ranked"]})
+    summary["elapsed"] = time.monotonic() - started
+    summary["path"] = universe_index.INDEX_PATH
+    return summary
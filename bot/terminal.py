@@ -1,24 +1,89 @@
 import sys
+import daemon
 from commands import build_response
 
 
 def _print_help():
     print("✨ Comandos disponíveis:")
-    print("  🔎 /analise TICKER  - relatório completo + aporte")
-    print("  💸 /aporte TICKER   - simulação de aporte mensal")
-    print("  💵 /preco TICKER    - preço atual do ativo")
+    print("  🔎 /analise TICKER [TICKER...]  - relatório completo + aporte")
+    print("  💸 /aporte TICKER [TICKER...]   - simulação de aporte mensal")
+    print("     /aporte TICKER --desde 2018 [--dividendos] - aportes mensais no histórico")
+    print("  💼 /aporte-carteira TICKER[:MIN-MAX] [TICKER...] [--min N] [--max N] - divide o aporte")
+    print("  💵 /preco TICKER [TICKER...]    - preço atual do ativo")
+    print("  📊 /backtest TICKER [TICKER...] [PERIODO] - regra de IFR/SMA200 no histórico")
+    print("  🧩 /diversificacao TICKER TICKER [...] [PERIODO] - correlação e concentração da carteira")
+    print("  👀 /monitor TICKER [TICKER...] [--a-cada 60s] - alertas de IFR, SMA200 e veredito")
+    print("  ⏱️ /intraday TICKER [TICKER...] [1m|5m|15m] - IFR/SMA em barras intradiárias")
+    print("  🏆 /screener [acoes|fiis|todos|ARQUIVO] [N] - top N do universo por score")
+    print("  📈 /stats [json|prometheus|reset] - tempos por etapa, falhas e fontes")
     print("  🚪 sair             - encerra o modo terminal")
 
 
 def _run_command(command):
-    response = build_response(command)
+    if command.lower().startswith("/monitor"):
+        # Fica rodando e imprimindo alertas até o Ctrl+C, sempre no próprio terminal.
+        import monitor
+        monitor.run_command(command)
+        return
+    # Com um daemon no ar (terminal.py --serve) o comando roda lá, com caches quentes.
+    forwarded, response = daemon.forward(command)
+    if not forwarded:
+        response = build_response(command)
     if response:
         print(response)
         return
-    print("⚠️ Comando inválido. Use /analise, /aporte ou /preco.")
+    print("⚠️ Comando inválido. Use /analise, /aporte, /preco, /backtest, /diversificacao, /intraday, /screener ou /stats.")
+
+
+def _build_index(args):
+    import screener
+    source = args[0] if args else "todos"
+    summary = screener.build_index(source)
+    if summary is None:
+        print(f"⚠️ Universo não encontrado. Use {', '.join(screener.UNIVERSES)} ou um arquivo de tickers.")
+        sys.exit(1)
+    print(f"🗂️ Índice gravado em {summary['path']}: {summary['written']} de {summary['requested']} "
+          f"tickers em {summary['elapsed']:.0f}s ({summary['total']} no arquivo)")
+    if summary["missing"]:
+        print(f"⚠️ Sem dados (ficam com o registro anterior, se houver): {', '.join(summary['missing'])}")
+    if summary["skipped"]:
+        print(f"⚠️ Fora do índice (sinal desconhecido): {', '.join(summary['skipped'])}")
+
+
+def _export(fmt, args):
+    # --format json|csv [/analise] TICKER... | acoes | fiis | todos | ARQUIVO
+    import export
+    import screener
+    if fmt not in export.FORMATS:
+        print(f"⚠️ Formato inválido. Use {' ou '.join(export.FORMATS)}.", file=sys.stderr)
+        sys.exit(1)
+    tickers = []
+    for arg in args:
+        if arg.startswith("/"):
+            continue
+        tickers.extend(screener.load_universe(arg) or [arg])
+    if not tickers:
+        print("⚠️ Informe os tickers. Ex: python bot/terminal.py --format json PETR4 VALE3", file=sys.stderr)
+        sys.exit(1)
+    export.stream(tickers, fmt)
 
 
 def main():
+    if sys.argv[1:] == ["--serve"]:
+        daemon.serve()
+        return
+
+    if sys.argv[1:] and sys.argv[1].partition("=")[0] == "--format":
+        fmt, args = sys.argv[1].partition("=")[2], sys.argv[2:]
+        if not fmt:
+            fmt, args = (args[0] if args else ""), args[1:]
+        _export(fmt.lower(), args)
+        return
+
+    if sys.argv[1:2] == ["--build-index"]:
+        _build_index(sys.argv[2:])
+        return
+
     if len(sys.argv) > 1:
         command = " ".join(sys.argv[1:])
         _run_command(command)
@@ -0,0 +1,198 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+# Índice noturno do universo: um registro de tamanho fixo por ticker, em ordem
+# de ticker, com o que o /analise precisa para montar o relatório sem ir às
+# fontes. A consulta abre o arquivo com mmap e faz busca binária direto nos
+# bytes, sem pandas nem numpy.
+INDEX_PATH = os.getenv(
+    "UNIVERSE_INDEX_PATH",
+    os.path.join(os.path.dirname(__file__), ".cache", "universe.idx"),
+)
+
+_MAGIC = b"IBIX"
+_VERSION = 2
+# magic, versão, tamanho do registro, registros, gerado em (epoch)
+_HEADER = struct.Struct("<4sHHIq")
+# ticker, gerado em, preço, P/VP, IFR, SMA200, DY %, liquidez, dívida, score,
+# sinais (bits), fontes (3 bits por indicador)
+_RECORD = struct.Struct("<12sqdddddddhHH")
+_TICKER_SIZE = 12
+_NUMBERS = ("price", "pvp", "rsi", "sma200", "dy_pct", "liquidez", "debt")
+# Sinais possíveis, na ordem em que o score os gera: cada um é um bit do registro.
+SINAIS = (
+    "💎 Desconto (P/VP)", "✅ Preço Justo", "⚠️ Ágio (P/VP)",
+    "💰 Rendimento Alto", "📉 Rendimento Baixo",
+    "🚫 Baixa Liquidez", "✅ Boa Liquidez",
+    "🚩 Dívida Alta", "🛡️ Dívida Baixa",
+    "🔥 Sobrevendido", "⚠️ Sobrecomprado",
+)
+_SINAL_BITS = {sinal: 1 << position for position, sinal in enumerate(SINAIS)}
+# Fonte de cada indicador do score, como no registro ao vivo: código 0 é "sem fonte".
+FONTES = ("yahoo", "brapi", "investidor10", "calculado")
+_SOURCE_METRICS = ("price", "pvp", "dy", "liquidez", "debt")
+_SOURCE_CODES = {source: code for code, source in enumerate(FONTES, start=1)}
+
+_READER = None
+_LOCK = threading.Lock()
+
+
+class _Reader:
+    __slots__ = ("key", "handle", "view", "count", "built_at")
+
+    def __init__(self, path, key):
+        self.key = key
+        self.handle = open(path, "rb")
+        try:
+            self.view = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.handle.close()
+            raise
+        magic, version, size, count, built_at = _HEADER.unpack_from(self.view, 0)
+        if magic != _MAGIC or version != _VERSION or size != _RECORD.size or len(self.view) < _HEADER.size + count * size:
+            self.close()
+            raise ValueError(f"índice inválido: {path}")
+        self.count = count
+        self.built_at = built_at
+
+    def close(self):
+        self.view.close()
+        self.handle.close()
+
+    def find(self, key):
+        view, low, high = self.view, 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            start = _HEADER.size + middle * _RECORD.size
+            current = view[start:start + _TICKER_SIZE]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return _RECORD.unpack_from(view, start)
+        return None
+
+
+def _key(ticker):
+    encoded = ticker.encode("ascii", "ignore")
+    if not encoded or len(encoded) > _TICKER_SIZE:
+        return None
+    return encoded.ljust(_TICKER_SIZE, b"\0")
+
+def _reader():
+    # Reabre quando o arquivo muda: o build troca o arquivo inteiro com os.replace.
+    global _READER
+    try:
+        stat = os.stat(INDEX_PATH)
+    except OSError:
+        stat = None
+    key = (INDEX_PATH, stat.st_ino, stat.st_mtime_ns) if stat else None
+    with _LOCK:
+        if _READER is not None and _READER.key == key:
+            return _READER
+        if _READER is not None:
+            _READER.close()
+            _READER = None
+        if key is not None:
+            try:
+                _READER = _Reader(INDEX_PATH, key)
+            except Exception:
+                _READER = None
+        return _READER
+
+def _unpack(values):
+    ticker, built_at, *numbers, score, mask, codes = values
+    record = dict(zip(_NUMBERS, numbers))
+    record["ticker"] = ticker.rstrip(b"\0").decode("ascii")
+    record["indexed_at"] = built_at
+    record["score"] = score
+    record["sinais"] = [sinal for sinal in SINAIS if mask & _SINAL_BITS[sinal]]
+    record["sources"] = {}
+    for position, metric in enumerate(_SOURCE_METRICS):
+        code = codes >> (3 * position) & 7
+        if code:
+            record["sources"][metric] = FONTES[code - 1]
+    return record
+
+def lookup(tickers, max_age, now=None):
+    # {ticker: registro} só com os tickers presentes e gerados há no máximo max_age segundos.
+    reader = _reader()
+    if reader is None:
+        return {}
+    now = time.time() if now is None else now
+    found = {}
+    for ticker in tickers:
+        key = _key(ticker)
+        values = reader.find(key) if key else None
+        if values is not None and now - values[1] <= max_age:
+            found[ticker] = _unpack(values)
+    return found
+
+def info():
+    reader = _reader()
+    if reader is None:
+        return None
+    return {"path": INDEX_PATH, "count": reader.count, "built_at": reader.built_at}
+
+def _pack(record, built_at):
+    key = _key(record["ticker"])
+    if key is None:
+        return None
+    mask = 0
+    for sinal in record["sinais"]:
+        bit = _SINAL_BITS.get(sinal)
+        if bit is None:
+            # Sinal novo que o formato não conhece: o ticker fica de fora e vai ao vivo.
+            return None
+        mask |= bit
+    codes = 0
+    sources = record.get("sources") or {}
+    for position, metric in enumerate(_SOURCE_METRICS):
+        source = sources.get(metric)
+        if source is None:
+            continue
+        code = _SOURCE_CODES.get(source)
+        if code is None:
+            # Fonte que o formato não conhece: mesmo caminho de um sinal novo.
+            return None
+        codes |= code << (3 * position)
+    numbers = [float(record[name]) for name in _NUMBERS]
+    return key, _RECORD.pack(key, int(built_at), *numbers, int(record["score"]), mask, codes)
+
+def _existing_rows():
+    reader = _reader()
+    if reader is None:
+        return {}
+    rows = {}
+    for position in range(reader.count):
+        start = _HEADER.size + position * _RECORD.size
+        rows[reader.view[start:start + _TICKER_SIZE]] = reader.view[start:start + _RECORD.size]
+    return rows
+
+def build(records, built_at=None):
+    # Junta aos registros do índice atual (quem falhou hoje continua com o de
+    # ontem e a idade decide se ainda serve) e troca o arquivo de uma vez.
+    built_at = int(time.time() if built_at is None else built_at)
+    rows = _existing_rows()
+    written, skipped = 0, []
+    for record in records:
+        packed = _pack(record, built_at)
+        if packed is None:
+            skipped.append(record["ticker"])
+            continue
+        key, row = packed
+        rows[key] = row
+        written += 1
+    os.makedirs(os.path.dirname(INDEX_PATH) or ".", exist_ok=True)
+    temporary = f"{INDEX_PATH}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size, len(rows), built_at))
+        for key in sorted(rows):
+            handle.write(rows[key])
+    os.replace(temporary, INDEX_PATH)
+    return {"written": written, "skipped": skipped, "total": len(rows)}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# Os módulos do bot são importados pelo nome, como o main.py faz a partir de bot/.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
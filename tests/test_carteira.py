@@ -0,0 +1,74 @@
+import itertools
+import math
+import random
+
+import pytest
+
+import carteira
+
+
+def _value(quantities, prices, weights, leftover):
+    # Mesmo objetivo da DP: centavos gastos vezes (score + sobra), só para score > 0.
+    return sum(
+        quantity * round(price * 100) * round((weight + leftover) * 100)
+        for quantity, price, weight in zip(quantities, prices, weights)
+        if weight > 0
+    )
+
+def _brute(prices, weights, budget, lows, highs, leftover):
+    cents = round(budget * 100)
+    ranges = []
+    for price, low, high in zip(prices, lows, highs):
+        price = round(price * 100)
+        top = int(high * cents // price)
+        ranges.append(range(min(math.ceil(low * cents / price), top), top + 1))
+    best = None
+    for quantities in itertools.product(*ranges):
+        if sum(q * round(p * 100) for q, p in zip(quantities, prices)) > cents:
+            continue
+        value = _value(quantities, prices, weights, leftover)
+        if best is None or value > best:
+            best = value
+    return best
+
+
+@pytest.mark.parametrize("seed", range(150))
+def test_allocate_matches_brute_force(seed):
+    rng = random.Random(seed)
+    size = rng.randint(1, 4)
+    prices = [round(rng.uniform(5, 80), 2) for _ in range(size)]
+    weights = [max(rng.randint(-2, 9), 0) for _ in range(size)]
+    budget = round(rng.uniform(50, 400), 2)
+    lows = [rng.choice([0, 0, 0.1]) for _ in range(size)]
+    highs = [rng.choice([1, 0.5, 0.4]) for _ in range(size)]
+    solution = carteira.allocate(prices, weights, budget, lows, highs, leftover=5.0)
+    best = _brute(prices, weights, budget, lows, highs, 5.0)
+    assert (solution is None) == (best is None)
+    if solution is None:
+        return
+    quantities, spent = solution
+    assert spent <= budget + 1e-9
+    assert _value(quantities, prices, weights, 5.0) == best
+
+def test_allocate_respects_bounds():
+    quantities, spent = carteira.allocate([10.0, 20.0, 5.0], [9, 1, 4], 1000.0, [0.1, 0.1, 0.0], [0.4, 0.4, 0.4])
+    values = [quantity * price for quantity, price in zip(quantities, [10.0, 20.0, 5.0])]
+    assert all(100.0 <= value <= 400.0 for value in values[:2])
+    assert values[2] <= 400.0
+    assert spent == sum(values) == 1000.0
+
+def test_allocate_minimums_over_budget():
+    assert carteira.allocate([10.0, 10.0], [1, 1], 100.0, [0.6, 0.6], [1.0, 1.0]) is None
+
+def test_default_max_weight_spreads_budget():
+    tickers, budget, limits, error = carteira.parse_args(["/aporte-carteira", "PETR4", "VALE3", "ITUB4"], 1000.0)
+    assert error is None
+    assert all(high == carteira.CARTEIRA_PESO_MAX < 1 for _, high in limits.values())
+    quantities, _ = carteira.allocate([10.0, 10.0, 10.0], [10, 2, 1], budget, *zip(*limits.values()))
+    assert max(quantities) * 10.0 <= carteira.CARTEIRA_PESO_MAX * budget
+
+def test_default_max_weight_rises_for_few_tickers():
+    _, _, limits, _ = carteira.parse_args(["/aporte-carteira", "PETR4", "VALE3"], 1000.0)
+    assert limits == {"PETR4": (0.0, 0.5), "VALE3": (0.0, 0.5)}
+    _, _, limits, _ = carteira.parse_args(["/aporte-carteira", "PETR4", "VALE3:5-80", "--max", "30"], 1000.0)
+    assert limits == {"PETR4": (0.0, 0.3), "VALE3": (0.05, 0.8)}
@@ -0,0 +1,203 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+BARS = 600
+TICKERS = 4
+# O pandas-ta-classic semeia a média de Wilder com a média simples (como o
+# TA-Lib); o pandas_ta 0.4, que o indicators.py reproduz, não. Depois destas
+# barras a diferença já é desprezível.
+WARMUP = 300
+
+
+@pytest.fixture(scope="module")
+def panel():
+    rng = np.random.default_rng(7)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (BARS, TICKERS)), axis=0))
+    spread = rng.uniform(0, 0.02, (BARS, TICKERS))
+    return close * (1 + spread), close * (1 - spread), close
+
+def _columns(series):
+    return np.column_stack([item.to_numpy(dtype=float) for item in series])
+
+def _assert_close(got, expected, start=0, tolerance=1e-9):
+    got, expected = np.asarray(got)[start:], np.asarray(expected)[start:]
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(expected))
+    both = ~np.isnan(got)
+    assert both.any()
+    np.testing.assert_allclose(got[both], expected[both], rtol=tolerance, atol=tolerance)
+
+
+# Fórmulas do pandas_ta 0.4 escritas direto em pandas.
+
+def _ref_rsi(close, length):
+    delta = close.diff()
+    gains = delta.clip(lower=0).ewm(alpha=1 / length, adjust=False).mean()
+    losses = (-delta).clip(lower=0).ewm(alpha=1 / length, adjust=False).mean()
+    return 100 * gains / (gains + losses)
+
+def _ref_seeded(series, length, alpha):
+    values = series.copy()
+    values.iloc[:length - 1] = np.nan
+    values.iloc[length - 1] = series.iloc[:length].mean()
+    return values.ewm(alpha=alpha, adjust=False).mean()
+
+def _ref_ema(close, length):
+    return _ref_seeded(close, length, 2 / (length + 1))
+
+def _ref_atr(high, low, close, length):
+    previous = close.shift()
+    ranges = pd.concat([high - low, (high - previous).abs(), (previous - low).abs()], axis=1)
+    return _ref_seeded(ranges.max(axis=1), length, 1 / length)
+
+
+def test_rsi_matches_reference(panel):
+    _, _, close = panel
+    expected = _columns(_ref_rsi(pd.Series(close[:, i]), 14) for i in range(TICKERS))
+    _assert_close(indicators.rsi(close, 14), expected)
+
+def test_sma_matches_reference(panel):
+    _, _, close = panel
+    expected = _columns(pd.Series(close[:, i]).rolling(200).mean() for i in range(TICKERS))
+    _assert_close(indicators.sma(close, 200), expected)
+
+def test_ema_and_macd_match_reference(panel):
+    _, _, close = panel
+    _assert_close(indicators.ema(close, 20), _columns(_ref_ema(pd.Series(close[:, i]), 20) for i in range(TICKERS)))
+    line, signal, histogram = indicators.macd(close)
+    expected_line = _columns(
+        _ref_ema(pd.Series(close[:, i]), 12) - _ref_ema(pd.Series(close[:, i]), 26) for i in range(TICKERS)
+    )
+    _assert_close(line, expected_line)
+    expected_signal = np.full_like(expected_line, np.nan)
+    for i in range(TICKERS):
+        valid = pd.Series(expected_line[:, i]).dropna()
+        expected_signal[valid.index, i] = _ref_ema(valid.reset_index(drop=True), 9).to_numpy()
+    _assert_close(signal, expected_signal)
+    _assert_close(histogram, expected_line - expected_signal)
+
+def test_bollinger_matches_reference(panel):
+    _, _, close = panel
+    lower, mid, upper = indicators.bollinger(close, 20, 2.0)
+    rolling = [pd.Series(close[:, i]).rolling(20) for i in range(TICKERS)]
+    mean = _columns(window.mean() for window in rolling)
+    deviation = _columns(window.std(ddof=1) for window in rolling)
+    _assert_close(mid, mean)
+    _assert_close(lower, mean - 2 * deviation)
+    _assert_close(upper, mean + 2 * deviation)
+
+def test_atr_matches_reference(panel):
+    high, low, close = panel
+    expected = _columns(
+        _ref_atr(pd.Series(high[:, i]), pd.Series(low[:, i]), pd.Series(close[:, i]), 14) for i in range(TICKERS)
+    )
+    _assert_close(indicators.atr(high, low, close, 14), expected)
+
+def test_padded_column_matches_isolated_series(panel):
+    _, _, close = panel
+    padded = close.copy()
+    padded[:150, 1] = np.nan
+    for fn in (lambda c: indicators.rsi(c, 14), lambda c: indicators.ema(c, 20), lambda c: indicators.sma(c, 50)):
+        _assert_close(fn(padded)[150:, 1], fn(close[150:, 1]))
+
+
+def test_matches_pandas_ta_classic(panel):
+    ta = pytest.importorskip("pandas_ta_classic")
+    high, low, close = panel
+    frames = [(pd.Series(high[:, i]), pd.Series(low[:, i]), pd.Series(close[:, i])) for i in range(TICKERS)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        cases = [
+            (indicators.rsi(close, 14), [ta.rsi(c, length=14) for _, _, c in frames], WARMUP),
+            (indicators.sma(close, 200), [ta.sma(c, length=200) for _, _, c in frames], 0),
+            (indicators.ema(close, 20), [ta.ema(c, length=20) for _, _, c in frames], 0),
+            (indicators.macd(close)[0], [ta.macd(c)["MACD_12_26_9"] for _, _, c in frames], 0),
+            (indicators.macd(close)[1], [ta.macd(c)["MACDs_12_26_9"] for _, _, c in frames], 0),
+            (indicators.macd(close)[2], [ta.macd(c)["MACDh_12_26_9"] for _, _, c in frames], 0),
+            (indicators.bollinger(close, 20)[0], [ta.bbands(c, length=20, ddof=1).iloc[:, 0] for _, _, c in frames], 0),
+            (indicators.bollinger(close, 20)[2], [ta.bbands(c, length=20, ddof=1).iloc[:, 2] for _, _, c in frames], 0),
+            (indicators.atr(high, low, close, 14), [ta.atr(h, l, c, length=14) for h, l, c in frames], WARMUP),
+        ]
+    for got, expected, start in cases:
+        _assert_close(got, _columns(expected), start=start, tolerance=1e-6)
+
+
+def _full(close, rsi_length, sma_length):
+    return indicators.rsi(close, rsi_length)[-1], indicators.sma(close, sma_length)[-1]
+
+def test_indicator_state_update_matches_full_recompute(panel):
+    _, _, close = panel
+    close = close.copy()
+    close[:120, 2] = np.nan
+    state = indicators.IndicatorState.from_history(close[:250], rsi_length=14, sma_length=50)
+    # Mais de uma volta do buffer circular da SMA.
+    for bar in range(250, 400):
+        rsi, sma = state.update(close[bar])
+        expected_rsi, expected_sma = _full(close[:bar + 1], 14, 50)
+        _assert_close(rsi, expected_rsi)
+        _assert_close(sma, expected_sma)
+
+def test_indicator_state_amend_rewrites_last_bar(panel):
+    _, _, close = panel
+    state = indicators.IndicatorState.from_history(close[:300], rsi_length=14, sma_length=50)
+    state.update(close[300] * 1.05)
+    state.amend(close[300] * 0.97)
+    rsi, sma = state.amend(close[300])
+    expected_rsi, expected_sma = _full(close[:301], 14, 50)
+    _assert_close(rsi, expected_rsi)
+    _assert_close(sma, expected_sma)
+    rsi, sma = state.update(close[301])
+    expected_rsi, expected_sma = _full(close[:302], 14, 50)
+    _assert_close(rsi, expected_rsi)
+    _assert_close(sma, expected_sma)
+
+def test_indicator_state_column(panel):
+    _, _, close = panel
+    state = indicators.IndicatorState.from_history(close[:200], rsi_length=14, sma_length=50)
+    single = state.column(3)
+    rsi, sma = single.amend(close[199:200, 3])
+    _assert_close(rsi, state.rsi[3:4])
+    _assert_close(sma, state.sma[3:4])
+    rsi, sma = single.update(close[200:201, 3])
+    expected_rsi, expected_sma = _full(close[:201, 3:4], 14, 50)
+    _assert_close(rsi, expected_rsi)
+    _assert_close(sma, expected_sma)
+
+def test_rebased_history_drops_cached_state(tmp_path, monkeypatch):
+    import time
+
+    import analysis
+    import fundamentals_store
+    import history_store
+    import replay
+    import universe_index
+
+    for limiter in analysis._RATE_LIMITS.values():
+        monkeypatch.setattr(limiter, "rate", 0)
+    paths = (history_store.STORE_PATH, fundamentals_store.STORE_PATH, universe_index.INDEX_PATH)
+    replay.reset_state(str(tmp_path / "h.db"), str(tmp_path / "f.db"), str(tmp_path / "i.bin"))
+    fixtures = replay.synthetic_fixtures(["PETR4"], bars=400)
+    key = ("PETR4.SA", replay._variant("1d", True))
+    full = replay._frame_from_json(fixtures["yahoo"][key[0]][key[1]])
+    fixtures["yahoo"][key[0]][key[1]] = replay._frame_to_json(full.iloc[:-5])
+    try:
+        with replay.Replay.from_fixtures(fixtures, latency=0) as session:
+            frames, _ = analysis._fetch_histories(["PETR4"], "1y", "1d", time.monotonic() + 30)
+            analysis._compute_indicators(frames)
+            # Provento: o Yahoo reajusta todo o passado e traz barras novas.
+            adjusted = full.copy()
+            adjusted.loc[adjusted.index[:-5], ["Open", "High", "Low", "Close"]] *= 0.9
+            session.session._frames[key] = adjusted
+            analysis._CACHE.clear()
+            frames, _ = analysis._fetch_histories(["PETR4"], "1y", "1d", time.monotonic() + 30)
+            rsi, sma = analysis._compute_indicators(frames)["PETR4"]
+    finally:
+        replay.reset_state(*paths)
+    expected_rsi, expected_sma = _full(frames["PETR4"][["Close"]].to_numpy(dtype=float), 14, 200)
+    _assert_close([rsi], expected_rsi)
+    _assert_close([sma], expected_sma)
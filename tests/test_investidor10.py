@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+import analysis
+import bench
+
+
+# Tabela de informações na ordem em que o Investidor10 mostra os rótulos:
+# cada valor é seguido direto pelo próximo rótulo, sem pontuação no meio.
+PAGE = """<html><head><style>.x{color:red}</style><script>var P_VP = 9;</script></head><body>
+<div class="cell"><span>P/VP</span><span>0,95</span></div>
+<div class="cell"><span>DY (12M)</span><span>11,20%</span></div>
+<div class="cell"><span>Liquidez Diária</span><span>R$ 4,52 M</span></div>
+<table>
+<tr><td>COTAS EMITIDAS</td><td>12.345.678</td></tr>
+<tr><td>VAL. PATRIMONIAL P/ COTA</td><td>R$ 101,23</td></tr>
+<tr><td>VALOR PATRIMONIAL</td><td>R$ 1,25 Bilhões</td></tr>
+<tr><td>NÚMERO DE COTAS</td><td>12.345.678</td></tr>
+<tr><td>Cotação</td><td>R$ 96,17</td></tr>
+</table></body></html>"""
+
+EXPECTED = {
+    "pvp": 0.95,
+    "dividend_yield": 11.2,
+    "liquidez_brl": 4_520_000.0,
+    "shares_outstanding": 12_345_678.0,
+    "book_value": 101.23,
+    "equity": 1_250_000_000.0,
+    "price": 96.17,
+}
+
+
+def _assert_same(got, expected):
+    assert got.keys() == expected.keys()
+    for metric, value in expected.items():
+        assert got[metric] == pytest.approx(value), metric
+
+
+def test_legacy_extractor_reads_real_label_order():
+    _assert_same(bench._legacy_investidor10(PAGE), EXPECTED)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64, 161, 1024, len(PAGE)])
+def test_scanner_matches_legacy_at_every_chunk_size(chunk_size):
+    streamed, _ = bench._streaming_investidor10(PAGE, chunk_size)
+    _assert_same(streamed, bench._legacy_investidor10(PAGE))
+
+def test_shares_followed_by_price_label():
+    page = "<td>COTAS EMITIDAS</td><td>1.234.567</td><td>Cotação</td><td>R$ 9,87</td>"
+    _assert_same(
+        analysis._extract_investidor10_metrics(page),
+        {"shares_outstanding": 1_234_567.0, "price": 9.87},
+    )
+
+@pytest.mark.parametrize("text, value", [
+    ("R$ 12,5 mil", 12_500.0),
+    ("R$ 3,2 milhões", 3_200_000.0),
+    ("R$ 3,2 Mi", 3_200_000.0),
+    ("R$ 1,1 B", 1_100_000_000.0),
+    ("12.345 VAL", 12_345.0),
+])
+def test_parse_brl_value_scales(text, value):
+    assert analysis._parse_brl_value(text) == pytest.approx(value)
+
+def test_parse_brl_value_without_number():
+    assert math.isnan(analysis._parse_brl_value("sem dados"))
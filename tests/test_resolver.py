@@ -0,0 +1,133 @@
+import math
+from concurrent.futures import Future
+
+import pytest
+
+import analysis
+import fundamentals_store
+import resolver
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    # Registra a ordem das fontes pedidas pelo _resolve_batch, sem rede e sem store.
+    monkeypatch.setenv("USE_FUNDAMENTALS_STORE", "0")
+    calls = []
+    payloads = {}
+
+    def fetch(source, tickers, deadline):
+        calls.append((source, sorted(tickers)))
+        return {ticker: payloads.get((source, ticker), {}) for ticker in tickers}
+
+    monkeypatch.setattr(analysis, "_fetch_fundamental_source", fetch)
+    return calls, payloads
+
+
+def test_investidor10_not_fetched_when_yahoo_resolves_everything(fetches):
+    calls, _ = fetches
+    info = {"priceToBook": 0.95, "dividendYield": 0.11, "averageVolume": 80_000}
+    records = analysis._resolve_batch(
+        ["HGLG11"], analysis.ANALYSIS_DEADLINE, {}, info_futures={"HGLG11": _done(info)},
+    )
+    assert calls == []
+    record = records["HGLG11"]
+    assert record.pvp == 0.95 and record.pvp_source == "yahoo"
+    assert record.dy_pct == pytest.approx(11.0)
+    assert record.sources == ["yahoo"]
+
+def test_sources_fetched_cheapest_first_and_only_while_needed(fetches):
+    calls, payloads = fetches
+    payloads[("brapi", "HGLG11")] = {"dividend_yield": 9.5}
+    payloads[("brapi", "XPML11")] = {}
+    payloads[("investidor10", "XPML11")] = {"dividend_yield": 8.0}
+    info = {"priceToBook": 1.0, "averageVolume": 10_000}
+    records = analysis._resolve_batch(
+        ["HGLG11", "XPML11"],
+        analysis.ANALYSIS_DEADLINE,
+        {},
+        info_futures={"HGLG11": _done(info), "XPML11": _done(info)},
+    )
+    assert calls == [("brapi", ["HGLG11", "XPML11"]), ("investidor10", ["XPML11"])]
+    assert records["HGLG11"].dy_source == "brapi"
+    assert records["XPML11"].dy_source == "investidor10"
+
+def test_investidor10_only_for_fiis():
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {})
+    resolution.add("brapi", {})
+    assert resolution.unresolved()
+    assert not analysis._source_available("PETR4", "investidor10")
+
+
+@pytest.mark.parametrize("book_value", [0, -3.5])
+def test_non_positive_book_value_falls_through_to_market_cap(book_value):
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {"bookValue": book_value, "marketCap": 1_000.0, "totalStockholderEquity": 400.0})
+    value, source, origins = resolution.resolve("pvp_market")
+    assert value == pytest.approx(2.5)
+    assert source == "calculado"
+    assert origins == {"yahoo"}
+    record = resolution.fundamentals()
+    assert record.pvp == pytest.approx(2.5) and record.pvp_source == "calculado"
+    assert "pvp" not in resolution.unresolved()
+
+def test_positive_book_value_skips_market_ratio():
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {"bookValue": 30.0, "marketCap": 1_000.0, "totalStockholderEquity": 400.0})
+    assert math.isnan(resolution.resolve("pvp_market")[0])
+    assert resolution.resolve("book_value")[:2] == (30.0, "yahoo")
+
+def test_pvp_skips_book_value():
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {"priceToBook": 1.2, "bookValue": 30.0})
+    assert math.isnan(resolution.resolve("book_value")[0])
+
+def test_book_value_from_equity_per_share():
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {"bookValue": 0})
+    resolution.add("brapi", {"equity": 500.0, "shares_outstanding": 20.0})
+    assert resolution.resolve("book_value")[:2] == (25.0, "brapi")
+
+
+def test_fii_skips_debt_target():
+    assert "debt" not in resolver.targets_for("HGLG11")
+    assert "debt" in resolver.targets_for("PETR4")
+    payload = {"priceToBook": 1.0, "dividendYield": 0.1, "averageVolume": 1_000}
+    fii, stock = resolver.Resolution("HGLG11"), resolver.Resolution("PETR4")
+    fii.add("yahoo", payload)
+    stock.add("yahoo", payload)
+    assert fii.unresolved() == []
+    assert not fii.wants("brapi")
+    assert stock.unresolved() == ["debt"]
+    assert stock.wants("brapi")
+    assert not stock.wants("investidor10")
+
+
+def test_fundamentals_round_trip_through_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(fundamentals_store, "STORE_PATH", str(tmp_path / "fundamentals.sqlite"))
+    monkeypatch.setattr(fundamentals_store, "_CONNECTION", None)
+    resolution = resolver.Resolution("PETR4")
+    resolution.add("yahoo", {"priceToBook": 1.1, "dividendYield": 0.08, "averageVolume": 5e6})
+    resolution.add("brapi", {"debt_to_equity": 45.0})
+    record = resolution.fundamentals()
+    record.probed_at = 1_700_000_000.0
+    fundamentals_store.save({"PETR4": (record.to_dict(), True)}, fetched_at=1_700_000_100)
+    fetched_at, complete, data = fundamentals_store.load(["PETR4"])["PETR4"]
+    loaded = resolver.Fundamentals.from_dict(data)
+    assert (fetched_at, complete) == (1_700_000_100, True)
+    for name in resolver.Fundamentals.__slots__:
+        assert _same(getattr(loaded, name), getattr(record, name)), name
+    assert loaded.sources == ["brapi", "yahoo"]
+    assert math.isnan(loaded.liquidez_brl)
+    fundamentals_store._CONNECTION.close()
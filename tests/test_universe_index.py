@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+import universe_index
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "universe.idx")
+    monkeypatch.setattr(universe_index, "INDEX_PATH", path)
+    return path
+
+def _record(ticker, sources, sinais=("✅ Preço Justo",)):
+    return {
+        "ticker": ticker, "price": 10.0, "pvp": 0.9, "rsi": 45.0, "sma200": 9.5,
+        "dy_pct": 8.0, "liquidez": 1e6, "debt": float("nan"), "score": 3,
+        "sinais": list(sinais), "sources": sources,
+    }
+
+def test_round_trip_keeps_sources(index_path):
+    records = [
+        _record("PETR4", {"price": "yahoo", "pvp": "calculado", "dy": "brapi", "liquidez": "yahoo", "debt": "brapi"}),
+        _record("HGLG11", {"price": "brapi", "pvp": "investidor10", "liquidez": "investidor10"}),
+        _record("VALE3", {}),
+    ]
+    assert universe_index.build(records, built_at=1_000) == {"written": 3, "skipped": [], "total": 3}
+    found = universe_index.lookup(["PETR4", "HGLG11", "VALE3", "ITUB4"], max_age=60, now=1_010)
+    assert set(found) == {"PETR4", "HGLG11", "VALE3"}
+    for record in records:
+        loaded = found[record["ticker"]]
+        assert loaded["sources"] == record["sources"]
+        assert loaded["sinais"] == record["sinais"]
+        assert loaded["indexed_at"] == 1_000
+        assert math.isnan(loaded["debt"])
+    assert universe_index.lookup(["PETR4"], max_age=60, now=1_100) == {}
+
+def test_unknown_source_goes_live(index_path):
+    summary = universe_index.build([_record("PETR4", {"price": "outra"}), _record("VALE3", {"price": "yahoo"})])
+    assert summary["skipped"] == ["PETR4"]
+    assert summary["total"] == 1
+
+def test_older_format_is_ignored(index_path):
+    with open(index_path, "wb") as handle:
+        handle.write(universe_index._HEADER.pack(universe_index._MAGIC, 1, 80, 0, 0))
+    assert universe_index.info() is None
+    assert universe_index.build([_record("PETR4", {"price": "yahoo"})])["total"] == 1
+    assert universe_index.info()["count"] == 1